@@ -0,0 +1,39 @@
+"""Add sam_sync_states for watermark-based SAM.gov sync
+
+Revision ID: 3c9a1f7d2b10
+Revises: 585dd5492e57
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a1f7d2b10'
+down_revision: Union[str, Sequence[str], None] = '585dd5492e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sam_sync_states',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('profile', sa.String(length=100), nullable=False),
+    sa.Column('watermark_posted_date', sa.DateTime(), nullable=True),
+    sa.Column('window_start', sa.DateTime(), nullable=True),
+    sa.Column('window_total', sa.Integer(), nullable=True),
+    sa.Column('last_new_count', sa.Integer(), nullable=True),
+    sa.Column('last_run_at', sa.DateTime(), nullable=True),
+    sa.Column('last_success_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('profile')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('sam_sync_states')
@@ -0,0 +1,58 @@
+"""Add outbound_messages queue and conversation_logs.delivery_status
+
+Revision ID: b71f3e2c5d84
+Revises: 8e2d4b6a9c31
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71f3e2c5d84'
+down_revision: Union[str, Sequence[str], None] = '8e2d4b6a9c31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('outbound_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('page_id', sa.String(length=100), nullable=False),
+    sa.Column('recipient_id', sa.String(length=255), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('graph_message_id', sa.String(length=255), nullable=True),
+    sa.Column('lead_status_on_sent', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('lead_id', sa.Integer(), nullable=True),
+    sa.Column('conversation_log_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['conversation_log_id'], ['conversation_logs.id'], ),
+    sa.ForeignKeyConstraint(['lead_id'], ['leads.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbound_messages_next_attempt_at'), 'outbound_messages', ['next_attempt_at'], unique=False)
+    op.create_index(op.f('ix_outbound_messages_page_id'), 'outbound_messages', ['page_id'], unique=False)
+    op.create_index(op.f('ix_outbound_messages_recipient_id'), 'outbound_messages', ['recipient_id'], unique=False)
+    op.create_index(op.f('ix_outbound_messages_status'), 'outbound_messages', ['status'], unique=False)
+    op.add_column('conversation_logs', sa.Column('delivery_status', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversation_logs', 'delivery_status')
+    op.drop_index(op.f('ix_outbound_messages_status'), table_name='outbound_messages')
+    op.drop_index(op.f('ix_outbound_messages_recipient_id'), table_name='outbound_messages')
+    op.drop_index(op.f('ix_outbound_messages_page_id'), table_name='outbound_messages')
+    op.drop_index(op.f('ix_outbound_messages_next_attempt_at'), table_name='outbound_messages')
+    op.drop_table('outbound_messages')
@@ -0,0 +1,44 @@
+"""Add webhook_inbox for fast-ack webhook processing
+
+Revision ID: d4a8c6e1f293
+Revises: b71f3e2c5d84
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8c6e1f293'
+down_revision: Union[str, Sequence[str], None] = 'b71f3e2c5d84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('webhook_inbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_webhook_inbox_next_attempt_at'), 'webhook_inbox', ['next_attempt_at'], unique=False)
+    op.create_index(op.f('ix_webhook_inbox_status'), 'webhook_inbox', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_webhook_inbox_status'), table_name='webhook_inbox')
+    op.drop_index(op.f('ix_webhook_inbox_next_attempt_at'), table_name='webhook_inbox')
+    op.drop_table('webhook_inbox')
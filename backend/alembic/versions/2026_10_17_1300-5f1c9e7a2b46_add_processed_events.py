@@ -0,0 +1,37 @@
+"""Add processed_events ledger for webhook deduplication
+
+Revision ID: 5f1c9e7a2b46
+Revises: d4a8c6e1f293
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1c9e7a2b46'
+down_revision: Union[str, Sequence[str], None] = 'd4a8c6e1f293'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('processed_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_key', sa.String(length=255), nullable=False),
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_key')
+    )
+    op.create_index(op.f('ix_processed_events_processed_at'), 'processed_events', ['processed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_processed_events_processed_at'), table_name='processed_events')
+    op.drop_table('processed_events')
@@ -0,0 +1,32 @@
+"""Add lead_id to learnings
+
+Revision ID: a93d0b6e4c17
+Revises: 5f1c9e7a2b46
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93d0b6e4c17'
+down_revision: Union[str, Sequence[str], None] = '5f1c9e7a2b46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('learnings', sa.Column('lead_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_learnings_lead_id'), 'learnings', ['lead_id'], unique=False)
+    op.create_foreign_key('learnings_lead_id_fkey', 'learnings', 'leads', ['lead_id'], ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('learnings_lead_id_fkey', 'learnings', type_='foreignkey')
+    op.drop_index(op.f('ix_learnings_lead_id'), table_name='learnings')
+    op.drop_column('learnings', 'lead_id')
@@ -0,0 +1,42 @@
+"""Add analysis_batches for offline conversation analysis
+
+Revision ID: c2e84f1a9d35
+Revises: a93d0b6e4c17
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e84f1a9d35'
+down_revision: Union[str, Sequence[str], None] = 'a93d0b6e4c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('analysis_batches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('batch_id', sa.String(length=255), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('lead_ids', sa.Text(), nullable=False),
+    sa.Column('request_count', sa.Integer(), nullable=False),
+    sa.Column('ingested_count', sa.Integer(), nullable=False),
+    sa.Column('input_path', sa.String(length=1024), nullable=True),
+    sa.Column('submitted_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('batch_id')
+    )
+    op.create_index(op.f('ix_analysis_batches_status'), 'analysis_batches', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_analysis_batches_status'), table_name='analysis_batches')
+    op.drop_table('analysis_batches')
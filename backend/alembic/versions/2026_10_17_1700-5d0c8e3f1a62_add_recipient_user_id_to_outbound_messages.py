@@ -0,0 +1,32 @@
+"""Add recipient_user_id to outbound_messages for per-person send intervals
+
+Revision ID: 5d0c8e3f1a62
+Revises: e7b5a2d9f018
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0c8e3f1a62'
+down_revision: Union[str, Sequence[str], None] = 'e7b5a2d9f018'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('outbound_messages', sa.Column('recipient_user_id', sa.String(length=255), nullable=True))
+    op.create_index(op.f('ix_outbound_messages_recipient_user_id'), 'outbound_messages', ['recipient_user_id'], unique=False)
+    # A DM's recipient is already the user.
+    op.execute("UPDATE outbound_messages SET recipient_user_id = recipient_id WHERE kind = 'direct_message'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_outbound_messages_recipient_user_id'), table_name='outbound_messages')
+    op.drop_column('outbound_messages', 'recipient_user_id')
@@ -0,0 +1,29 @@
+from app.core.container import get_container
+from app.services.calendar_service import CalendarService
+from app.services.conversation_service import ConversationService
+from app.services.devops_service import DevOpsService
+from app.services.facebook_service import FacebookService
+from app.services.sam_service import SAMService
+
+# FastAPI dependencies for the shared service instances. Override them with
+# app.dependency_overrides in tests.
+
+
+def get_facebook_service() -> FacebookService:
+    return get_container().get(FacebookService)
+
+
+def get_conversation_service() -> ConversationService:
+    return get_container().get(ConversationService)
+
+
+def get_devops_service() -> DevOpsService:
+    return get_container().get(DevOpsService)
+
+
+def get_calendar_service() -> CalendarService:
+    return get_container().get(CalendarService)
+
+
+def get_sam_service() -> SAMService:
+    return get_container().get(SAMService)
@@ -2,7 +2,12 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.db.client import get_db
+from app.core.quota import get_quota_governor
 from app.db.models import Lead, Opportunity
+from app.services.facebook_service import lookup_cache_stats
+from app.services.conversation_service import initial_message_cache_stats, stream_latency_stats
+from app.services.event_ledger import get_event_ledger
+from app.services.webhook_inbox import get_webhook_inbox
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -31,3 +36,50 @@ def get_all_leads(db: Session = Depends(get_db)):
     """
     leads = db.query(Lead).join(Opportunity).all()
     return leads
+
+@router.get("/quota")
+def get_sam_quota():
+    """
+    Report the shared SAM.gov API budget: tokens remaining and how many
+    requests in this process are queued for one.
+    """
+    return get_quota_governor().status()
+
+@router.get("/facebook-cache")
+def get_facebook_cache_stats():
+    """
+    Report hit/miss counters for the Facebook page search, page info and
+    user profile caches.
+    """
+    return lookup_cache_stats()
+
+@router.get("/webhook-inbox")
+def get_webhook_inbox_stats(db: Session = Depends(get_db)):
+    """
+    Report how many webhook events are pending, in progress, done or failed.
+    """
+    return get_webhook_inbox().stats(db)
+
+@router.get("/webhook-dedup")
+def get_webhook_dedup_stats():
+    """
+    Report how many webhook deliveries and comments were processed and how
+    many duplicates were dropped.
+    """
+    return get_event_ledger().status()
+
+@router.get("/conversation-latency")
+def get_conversation_latency():
+    """
+    Report p50/p95 time-to-first-token and total latency of recently
+    streamed conversation replies.
+    """
+    return stream_latency_stats()
+
+@router.get("/outreach-cache")
+def get_outreach_cache_stats():
+    """
+    Report hit/miss counters for cached outreach drafts, overall and for the
+    most reused opportunities.
+    """
+    return initial_message_cache_stats()
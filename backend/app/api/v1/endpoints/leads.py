@@ -1,20 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, HttpUrl
 from datetime import datetime
+import json
 import sys
 import os
 
 # Add project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
+from app.api.deps import get_calendar_service, get_conversation_service, get_facebook_service
+from app.core.container import get_container
 from app.db.client import get_db, SessionLocal
 from app.db.models import Opportunity, Lead, ConversationLog, Appointment
 from app.services.devops_service import DevOpsService
 from app.services.facebook_service import FacebookService
+from app.services.conversation_memory import ConversationMemory
 from app.services.conversation_service import ConversationService
 from app.services.calendar_service import CalendarService
 from app.services.lead_service import LeadService
+from app.services.outbound_queue import get_outbound_queue
 
 router = APIRouter()
 
@@ -56,7 +64,7 @@ def create_devops_work_item_task(lead_id: int):
     db = SessionLocal()
     try:
         lead_service = LeadService(db)
-        devops_service = DevOpsService()
+        devops_service = get_container().get(DevOpsService)
 
         lead = db.query(Lead).filter(Lead.id == lead_id).one_or_none()
         if not lead or not lead.opportunity:
@@ -84,6 +92,19 @@ def create_devops_work_item_task(lead_id: int):
     finally:
         db.close()
 
+def update_conversation_memory_task(memory: ConversationMemory, lead_id: int):
+    """
+    Background task to fold older messages into the lead's conversation
+    summary once the reply is out, so the next request reads a short context.
+    """
+    db = SessionLocal()
+    try:
+        memory.update(db, lead_id)
+    except Exception as e:
+        print(f"BACKGROUND_TASK_ERROR: Could not update the conversation summary for lead {lead_id}: {e}")
+    finally:
+        db.close()
+
 # --- API Endpoints ---
 
 @router.post("/", status_code=202, summary="Creates a new lead from a SAM.gov opportunity.")
@@ -122,7 +143,8 @@ def create_lead(
     }
 
 @router.post("/prospect/{lead_id}", status_code=200, summary="Find a Facebook page for an identified lead.")
-def prospect_lead(lead_id: int, db: Session = Depends(get_db)):
+def prospect_lead(lead_id: int, db: Session = Depends(get_db),
+                  facebook_service: FacebookService = Depends(get_facebook_service)):
     """
     Takes an 'Identified' lead, searches Facebook for a matching business page
     using keywords from the associated opportunity, and updates the lead's
@@ -142,7 +164,6 @@ def prospect_lead(lead_id: int, db: Session = Depends(get_db)):
 
     search_query = lead.opportunity.title
 
-    facebook_service = FacebookService()
     page_id = facebook_service.find_page_by_name(search_query)
 
     if not page_id:
@@ -173,7 +194,8 @@ def prospect_lead(lead_id: int, db: Session = Depends(get_db)):
     return { "message": "Lead successfully prospected.", "lead": updated_lead }
 
 @router.post("/engage/{lead_id}", status_code=200, summary="Perform the engagement sequence for a prospected lead.")
-def engage_lead(lead_id: int, db: Session = Depends(get_db)):
+def engage_lead(lead_id: int, db: Session = Depends(get_db),
+                facebook_service: FacebookService = Depends(get_facebook_service)):
     """
     Takes a 'Prospected' lead, runs the engagement sequence (like, share, comment),
     and updates the lead's status to 'Engaged'.
@@ -188,7 +210,6 @@ def engage_lead(lead_id: int, db: Session = Depends(get_db)):
     if not lead.facebook_page_url:
         raise HTTPException(status_code=400, detail="Lead has no Facebook page URL to engage with.")
 
-    facebook_service = FacebookService()
     # This is a conceptual action. The actual implementation might involve multiple API calls.
     # For now, we'll assume a single method call represents the sequence.
     # facebook_service.share_and_mention(...)
@@ -200,11 +221,12 @@ def engage_lead(lead_id: int, db: Session = Depends(get_db)):
 
     return {"message": f"Successfully engaged with lead {lead.id}."}
 
-@router.post("/initiate-conversation/{lead_id}", status_code=200, summary="Sends the first message to an engaged lead.")
+@router.post("/initiate-conversation/{lead_id}", status_code=202, summary="Queues the first message to an engaged lead.")
 def initiate_conversation(lead_id: int, db: Session = Depends(get_db)):
     """
-    Takes an 'Engaged' lead, generates an initial message, sends it,
-    logs it, and updates the lead's status to 'Messaged'.
+    Takes an 'Engaged' lead, generates an initial message and queues it for
+    delivery. The message is logged straight away; the lead's status becomes
+    'Messaged' once the outbound queue has delivered it.
     """
     lead = db.query(Lead).filter(Lead.id == lead_id).first()
     if not lead:
@@ -216,57 +238,127 @@ def initiate_conversation(lead_id: int, db: Session = Depends(get_db)):
     if not lead.opportunity:
          raise HTTPException(status_code=400, detail="Lead has no opportunity to reference.")
 
-    facebook_service = FacebookService()
-    
-    facebook_service.send_outreach_dm(
+    message = FacebookService.build_outreach_message(str(lead.business_name), lead.opportunity)
+    ack = get_outbound_queue().enqueue(
+        db, "direct_message",
         recipient_id="placeholder_recipient_id", # This needs to be discovered
-        commenter_name=str(lead.business_name),
-        opportunity=lead.opportunity
+        message=message,
+        lead_id=lead.id,
+        lead_status_on_sent="Messaged",
     )
-    
-    # Log the sent message
-    # ... logic to create ConversationLog ...
-    
-    db.query(Lead).filter(Lead.id == lead_id).update({"status": "Messaged", "last_updated_at": datetime.utcnow()})
-    db.commit()
 
-    return {"message": f"Initial message sent to lead {lead.id}."}
+    return {"message": f"Initial message queued for lead {lead.id}.", **ack}
 
 @router.post("/conversation-webhook/{lead_id}", status_code=200, summary="Handles incoming messages from a lead.")
-def handle_conversation_message(lead_id: int, incoming_message: IncomingMessage, db: Session = Depends(get_db)):
+def handle_conversation_message(lead_id: int, incoming_message: IncomingMessage, background_tasks: BackgroundTasks,
+                                db: Session = Depends(get_db),
+                                conversation_service: ConversationService = Depends(get_conversation_service),
+                                facebook_service: FacebookService = Depends(get_facebook_service)):
     """
     This endpoint is a webhook to be called by an external service (e.g., a Facebook webhook handler)
     when a new message is received from a lead. It logs the message, gets a response from the AI,
-    sends the response, and logs it.
+    sends the response, and logs it. The AI sees the lead's rolling summary and recent turns only;
+    the summary is brought up to date in the background.
     """
     lead = db.query(Lead).filter(Lead.id == lead_id).first()
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found.")
 
-    user_log = ConversationLog(lead_id=lead.id, sender="user", message=incoming_message.message, created_at=datetime.utcnow())
-    db.add(user_log)
-    db.commit()
-
-    conversation_history_query = db.query(ConversationLog).filter(ConversationLog.lead_id == lead.id).order_by(ConversationLog.created_at).all()
-    history_for_service = [{"sender": log.sender, "text": log.message} for log in conversation_history_query]
-    
-    conversation_service = ConversationService()
-    ai_response_text = conversation_service.get_next_response(history_for_service)
+    memory = ConversationMemory(conversation_service)
+    summary, recent_turns = _log_incoming_message(db, lead, incoming_message, memory)
+    ai_response_text = conversation_service.generate_response(recent_turns, summary=summary)
 
-    facebook_service = FacebookService()
     # The recipient ID needs to be managed correctly
     # facebook_service.send_direct_message(recipient_id, ai_response_text)
 
-    ai_log = ConversationLog(lead_id=lead.id, sender="bot", message=ai_response_text, created_at=datetime.utcnow())
+    ai_log = ConversationLog(lead_id=lead.id, sender="bot", message=ai_response_text, timestamp=datetime.utcnow())
     db.add(ai_log)
     
     db.query(Lead).filter(Lead.id == lead_id).update({"last_updated_at": datetime.utcnow()})
     db.commit()
+    background_tasks.add_task(update_conversation_memory_task, memory, lead.id)
 
     return {"message": "Response sent successfully."}
 
+def _log_incoming_message(db: Session, lead: Lead, incoming_message: IncomingMessage,
+                          memory: ConversationMemory) -> tuple[str | None, list[dict]]:
+    """
+    Logs the lead's message and returns the conversation summary and the
+    turns after it, in the format ConversationService expects.
+    """
+    user_log = ConversationLog(lead_id=lead.id, sender="user", message=incoming_message.message, timestamp=datetime.utcnow())
+    db.add(user_log)
+    db.commit()
+
+    return memory.load(db, lead.id)
+
+def _log_bot_reply(lead_id: int, message: str):
+    """
+    Logs a streamed reply. The request's session is closed once the response
+    starts, so this uses a session of its own.
+    """
+    with SessionLocal() as db:
+        db.add(ConversationLog(lead_id=lead_id, sender="bot", message=message, timestamp=datetime.utcnow()))
+        db.query(Lead).filter(Lead.id == lead_id).update({"last_updated_at": datetime.utcnow()})
+        db.commit()
+
+def _sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@router.post("/conversation-webhook/{lead_id}/stream", summary="Handles incoming messages from a lead, streaming the reply.")
+def stream_conversation_message(lead_id: int, incoming_message: IncomingMessage, db: Session = Depends(get_db),
+                                conversation_service: ConversationService = Depends(get_conversation_service)):
+    """
+    Streaming variant of the conversation webhook. The reply is sent as
+    server-sent events while it is generated: one `data: {"delta": ...}`
+    event per text chunk, then a `done` event with the full message and its
+    time-to-first-token and total latency. If the reply is cut short, an
+    `error` event with the partial message is sent instead of `done`. The
+    reply is logged once complete and the conversation summary is updated
+    after the stream has ended.
+    """
+    lead = db.query(Lead).filter(Lead.id == lead_id).first()
+    if not lead:
+        raise HTTPException(status_code=404, detail="Lead not found.")
+
+    memory = ConversationMemory(conversation_service)
+    summary, recent_turns = _log_incoming_message(db, lead, incoming_message, memory)
+
+    async def events():
+        timings: dict = {}
+        parts = []
+        error = None
+        try:
+            async for delta in conversation_service.generate_response_stream(recent_turns, timings=timings, summary=summary):
+                parts.append(delta)
+                yield _sse({"delta": delta})
+        except Exception as e:
+            error = e
+        ai_response_text = "".join(parts).strip()
+
+        # The lead has seen whatever was streamed, so a partial reply is
+        # logged too. The session is synchronous; keep it off the event loop.
+        try:
+            if ai_response_text:
+                await run_in_threadpool(_log_bot_reply, lead_id, ai_response_text)
+        except Exception as e:
+            print(f"Error logging streamed reply for lead {lead_id}: {e}")
+            error = error or e
+
+        if error is not None:
+            yield _sse({"error": "The reply could not be completed.", "message": ai_response_text}, event="error")
+            return
+        yield _sse({"message": ai_response_text, "ttft": timings.get("ttft"), "total": timings.get("total")}, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"},
+                             background=BackgroundTask(update_conversation_memory_task, memory, lead_id))
+
 @router.post("/offer-appointment/{lead_id}", status_code=200, summary="Get available calendar slots and offer them.")
-def offer_appointment(lead_id: int, db: Session = Depends(get_db)):
+def offer_appointment(lead_id: int, db: Session = Depends(get_db),
+                      calendar_service: CalendarService = Depends(get_calendar_service),
+                      conversation_service: ConversationService = Depends(get_conversation_service),
+                      facebook_service: FacebookService = Depends(get_facebook_service)):
     """
     Checks the calendar for available slots and constructs a message
     offering the times to the lead.
@@ -275,26 +367,24 @@ def offer_appointment(lead_id: int, db: Session = Depends(get_db)):
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
 
-    calendar_service = CalendarService()
     available_slots = calendar_service.get_available_slots()
 
     if not available_slots:
         raise HTTPException(status_code=404, detail="No available appointment slots found.")
 
-    conversation_service = ConversationService()
     offer_message = conversation_service.generate_appointment_offer(available_slots)
 
-    facebook_service = FacebookService()
     # facebook_service.send_direct_message(recipient_id, offer_message)
     
-    new_log = ConversationLog(lead_id=lead.id, sender="bot", message=offer_message, created_at=datetime.utcnow())
+    new_log = ConversationLog(lead_id=lead.id, sender="bot", message=offer_message, timestamp=datetime.utcnow())
     db.add(new_log)
     db.commit()
     
     return {"message": "Appointment slots offered.", "slots_offered": available_slots}
 
 @router.post("/book-appointment/{lead_id}", status_code=201, summary="Books a confirmed appointment.")
-def book_appointment(lead_id: int, appointment_request: AppointmentRequest, db: Session = Depends(get_db)):
+def book_appointment(lead_id: int, appointment_request: AppointmentRequest, db: Session = Depends(get_db),
+                     calendar_service: CalendarService = Depends(get_calendar_service)):
     """
     Books an appointment in the calendar based on the user's selected time,
     creates an appointment record in the database, and updates the lead's status.
@@ -302,9 +392,7 @@ def book_appointment(lead_id: int, appointment_request: AppointmentRequest, db:
     lead = db.query(Lead).filter(Lead.id == lead_id).first()
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
-        
-    calendar_service = CalendarService()
-    
+
     start_time = datetime.fromisoformat(appointment_request.start_time)
     end_time = datetime.fromisoformat(appointment_request.end_time)
     
@@ -338,7 +426,8 @@ def book_appointment(lead_id: int, appointment_request: AppointmentRequest, db:
     return {"message": "Appointment successfully booked.", "appointment_id": new_appointment.id, "external_event_id": event_id}
 
 @router.post("/reschedule-appointment/{lead_id}", status_code=200, summary="Handles rescheduling of an appointment.")
-def reschedule_appointment(lead_id: int, db: Session = Depends(get_db)):
+def reschedule_appointment(lead_id: int, db: Session = Depends(get_db),
+                           calendar_service: CalendarService = Depends(get_calendar_service)):
     """
     Finds an existing appointment for a lead, cancels it, and then
     re-initiates the appointment offering process.
@@ -350,9 +439,7 @@ def reschedule_appointment(lead_id: int, db: Session = Depends(get_db)):
     existing_appointment = db.query(Appointment).filter(Appointment.lead_id == lead_id, Appointment.status == 'confirmed').first()
     if not existing_appointment:
         raise HTTPException(status_code=404, detail="No confirmed appointment found to reschedule.")
-        
-    calendar_service = CalendarService()
-    
+
     # Cancel the old appointment
     if existing_appointment.external_event_id:
         calendar_service.cancel_appointment(existing_appointment.external_event_id)
@@ -361,4 +448,6 @@ def reschedule_appointment(lead_id: int, db: Session = Depends(get_db)):
     db.commit()
     
     # Re-offer new times
-    return offer_appointment(lead_id, db)
+    return offer_appointment(lead_id, db, calendar_service=calendar_service,
+                             conversation_service=get_conversation_service(),
+                             facebook_service=get_facebook_service())
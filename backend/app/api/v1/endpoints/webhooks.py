@@ -1,11 +1,9 @@
 import os
-import json
 from fastapi import APIRouter, Request, HTTPException, Response, Depends
-from typing import Optional
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from app.services.facebook_service import FacebookService
-from app.services.lead_service import LeadService
+from app.services.webhook_inbox import get_webhook_inbox
 from app.db.client import get_db
 
 router = APIRouter()
@@ -40,33 +38,20 @@ async def verify_facebook_webhook(request: Request):
 async def handle_facebook_webhook(request: Request, db: Session = Depends(get_db)):
     """
     Handles incoming events from the Facebook webhook, such as new comments.
-    """
-    data = await request.json()
-    print("Received Facebook Webhook Event:")
-    print(json.dumps(data, indent=2))
-
-    lead_service = LeadService(db)
-
-    # Process incoming webhook data
-    if data.get("object") == "page":
-        for entry in data.get("entry", []):
-            for change in entry.get("changes", []):
-                if change.get("field") == "feed" and change.get("value", {}).get("item") == "comment":
-                    comment_data = change.get("value")
-                    # We only care about new comments, not edits or deletes
-                    if comment_data.get("verb") != "add":
-                        continue
-                    
-                    user_id = comment_data.get("from", {}).get("id")
-                    comment_id = comment_data.get("comment_id")
-                    comment_text = comment_data.get("message")
 
-                    if user_id and comment_id and comment_text:
-                        print(f"Processing comment ID {comment_id} from user {user_id}")
-                        lead_service.process_comment(
-                            comment_text=comment_text,
-                            user_id=user_id,
-                            comment_id=comment_id
-                        )
-
-    return {"status": "success"} 
\ No newline at end of file
+    The raw body is stored in the webhook inbox and acknowledged right away;
+    the inbox workers (see WebhookInbox) run the comment pipeline afterwards.
+    """
+    body = await request.body()
+    try:
+        payload = body.decode("utf-8")
+    except UnicodeDecodeError:
+        # Facebook always sends UTF-8 JSON; reject anything else outright.
+        raise HTTPException(status_code=400, detail="Request body is not valid UTF-8.")
+    # The insert is blocking database I/O; keep it off the event loop.
+    event_id = await run_in_threadpool(get_webhook_inbox().record, db, payload)
+    if event_id is None:
+        print("Dropped duplicate Facebook Webhook Event.")
+    else:
+        print(f"Queued Facebook Webhook Event {event_id}.")
+    return {"status": "success"}
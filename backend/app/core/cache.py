@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Returned by TTLCache.get when no default is given and the key is absent, so a
+# cached None (e.g. a negative lookup) can be told apart from a miss.
+MISSING = object()
+
+
+class TTLCache:
+    """
+    A thread-safe, in-memory LRU cache whose entries also expire after a
+    time-to-live.
+
+    Entries can override the default TTL, which is how callers cache negative
+    results ("not found") for a shorter period than hits. Hit, miss and
+    eviction counters are kept for monitoring.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > self._clock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class VariantCache:
+    """
+    A thread-safe LRU cache that keeps a small pool of interchangeable values
+    per key, e.g. several generated drafts for the same prompt.
+
+    get() reports a miss until the key's pool holds `variants` values, so the
+    caller generates and add()s a new one; after that it hands the pooled
+    values out in turn. Pools expire `ttl` seconds after their first value
+    was added. Hit and miss counters are kept per key as well as overall.
+    """
+    def __init__(self, maxsize: int = 1024, variants: int = 3, ttl: float = 7 * 24 * 3600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.variants = max(1, variants)
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry["expires_at"] <= self._clock():
+            del self._entries[key]
+            entry = None
+        return entry
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        with self._lock:
+            entry = self._entry(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            pool = entry["values"]
+            if len(pool) < self.variants:
+                entry["misses"] += 1
+                self.misses += 1
+                return default
+            value = pool[entry["next"] % len(pool)]
+            entry["next"] += 1
+            entry["hits"] += 1
+            self.hits += 1
+            return value
+
+    def add(self, key: Hashable, value: Any, label: Optional[str] = None):
+        """
+        Adds a value to the key's pool; ignored once the pool is full.
+        `label` is a human-readable name for the key, shown in stats().
+        """
+        with self._lock:
+            entry = self._entry(key)
+            if entry is None:
+                # The miss that led to this value is counted against the key.
+                entry = {"values": [], "next": 0, "hits": 0, "misses": 1, "label": label,
+                         "expires_at": self._clock() + self.ttl}
+                self._entries[key] = entry
+            if len(entry["values"]) < self.variants:
+                entry["values"].append(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """
+        Returns the overall counters and those of the `top` most-hit keys.
+        """
+        with self._lock:
+            keys = sorted(self._entries.items(), key=lambda item: item[1]["hits"], reverse=True)[:top]
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "variants": self.variants,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "keys": [
+                    {"key": str(key), "label": entry["label"], "variants": len(entry["values"]),
+                     "hits": entry["hits"], "misses": entry["misses"]}
+                    for key, entry in keys
+                ],
+            }
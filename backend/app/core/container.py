@@ -0,0 +1,133 @@
+import asyncio
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ServiceContainer:
+    """
+    The application-scoped registry of shared service instances.
+
+    Services are keyed by their class and built on first use, so a process
+    only pays for the integrations it actually touches, and every caller
+    after that gets the same instance instead of re-reading env vars and
+    rebuilding clients. A class that was never registered is built by calling
+    it with no arguments.
+
+    shutdown() runs the registered close hooks in reverse order of
+    construction and forgets the instances; the next get() builds them again.
+    A close hook may be a coroutine function, for services holding async
+    clients: ashutdown() awaits it on the caller's event loop, which is where
+    those clients were used, while shutdown() runs it to completion on a
+    fresh loop.
+    """
+    def __init__(self):
+        self._factories: Dict[Any, Callable[[], Any]] = {}
+        self._closers: Dict[Any, Callable[[Any], Any]] = {}
+        self._instances: Dict[Any, Any] = {}
+        self._order: List[Any] = []
+        self._lock = threading.RLock()
+
+    def register(self, key: Type[T], factory: Optional[Callable[[], T]] = None,
+                 close: Optional[Callable[[T], Any]] = None):
+        """
+        Sets how `key` is built (defaults to calling it) and, optionally, how
+        it is released on shutdown.
+        """
+        with self._lock:
+            self._factories[key] = factory if factory is not None else key
+            if close is not None:
+                self._closers[key] = close
+
+    def get(self, key: Type[T]) -> T:
+        instance = self._instances.get(key)
+        if instance is not None:
+            return instance
+        with self._lock:
+            # Another thread may have built it while we waited.
+            if key not in self._instances:
+                self._instances[key] = self._factories.get(key, key)()
+                self._order.append(key)
+            return self._instances[key]
+
+    def override(self, key: Type[T], instance: T):
+        """
+        Replaces the shared instance of `key`, e.g. with a test double.
+        """
+        with self._lock:
+            if key not in self._instances:
+                self._order.append(key)
+            self._instances[key] = instance
+
+    def _detach(self) -> List[Any]:
+        with self._lock:
+            order, instances = self._order, self._instances
+            self._order, self._instances = [], {}
+        return [(key, instances[key], self._closers[key]) for key in reversed(order) if key in self._closers]
+
+    def shutdown(self):
+        for key, instance, close in self._detach():
+            try:
+                result = close(instance)
+                if inspect.isawaitable(result):
+                    asyncio.run(result)
+            except Exception as e:
+                logger.warning(f"Error closing {getattr(key, '__name__', key)}: {e}")
+
+    async def ashutdown(self):
+        """
+        shutdown() for async callers, e.g. the FastAPI shutdown handler.
+        """
+        for key, instance, close in self._detach():
+            try:
+                result = close(instance)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Error closing {getattr(key, '__name__', key)}: {e}")
+
+
+def _build_container() -> ServiceContainer:
+    from app.core.http_client import HTTPClient, close_http_client, get_http_client
+    from app.services.conversation_service import ConversationService
+    from app.services.devops_service import DevOpsService
+    from app.services.facebook_service import FacebookService
+    from app.services.psc_service import PSCService
+    from app.services.sam_service import SAMService
+
+    container = ServiceContainer()
+    # Closing resets the module singleton too, so code that calls
+    # get_http_client() directly never gets the closed client.
+    container.register(HTTPClient, get_http_client, close=lambda client: close_http_client())
+    # The HTTP integrations share the pooled client, which is built before
+    # them and therefore closed after them.
+    for service in (FacebookService, SAMService, PSCService, DevOpsService):
+        container.register(service, lambda service=service: service(http_client=container.get(HTTPClient)))
+    container.register(ConversationService, close=_close_conversation_service)
+    return container
+
+
+async def _close_conversation_service(service):
+    # The streaming client is created lazily next to the sync one.
+    service.close()
+    await service.aclose()
+
+
+_shared_container: Optional[ServiceContainer] = None
+_shared_lock = threading.Lock()
+
+
+def get_container() -> ServiceContainer:
+    """
+    Returns the process-wide service container.
+    """
+    global _shared_container
+    with _shared_lock:
+        if _shared_container is None:
+            _shared_container = _build_container()
+    return _shared_container
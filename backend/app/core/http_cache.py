@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+
+# Query parameters that identify the caller rather than the query. They are
+# left out of cache keys and never written to disk.
+SECRET_PARAMS = frozenset({"api_key", "access_token"})
+
+MODES = ("off", "cache", "record", "replay")
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class ReplayMissError(Exception):
+    """
+    Raised in replay mode when a request has no recorded response.
+    """
+
+
+class HTTPResponseCache:
+    """
+    A content-addressed, on-disk cache of JSON API responses.
+
+    Entries are keyed by a hash of the URL and the normalised query parameters
+    (sorted, secrets removed), so identical queries share one file no matter
+    who issued them. Modes:
+
+    - "off":    every call goes to the network (the default).
+    - "cache":  fresh entries are served from disk. An entry is fresh for the
+                configured TTL, or the response's Cache-Control max-age if that
+                is shorter. Stale entries are revalidated with
+                If-None-Match / If-Modified-Since, and a 304 refreshes them.
+                Responses marked no-store are never written.
+    - "record": every call goes to the network and the response is stored.
+    - "replay": responses come only from disk; a miss raises ReplayMissError.
+                Use it to re-run and benchmark pipelines offline.
+    """
+    def __init__(self, directory: Optional[str] = None, ttl: float = 3600.0, mode: str = "off",
+                 clock: Callable[[], float] = time.time):
+        if mode not in MODES:
+            raise ValueError(f"Unknown HTTP cache mode '{mode}'. Expected one of {MODES}.")
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "govbidgenie", "http_cache")
+        self.ttl = ttl
+        self.mode = mode
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0}
+
+    @classmethod
+    def from_env(cls) -> "HTTPResponseCache":
+        return cls(
+            directory=os.environ.get("HTTP_CACHE_DIR"),
+            ttl=float(os.environ.get("HTTP_CACHE_TTL", "3600")),
+            mode=os.environ.get("HTTP_CACHE_MODE", "off"),
+        )
+
+    @staticmethod
+    def normalize_params(params: Optional[Mapping[str, Any]]) -> Dict[str, str]:
+        return {
+            str(key): str(value)
+            for key, value in sorted((params or {}).items())
+            if key not in SECRET_PARAMS and value is not None
+        }
+
+    def key(self, url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+        canonical = json.dumps({"url": url, "params": self.normalize_params(params)}, sort_keys=True)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, key: str, entry: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as outfile:
+            json.dump(entry, outfile)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stats["stored"] += 1
+
+    def _is_fresh(self, entry: Dict[str, Any]) -> bool:
+        lifetime = self.ttl
+        if entry.get("max_age") is not None:
+            lifetime = min(lifetime, entry["max_age"])
+        return self._clock() - entry["stored_at"] < lifetime
+
+    @staticmethod
+    def _conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _entry_from_response(self, url: str, params: Optional[Mapping[str, Any]], response) -> Optional[Dict[str, Any]]:
+        cache_control = (response.headers.get("Cache-Control") or "").lower()
+        if "no-store" in cache_control:
+            return None
+        max_age = _MAX_AGE.search(cache_control)
+        return {
+            "url": url,
+            "params": self.normalize_params(params),
+            "stored_at": self._clock(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "max_age": int(max_age.group(1)) if max_age else None,
+            "body": response.json(),
+        }
+
+    def _before_fetch(self, url: str, params: Optional[Mapping[str, Any]],
+                      revalidate: bool) -> Tuple[str, Optional[Dict[str, Any]], Any]:
+        """
+        Returns (key, stored entry, body to serve without fetching or None).
+        """
+        key = self.key(url, params)
+        entry = self._load(key) if self.mode in ("cache", "replay") else None
+        if self.mode == "replay":
+            if entry is None:
+                raise ReplayMissError(f"No recorded response for {url} {self.normalize_params(params)}")
+            with self._lock:
+                self.stats["hits"] += 1
+            return key, entry, entry["body"]
+        if self.mode == "cache" and entry is not None and not revalidate and self._is_fresh(entry):
+            with self._lock:
+                self.stats["hits"] += 1
+            return key, entry, entry["body"]
+        with self._lock:
+            self.stats["misses"] += 1
+        return key, entry, None
+
+    def _after_fetch(self, key: str, url: str, params: Optional[Mapping[str, Any]],
+                     entry: Optional[Dict[str, Any]], response) -> Any:
+        if response.status_code == 304 and entry is not None:
+            entry["stored_at"] = self._clock()
+            self._save(key, entry)
+            with self._lock:
+                self.stats["revalidated"] += 1
+            return entry["body"]
+
+        response.raise_for_status()
+        if self.mode in ("cache", "record"):
+            new_entry = self._entry_from_response(url, params, response)
+            if new_entry is not None:
+                self._save(key, new_entry)
+                return new_entry["body"]
+        return response.json()
+
+    def get_json(self, fetch: Callable[..., Any], url: str, params: Optional[Mapping[str, Any]] = None,
+                 headers: Optional[Mapping[str, str]] = None, revalidate: bool = False, **kwargs) -> Any:
+        """
+        Returns the decoded JSON body for a GET, going through the cache.
+
+        Args:
+            fetch: An HTTPClient.get-style `get(url, params=..., headers=..., **kwargs)`
+                   callable returning a response object.
+            revalidate: In "cache" mode, always check with the server (a cheap
+                        conditional request) even if the entry is still fresh.
+        """
+        key, entry, body = self._before_fetch(url, params, revalidate)
+        if body is not None:
+            return body
+        request_headers = dict(headers or {})
+        if self.mode == "cache":
+            request_headers.update(self._conditional_headers(entry))
+        response = fetch(url, params=params, headers=request_headers, **kwargs)
+        return self._after_fetch(key, url, params, entry, response)
+
+    async def get_json_async(self, fetch: Callable[..., Awaitable[Any]], url: str,
+                             params: Optional[Mapping[str, Any]] = None,
+                             headers: Optional[Mapping[str, str]] = None, revalidate: bool = False,
+                             **kwargs) -> Any:
+        """
+        Async counterpart of get_json for HTTPClient.aget and friends.
+        """
+        key, entry, body = self._before_fetch(url, params, revalidate)
+        if body is not None:
+            return body
+        request_headers = dict(headers or {})
+        if self.mode == "cache":
+            request_headers.update(self._conditional_headers(entry))
+        response = await fetch(url, params=params, headers=request_headers, **kwargs)
+        return self._after_fetch(key, url, params, entry, response)
+
+
+_shared_cache: Optional[HTTPResponseCache] = None
+
+
+def get_http_cache() -> HTTPResponseCache:
+    """
+    Returns the process-wide cache configured from HTTP_CACHE_MODE,
+    HTTP_CACHE_DIR and HTTP_CACHE_TTL.
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = HTTPResponseCache.from_env()
+    return _shared_cache
@@ -0,0 +1,229 @@
+import asyncio
+import email.utils
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Callable, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Methods that are safe to resend after the server may have seen them.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Statuses worth retrying. 429 means the request was rejected unprocessed, so
+# it is retried for every method; the 5xx ones only for idempotent methods.
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Failures where the request never reached the server.
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Parses a Retry-After header (delta-seconds or an HTTP date) into seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+class HTTPClient:
+    """
+    The shared HTTP transport for every outbound integration.
+
+    Wraps one pooled httpx.Client (keep-alive connections pooled per host,
+    HTTP/2 negotiated where the server supports it) behind a small
+    requests-like facade, plus an async facade backed by one
+    httpx.AsyncClient per event loop. Both facades apply the same timeouts
+    and retry policy:
+
+    - Connection failures are retried for every method, since the request
+      never left. Other transport errors are retried for idempotent methods.
+    - 429 is retried for every method; 502/503/504 for idempotent methods.
+    - Waits grow as backoff_factor * 2**attempt, capped at max_backoff, and a
+      Retry-After header takes precedence when present.
+
+    Responses are httpx.Response objects; call raise_for_status() as usual.
+    """
+    def __init__(self, timeout: float = 30.0, connect_timeout: float = 5.0, retries: int = 3,
+                 backoff_factor: float = 0.5, max_backoff: float = 30.0, http2: bool = True,
+                 max_connections: int = 100, max_keepalive_connections: int = 20,
+                 transport: Optional[httpx.BaseTransport] = None,
+                 async_transport: Optional[httpx.AsyncBaseTransport] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections)
+        self.retries = max(0, retries)
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.http2 = http2
+        self._async_transport = async_transport
+        self._sleep = sleep
+        self._client = httpx.Client(timeout=self.timeout, limits=self.limits, http2=http2, transport=transport)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0}
+
+    @classmethod
+    def from_env(cls) -> "HTTPClient":
+        return cls(
+            timeout=float(os.environ.get("HTTP_TIMEOUT", "30")),
+            connect_timeout=float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5")),
+            retries=int(os.environ.get("HTTP_MAX_RETRIES", "3")),
+            backoff_factor=float(os.environ.get("HTTP_BACKOFF_FACTOR", "0.5")),
+            max_backoff=float(os.environ.get("HTTP_MAX_BACKOFF", "30")),
+            http2=os.environ.get("HTTP_HTTP2", "true").lower() != "false",
+        )
+
+    def _retry_delay(self, method: str, attempt: int, response: Optional[httpx.Response] = None,
+                     error: Optional[Exception] = None) -> Optional[float]:
+        """
+        Returns how long to wait before retrying, or None to stop.
+        """
+        if attempt >= self.retries:
+            return None
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        if error is not None:
+            if not (isinstance(error, UNSENT_ERRORS) or (idempotent and isinstance(error, httpx.TransportError))):
+                return None
+        elif response.status_code not in RETRY_STATUSES or (response.status_code != 429 and not idempotent):
+            return None
+
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                delay = min(self.max_backoff, retry_after)
+        with self._lock:
+            self.stats["retries"] += 1
+        return delay
+
+    def _count_request(self):
+        with self._lock:
+            self.stats["requests"] += 1
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        attempt = 0
+        while True:
+            self._count_request()
+            try:
+                response = self._client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                delay = self._retry_delay(method, attempt, error=e)
+                if delay is None:
+                    raise
+                logger.warning("%s %s failed (%s); retrying in %.1fs", method, url, e, delay)
+            else:
+                delay = self._retry_delay(method, attempt, response=response)
+                if delay is None:
+                    return response
+                logger.warning("%s %s returned %s; retrying in %.1fs", method, url, response.status_code, delay)
+                response.close()
+            self._sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def async_client(self) -> httpx.AsyncClient:
+        """
+        Returns the pooled httpx.AsyncClient for the running event loop.
+        Connections cannot be shared across loops, so each loop gets its own.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, http2=self.http2,
+                                       transport=self._async_transport)
+            self._async_clients[loop] = client
+        return client
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        client = self.async_client()
+        attempt = 0
+        while True:
+            self._count_request()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                delay = self._retry_delay(method, attempt, error=e)
+                if delay is None:
+                    raise
+                logger.warning("%s %s failed (%s); retrying in %.1fs", method, url, e, delay)
+            else:
+                delay = self._retry_delay(method, attempt, response=response)
+                if delay is None:
+                    return response
+                logger.warning("%s %s returned %s; retrying in %.1fs", method, url, response.status_code, delay)
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aget(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("POST", url, **kwargs)
+
+    async def apatch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("PATCH", url, **kwargs)
+
+    async def aclose(self):
+        """
+        Closes the async client of the running event loop. Call it before a
+        short-lived loop (e.g. one started with asyncio.run) ends.
+        """
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        self._client.close()
+
+
+_shared_client: Optional[HTTPClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """
+    Returns the process-wide client configured from HTTP_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT, HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR,
+    HTTP_MAX_BACKOFF and HTTP_HTTP2.
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HTTPClient.from_env()
+    return _shared_client
+
+
+def close_http_client():
+    """
+    Closes the process-wide client. The next get_http_client() call builds a
+    new one instead of returning the closed client.
+    """
+    global _shared_client
+    with _shared_lock:
+        client, _shared_client = _shared_client, None
+    if client is not None:
+        client.close()
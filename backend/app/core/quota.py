@@ -0,0 +1,325 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# Request priorities; lower values are served first.
+INTERACTIVE = 0  # A user is waiting, e.g. a webhook comment lookup.
+NORMAL = 5
+BULK = 10  # Backfills and scheduled syncs.
+
+
+class QuotaExhaustedError(httpx.HTTPError):
+    """
+    Raised when no quota token could be acquired before the timeout.
+
+    It subclasses httpx.HTTPError so callers that already handle failed
+    requests treat a throttled call the same way.
+    """
+
+
+class QuotaGovernor:
+    """
+    A token bucket shared by every process through the `api_quotas` table.
+
+    Each outbound call takes one token. The bucket holds `capacity` tokens
+    and refills continuously at `capacity / refill_period` tokens per second,
+    so the default of 1000 tokens per day matches SAM.gov's daily API quota.
+
+    Priorities are honoured in two ways:
+
+    - Within a process, waiters are served strictly by priority and then in
+      arrival order, so an interactive lookup jumps ahead of a queued backfill.
+    - Across processes, the last `interactive_reserve` tokens can only be
+      spent at INTERACTIVE priority, so bulk jobs elsewhere can never drain
+      the budget that webhook lookups depend on.
+
+    When `session_factory` is None the bucket is kept in memory for this
+    process only. If the database fails, calls fall back to that local bucket
+    and the shared one is tried again after `db_retry_interval` seconds.
+    """
+    def __init__(self, name: str, capacity: int, refill_period: float = 86400.0,
+                 interactive_reserve: int = 0, session_factory: Optional[Callable[[], Any]] = None,
+                 clock: Callable[[], float] = time.time, max_wait: float = 5.0,
+                 db_retry_interval: float = 30.0):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.name = name
+        self.capacity = capacity
+        self.refill_per_second = capacity / refill_period
+        self.interactive_reserve = max(0, min(interactive_reserve, capacity - 1))
+        self.session_factory = session_factory
+        self._clock = clock
+        self._max_wait = max_wait
+        self.db_retry_interval = db_retry_interval
+        self._db_retry_at = 0.0
+        self._cond = threading.Condition()
+        self._local_lock = threading.Lock()
+        # Set while the first waiter is out of tokens.
+        self._short = False
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._local_tokens = float(capacity)
+        self._local_updated_at = clock()
+        self.stats = {"granted": 0, "denied": 0, "waited_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls, name: str = "sam.gov", session_factory: Optional[Callable[[], Any]] = None) -> "QuotaGovernor":
+        capacity = int(os.environ.get("SAM_API_DAILY_QUOTA", "1000"))
+        reserve = int(os.environ.get("SAM_API_INTERACTIVE_RESERVE", str(capacity // 10)))
+        return cls(name, capacity, interactive_reserve=reserve, session_factory=session_factory)
+
+    def _refill(self, tokens: float, elapsed: float) -> float:
+        return min(float(self.capacity), tokens + max(0.0, elapsed) * self.refill_per_second)
+
+    def _spendable(self, tokens: float, priority: int) -> float:
+        if priority > INTERACTIVE:
+            return tokens - self.interactive_reserve
+        return tokens
+
+    def _wait_for(self, spendable: float) -> float:
+        return (1.0 - spendable) / self.refill_per_second
+
+    def _take_local(self, priority: int) -> float:
+        with self._local_lock:
+            now = self._clock()
+            self._local_tokens = self._refill(self._local_tokens, now - self._local_updated_at)
+            self._local_updated_at = now
+            spendable = self._spendable(self._local_tokens, priority)
+            if spendable >= 1.0:
+                self._local_tokens -= 1.0
+                return 0.0
+            return self._wait_for(spendable)
+
+    def _load_row(self, db, lock: bool):
+        from app.db.models import ApiQuota
+
+        query = db.query(ApiQuota).filter(ApiQuota.name == self.name)
+        if lock:
+            query = query.with_for_update()
+        row = query.first()
+        if row is None:
+            row = ApiQuota(name=self.name, capacity=self.capacity, refill_per_second=self.refill_per_second,
+                           tokens=float(self.capacity), updated_at=datetime.utcfromtimestamp(self._clock()))
+            db.add(row)
+            try:
+                db.flush()
+            except IntegrityError:
+                # Another process created the row first.
+                db.rollback()
+                row = query.first()
+        return row
+
+    def _take_shared(self, priority: int) -> float:
+        db = self.session_factory()
+        try:
+            row = self._load_row(db, lock=True)
+            now = datetime.utcfromtimestamp(self._clock())
+            # Configuration changes take effect on the shared row.
+            row.capacity = self.capacity
+            row.refill_per_second = self.refill_per_second
+            row.tokens = self._refill(row.tokens, (now - row.updated_at).total_seconds())
+            row.updated_at = now
+            spendable = self._spendable(row.tokens, priority)
+            wait = 0.0
+            if spendable >= 1.0:
+                row.tokens -= 1.0
+            else:
+                wait = self._wait_for(spendable)
+            db.commit()
+            return wait
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _try_take(self, priority: int) -> float:
+        """
+        Takes one token if one is available at `priority`.
+
+        Returns:
+            0.0 if a token was taken, otherwise the seconds until one should be.
+        """
+        if self.session_factory is not None and self._clock() >= self._db_retry_at:
+            try:
+                wait = self._take_shared(priority)
+            except Exception as e:
+                # Serve this call from a per-process bucket rather than
+                # blocking it, and give the database a moment to recover.
+                self._db_retry_at = self._clock() + self.db_retry_interval
+                logger.warning("Quota table unavailable for '%s', using a local bucket for %.0fs: %s",
+                               self.name, self.db_retry_interval, e)
+            else:
+                self._db_retry_at = 0.0
+                return wait
+        return self._take_local(priority)
+
+    def acquire(self, priority: int = BULK, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until a token is taken at `priority`.
+
+        Args:
+            priority: INTERACTIVE, NORMAL or BULK (lower is served first).
+            timeout: Give up after this many seconds; None waits indefinitely.
+
+        Returns:
+            True if a token was taken, False on timeout.
+        """
+        started = self._clock()
+        deadline = None if timeout is None else started + timeout
+        entry = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+        try:
+            while True:
+                with self._cond:
+                    # Callers ahead of us are served first. Only once the head
+                    # found the bucket empty is there a reason to wait or give up.
+                    while self._waiters[0] != entry and not self._short:
+                        self._cond.wait(self._max_wait)
+                    first = self._waiters[0] == entry
+                    if first:
+                        self._short = False
+                if first:
+                    # The database round trip happens without the lock, so
+                    # other callers can still queue up and report status.
+                    wait = self._try_take(priority)
+                    with self._cond:
+                        if wait == 0.0:
+                            self.stats["granted"] += 1
+                            self.stats["waited_seconds"] += self._clock() - started
+                            return True
+                        self._short = True
+                        self._cond.notify_all()
+                else:
+                    wait = self._max_wait
+                if deadline is not None:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        with self._cond:
+                            self.stats["denied"] += 1
+                        return False
+                    wait = min(wait, remaining)
+                with self._cond:
+                    # Don't sleep through our turn if it came while unlocked.
+                    if first or self._waiters[0] != entry:
+                        self._cond.wait(min(wait, self._max_wait))
+        finally:
+            with self._cond:
+                if self._waiters[0] == entry:
+                    # The next caller has not tried the bucket yet.
+                    self._short = False
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    async def acquire_async(self, priority: int = BULK, timeout: Optional[float] = None) -> bool:
+        """
+        Async counterpart of acquire; waits in a worker thread so the event
+        loop keeps running.
+        """
+        return await asyncio.to_thread(self.acquire, priority, timeout)
+
+    def _acquire_or_raise(self, granted: bool, priority: int):
+        if not granted:
+            raise QuotaExhaustedError(f"No '{self.name}' quota available at priority {priority}.")
+
+    def guard(self, fetch: Callable[..., Any], priority: int = BULK,
+              timeout: Optional[float] = None) -> Callable[..., Any]:
+        """
+        Wraps an HTTPClient.get-style callable so each call first takes a token.
+        Raises QuotaExhaustedError instead of calling `fetch` on timeout.
+        """
+        def guarded(*args, **kwargs):
+            self._acquire_or_raise(self.acquire(priority, timeout), priority)
+            return fetch(*args, **kwargs)
+        return guarded
+
+    def guard_async(self, fetch: Callable[..., Any], priority: int = BULK,
+                    timeout: Optional[float] = None) -> Callable[..., Any]:
+        """
+        Async counterpart of guard for HTTPClient.aget and friends.
+        """
+        async def guarded(*args, **kwargs):
+            self._acquire_or_raise(await self.acquire_async(priority, timeout), priority)
+            return await fetch(*args, **kwargs)
+        return guarded
+
+    def remaining(self) -> float:
+        """
+        Returns the tokens currently in the bucket, without taking any.
+        """
+        if self.session_factory is not None:
+            db = self.session_factory()
+            try:
+                row = self._load_row(db, lock=False)
+                elapsed = self._clock() - (row.updated_at - datetime(1970, 1, 1)).total_seconds()
+                tokens = self._refill(row.tokens, elapsed)
+                db.commit()
+                return tokens
+            except Exception as e:
+                db.rollback()
+                logger.warning("Could not read quota '%s': %s", self.name, e)
+            finally:
+                db.close()
+        return self._refill(self._local_tokens, self._clock() - self._local_updated_at)
+
+    def queue_depth(self) -> int:
+        """
+        Returns the number of callers in this process waiting for a token.
+        """
+        with self._cond:
+            return len(self._waiters)
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            waiting = {"interactive": 0, "normal": 0, "bulk": 0}
+            for priority, _ in self._waiters:
+                if priority <= INTERACTIVE:
+                    waiting["interactive"] += 1
+                elif priority >= BULK:
+                    waiting["bulk"] += 1
+                else:
+                    waiting["normal"] += 1
+        return {
+            "name": self.name,
+            "capacity": self.capacity,
+            "remaining": round(self.remaining(), 2),
+            "interactive_reserve": self.interactive_reserve,
+            "refill_per_second": self.refill_per_second,
+            "queue_depth": sum(waiting.values()),
+            "waiting": waiting,
+            "stats": dict(self.stats),
+        }
+
+
+_shared_governor: Optional[QuotaGovernor] = None
+_shared_lock = threading.Lock()
+
+
+def _default_session_factory():
+    from app.db.client import SessionLocal
+    return SessionLocal()
+
+
+def get_quota_governor() -> QuotaGovernor:
+    """
+    Returns the process-wide SAM.gov governor configured from
+    SAM_API_DAILY_QUOTA and SAM_API_INTERACTIVE_RESERVE.
+    """
+    global _shared_governor
+    with _shared_lock:
+        if _shared_governor is None:
+            _shared_governor = QuotaGovernor.from_env(session_factory=_default_session_factory)
+    return _shared_governor
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Float
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -41,6 +41,7 @@ class ConversationLog(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     sender = Column(String) # 'AI' or 'Business'
     message = Column(Text)
+    delivery_status = Column(String, nullable=True) # For outbound messages: queued, sent or failed
 
     lead_id = Column(Integer, ForeignKey('leads.id'))
     lead = relationship("Lead", back_populates="conversations")
@@ -68,3 +69,90 @@ class Learning(Base):
 
     conversation_id = Column(Integer, ForeignKey('conversation_logs.id'))
     conversation = relationship("ConversationLog")
+    lead_id = Column(Integer, ForeignKey('leads.id'), nullable=True, index=True) # The lead whose conversation was analyzed
+    lead = relationship("Lead")
+
+class SamSyncState(Base):
+    __tablename__ = 'sam_sync_states'
+    id = Column(Integer, primary_key=True)
+    profile = Column(String(100), nullable=False, unique=True) # Name of the query profile being synced
+    watermark_posted_date = Column(DateTime) # Newest postedDate ingested so far
+    window_start = Column(DateTime) # postedFrom of the last completed sync window
+    window_total = Column(Integer) # totalRecords SAM.gov reported for that window
+    last_new_count = Column(Integer, default=0)
+    last_run_at = Column(DateTime)
+    last_success_at = Column(DateTime)
+
+class ApiQuota(Base):
+    __tablename__ = 'api_quotas'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False, unique=True) # e.g. 'sam.gov'
+    capacity = Column(Integer, nullable=False) # Bucket size (the daily request quota)
+    refill_per_second = Column(Float, nullable=False)
+    tokens = Column(Float, nullable=False) # Tokens left as of updated_at
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class OutboundMessage(Base):
+    __tablename__ = 'outbound_messages'
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False) # 'private_reply' or 'direct_message'
+    page_id = Column(String(100), nullable=False, index=True) # The sending page, for per-page rate limits
+    recipient_id = Column(String(255), nullable=False, index=True) # Comment ID for private replies, user ID for DMs
+    recipient_user_id = Column(String(255), index=True) # The person messaged, for the per-recipient interval
+    message = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default='queued', index=True) # queued, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    claimed_at = Column(DateTime) # When a worker took it; stale claims are retried
+    sent_at = Column(DateTime)
+    last_error = Column(Text)
+    graph_message_id = Column(String(255))
+    lead_status_on_sent = Column(String) # Lead status to set once delivered, if any
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    lead_id = Column(Integer, ForeignKey('leads.id'), nullable=True)
+    lead = relationship("Lead")
+    conversation_log_id = Column(Integer, ForeignKey('conversation_logs.id'), nullable=True)
+    conversation_log = relationship("ConversationLog")
+
+class WebhookEvent(Base):
+    __tablename__ = 'webhook_inbox'
+    id = Column(Integer, primary_key=True)
+    source = Column(String(50), nullable=False, default='facebook')
+    payload = Column(Text, nullable=False) # The raw request body, parsed by the worker
+    status = Column(String(20), nullable=False, default='pending', index=True) # pending, processing, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    claimed_at = Column(DateTime) # When a worker took it; stale claims are retried
+    processed_at = Column(DateTime)
+    last_error = Column(Text)
+    received_at = Column(DateTime, default=datetime.utcnow)
+
+class ProcessedEvent(Base):
+    __tablename__ = 'processed_events'
+    id = Column(Integer, primary_key=True)
+    event_key = Column(String(255), nullable=False, unique=True) # e.g. 'facebook:comment:<comment_id>'
+    source = Column(String(50), nullable=False, default='facebook')
+    processed_at = Column(DateTime, default=datetime.utcnow, index=True) # Rows past the retention window are purged
+
+class AnalysisBatch(Base):
+    __tablename__ = 'analysis_batches'
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(String(255), nullable=False, unique=True) # ID assigned by the batch backend
+    status = Column(String(20), nullable=False, default='submitted', index=True) # submitted, ingested, failed
+    lead_ids = Column(Text, nullable=False) # JSON list of the leads whose conversations are in the batch
+    request_count = Column(Integer, nullable=False, default=0)
+    ingested_count = Column(Integer, nullable=False, default=0)
+    input_path = Column(String(1024)) # The JSONL request file that was submitted
+    submitted_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+class ConversationState(Base):
+    __tablename__ = 'conversation_states'
+    id = Column(Integer, primary_key=True)
+    lead_id = Column(Integer, ForeignKey('leads.id'), nullable=False, unique=True)
+    summary = Column(Text) # Rolling summary of every message up to summarized_through_id
+    summarized_through_id = Column(Integer, nullable=False, default=0) # Last conversation_logs.id folded into the summary
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    lead = relationship("Lead")
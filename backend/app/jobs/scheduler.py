@@ -7,24 +7,37 @@ from datetime import datetime, timedelta
 # Add project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
+from app.core.container import get_container
 from app.db.client import SessionLocal
-from app.db.models import Lead, ConversationLog, Learning, Appointment
+from app.db.models import Lead, ConversationLog, Appointment
 from app.services.conversation_service import ConversationService
-from app.services.facebook_service import FacebookService
+from app.services.event_ledger import get_event_ledger
 from app.services.sam_service import SAMService
 from app.services.lead_service import LeadService
+from app.services.learning_service import BatchConversationAnalyzer, ConversationAnalyzer
+from app.services.outbound_queue import get_outbound_queue
+from app.services.psc_service import PSCService
+
+# Query profiles synced from SAM.gov. Each keeps its own watermark in
+# sam_sync_states, so profiles can be added without re-downloading the others.
+SAM_SYNC_PROFILES = [
+    {"profile": "default"},
+]
 
 def fetch_sam_opportunities_job():
     """
-    Fetches new opportunities from SAM.gov and stores them, then creates leads.
+    Syncs new opportunities from SAM.gov since each profile's watermark and
+    stores them, then creates leads. Lead creation runs even when nothing new
+    was synced, so opportunities left over from a failed run are picked up.
     """
     print("Scheduler: Running 'fetch_sam_opportunities_job'...")
     with SessionLocal() as db:
         try:
             # Step 1: Fetch and store new opportunities
-            sam_service = SAMService()
-            sam_service.fetch_and_store_opportunities(db)
-            print("Scheduler: SAM.gov fetch completed.")
+            sam_service = get_container().get(SAMService)
+            for profile in SAM_SYNC_PROFILES:
+                summary = sam_service.sync_opportunities(db, **profile)
+                print(f"Scheduler: SAM.gov profile '{summary['profile']}' {summary['status']} ({summary['new_count']} new).")
 
             # Step 2: Process newly stored opportunities to create leads
             lead_service = LeadService(db)
@@ -36,60 +49,73 @@ def fetch_sam_opportunities_job():
             print(f"Scheduler: An error occurred during SAM fetch job: {e}")
             db.rollback()
 
+def refresh_psc_catalog_job():
+    """
+    Refreshes the local PSC catalog from SAM.gov once it is older than a week,
+    so PSC lookups stay off the network.
+    """
+    print("Scheduler: Running 'refresh_psc_catalog_job'...")
+    try:
+        loaded = get_container().get(PSCService).refresh_catalog()
+        if loaded:
+            print(f"Scheduler: PSC catalog refreshed with {loaded} codes.")
+        else:
+            print("Scheduler: PSC catalog is current.")
+    except Exception as e:
+        print(f"Scheduler: An error occurred during PSC catalog refresh: {e}")
+
 def analyze_completed_conversations():
     """
     Finds completed leads that haven't been analyzed, analyzes their
-    conversations, and stores the insights in the 'learnings' table.
+    conversations concurrently, and stores the insights in the 'learnings'
+    table. See ConversationAnalyzer.
     """
     print("Scheduler: Running 'analyze_completed_conversations' job...")
-    with SessionLocal() as db:
-        conversation_service = ConversationService()
-        try:
-            completed_leads = db.query(Lead).filter(
-                Lead.status.in_(['Appointment Set', 'Disqualified']),
-                Lead.analyzed_for_learning.is_(False)
-            ).all()
-
-            if not completed_leads:
-                print("Scheduler: No new completed leads to analyze.")
-                return
-
-            leads_to_update = []
-            for lead in completed_leads:
-                print(f"Scheduler: Analyzing lead {lead.id}...")
-                conversation_logs = db.query(ConversationLog).filter(
-                    ConversationLog.lead_id == lead.id
-                ).order_by(ConversationLog.created_at).all()
-
-                if not conversation_logs:
-                    leads_to_update.append(lead.id)
-                    continue
-
-                history_for_analysis = [
-                    {"sender": str(log.sender), "text": str(log.message)} for log in conversation_logs
-                ]
-                analysis = conversation_service.analyze_conversation(history_for_analysis)
-
-                new_learning = Learning(
-                    lead_id=lead.id,
-                    outcome_tag=analysis.get('tag'),
-                    summary=analysis.get('summary')
-                )
-                db.add(new_learning)
-                leads_to_update.append(lead.id)
-
-            # Bulk update analyzed leads
-            if leads_to_update:
-                db.query(Lead).filter(Lead.id.in_(leads_to_update)).update(
-                    {"analyzed_for_learning": True}, synchronize_session=False
-                )
-
-            db.commit()
-            print(f"Scheduler: Successfully processed {len(completed_leads)} leads.")
-
-        except Exception as e:
-            print(f"Scheduler: An error occurred during analysis job: {e}")
-            db.rollback()
+    try:
+        analyzer = ConversationAnalyzer(get_container().get(ConversationService), session_factory=SessionLocal)
+        metrics = analyzer.run()
+        if not metrics["pending"]:
+            print("Scheduler: No new completed leads to analyze.")
+            return
+        print(
+            f"Scheduler: Analyzed {metrics['analyzed']} of {metrics['pending']} leads "
+            f"({metrics['skipped']} without conversation, {metrics['failed']} failed, {metrics['retries']} retries) "
+            f"in {metrics['elapsed_seconds']}s ({metrics['leads_per_minute']} leads/min)."
+        )
+    except Exception as e:
+        print(f"Scheduler: An error occurred during analysis job: {e}")
+
+def submit_analysis_batch_job():
+    """
+    Submits the conversations of all pending completed leads as one offline
+    analysis batch. Used instead of 'analyze_completed_conversations' when
+    ANALYSIS_MODE is "batch".
+    """
+    print("Scheduler: Running 'submit_analysis_batch_job'...")
+    try:
+        analyzer = BatchConversationAnalyzer(get_container().get(ConversationService), session_factory=SessionLocal)
+        submitted = analyzer.submit()
+        if submitted:
+            print(f"Scheduler: Submitted analysis batch {submitted['batch_id']} with {submitted['requests']} conversations.")
+        else:
+            print("Scheduler: No new completed leads to analyze.")
+    except Exception as e:
+        print(f"Scheduler: An error occurred while submitting the analysis batch: {e}")
+
+def collect_analysis_batches_job():
+    """
+    Ingests the results of finished offline analysis batches into 'learnings'.
+    """
+    print("Scheduler: Running 'collect_analysis_batches_job'...")
+    try:
+        analyzer = BatchConversationAnalyzer(get_container().get(ConversationService), session_factory=SessionLocal)
+        metrics = analyzer.collect()
+        print(
+            f"Scheduler: Checked {metrics['checked']} analysis batches: {metrics['ingested']} ingested "
+            f"({metrics['learnings']} learnings), {metrics['failed']} failed, {metrics['pending']} pending."
+        )
+    except Exception as e:
+        print(f"Scheduler: An error occurred while collecting analysis batches: {e}")
 
 def detect_no_shows_and_follow_up():
     """
@@ -98,7 +124,7 @@ def detect_no_shows_and_follow_up():
     """
     print("Scheduler: Running 'detect_no_shows_and_follow_up' job...")
     with SessionLocal() as db:
-        facebook_service = FacebookService()
+        outbound_queue = get_outbound_queue()
         try:
             now = datetime.utcnow()
             one_hour_ago = now - timedelta(hours=1)
@@ -125,16 +151,12 @@ def detect_no_shows_and_follow_up():
 
                 follow_up_message = "Hi there, it looks like we missed our meeting. I hope everything is alright. Please let me know if you'd like to reschedule."
                 
+                # Queued messages are logged to the lead's conversation.
                 if lead.business_name is not None:
-                    facebook_service.send_direct_message(lead.business_name, follow_up_message)
-
-                new_log = ConversationLog(
-                    lead_id=lead.id,
-                    sender="bot",
-                    message=follow_up_message,
-                    created_at=datetime.utcnow()
-                )
-                db.add(new_log)
+                    outbound_queue.enqueue(db, "direct_message", lead.business_name, follow_up_message,
+                                           lead_id=lead.id, commit=False)
+                else:
+                    db.add(ConversationLog(lead_id=lead.id, sender="bot", message=follow_up_message))
 
                 leads_to_update_status.append(lead.id)
                 appointments_to_update_status.append(appointment.id)
@@ -156,15 +178,44 @@ def detect_no_shows_and_follow_up():
             print(f"Scheduler: An error occurred during no-show detection job: {e}")
             db.rollback()
 
+def purge_processed_events_job():
+    """
+    Deletes webhook deduplication records older than the retention window.
+    """
+    print("Scheduler: Running 'purge_processed_events_job'...")
+    with SessionLocal() as db:
+        try:
+            deleted = get_event_ledger().purge_expired(db)
+            print(f"Scheduler: Purged {deleted} processed webhook events.")
+        except Exception as e:
+            print(f"Scheduler: An error occurred during processed event purge: {e}")
+            db.rollback()
+
 if __name__ == "__main__":
     print("Starting background job scheduler...")
     # Schedule the jobs to run.
-    schedule.every().day.at("01:00").do(fetch_sam_opportunities_job)
-    schedule.every(1).hour.do(analyze_completed_conversations)
+    schedule.every(5).minutes.do(fetch_sam_opportunities_job)
+    schedule.every().day.at("00:30").do(refresh_psc_catalog_job)
+    if os.environ.get("ANALYSIS_MODE", "realtime").lower() == "batch":
+        # Learnings are not urgent: analyze everything in one nightly batch.
+        schedule.every().day.at("02:00").do(submit_analysis_batch_job)
+        schedule.every(30).minutes.do(collect_analysis_batches_job)
+    else:
+        schedule.every(1).hour.do(analyze_completed_conversations)
     schedule.every(1).hour.do(detect_no_shows_and_follow_up)
+    schedule.every().day.at("01:00").do(purge_processed_events_job)
     
     # You can add other jobs here for Epic 5, like no-show detection.
 
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    refresh_psc_catalog_job()
+
+    # Deliver queued Facebook replies and DMs in the background.
+    get_outbound_queue().start()
+
+    try:
+        while True:
+            schedule.run_pending()
+            time.sleep(1)
+    finally:
+        get_outbound_queue().stop()
+        get_container().shutdown()
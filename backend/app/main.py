@@ -1,7 +1,17 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.router import api_router
 from app.core.config import settings
+from app.core.container import get_container
+from app.services.naics_service import NAICSService
+from app.services.outbound_queue import get_outbound_queue
+from app.services.webhook_inbox import get_webhook_inbox
+
+# Load the NAICS snapshot and indexes at import time so server workers forked
+# from this process (e.g. gunicorn --preload) share them instead of each
+# parsing the CSV.
+NAICSService.preload()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -20,6 +30,22 @@ if settings.BACKEND_CORS_ORIGINS:
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+def start_webhook_workers():
+    # Webhooks are acknowledged immediately and processed from the inbox. The
+    # private replies that processing queues are delivered from this process
+    # too, so they go out whether or not the scheduler is running.
+    get_webhook_inbox().start()
+    get_outbound_queue().start()
+
+@app.on_event("shutdown")
+async def stop_webhook_workers():
+    # Stopping joins the worker threads; do it off the event loop.
+    await run_in_threadpool(get_webhook_inbox().stop)
+    await run_in_threadpool(get_outbound_queue().stop)
+    # Async clients are closed on the loop that used them.
+    await get_container().ashutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the GovBidGenie API"}
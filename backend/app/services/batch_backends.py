@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+# Batch statuses after which no more results will appear. "expired" batches
+# may still carry the results of the requests that finished in time.
+FINISHED_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+
+def default_batch_dir() -> str:
+    return os.environ.get(
+        "OPENAI_BATCH_DIR",
+        os.path.join(tempfile.gettempdir(), "govbidgenie", "batches"),
+    )
+
+
+class OpenAIBatchBackend:
+    """
+    Runs JSONL request files through the OpenAI Batch API: the file is
+    uploaded, a batch is created against its endpoint with a 24h completion
+    window, and the output file is downloaded once the batch has finished.
+    """
+    def __init__(self, client: Any, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, path: str, endpoint: str) -> str:
+        """
+        Returns:
+            The batch ID.
+        """
+        with open(path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint=endpoint, completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def output_lines(self, batch_id: str) -> List[str]:
+        """
+        Returns the lines of the batch's output file (empty if it has none).
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        if not batch.output_file_id:
+            return []
+        return self.client.files.content(batch.output_file_id).text.splitlines()
+
+
+class LocalBatchBackend:
+    """
+    A stand-in for the OpenAI Batch API that works on local files, for tests
+    and development.
+
+    Input files are copied into `directory`; the first status() call runs
+    every request through `handler` (request body -> response body) and
+    writes an output file in the Batch API's format. A handler exception is
+    recorded as that request's error.
+    """
+    def __init__(self, handler: Callable[[Dict[str, Any]], Dict[str, Any]], directory: Optional[str] = None):
+        self.handler = handler
+        self.directory = directory or default_batch_dir()
+        self._lock = threading.Lock()
+
+    def _path(self, batch_id: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{batch_id}.{kind}.jsonl")
+
+    def submit(self, path: str, endpoint: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        batch_id = f"batch_local_{uuid.uuid4().hex}"
+        with open(path, encoding="utf-8") as src, open(self._path(batch_id, "input"), "w", encoding="utf-8") as dst:
+            dst.write(src.read())
+        return batch_id
+
+    def _run(self, batch_id: str):
+        output_path = self._path(batch_id, "output")
+        with open(self._path(batch_id, "input"), encoding="utf-8") as src, \
+                open(output_path + ".tmp", "w", encoding="utf-8") as dst:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                record = {"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"],
+                          "response": None, "error": None}
+                try:
+                    record["response"] = {"status_code": 200, "body": self.handler(request["body"])}
+                except Exception as e:
+                    record["error"] = {"code": type(e).__name__, "message": str(e)}
+                dst.write(json.dumps(record) + "\n")
+        os.replace(output_path + ".tmp", output_path)
+
+    def status(self, batch_id: str) -> str:
+        if not os.path.exists(self._path(batch_id, "input")):
+            return "failed"
+        with self._lock:
+            if not os.path.exists(self._path(batch_id, "output")):
+                self._run(batch_id)
+        return "completed"
+
+    def output_lines(self, batch_id: str) -> List[str]:
+        path = self._path(batch_id, "output")
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return f.read().splitlines()
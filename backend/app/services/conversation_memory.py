@@ -0,0 +1,106 @@
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models import ConversationLog, ConversationState
+from app.services.conversation_service import ConversationService
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationMemory:
+    """
+    Bounded per-lead conversation context: a rolling summary plus the most
+    recent turns.
+
+    The summary and the ID of the last message folded into it are kept in
+    `conversation_states`. load() reads only the messages after that ID, so
+    neither the query nor the prompt grows with the length of the
+    conversation. After each exchange, update() folds everything but the
+    last `recent_turns` messages (CONVERSATION_RECENT_TURNS, default 8) into
+    the summary. Messages are ordered by ID throughout, the same key the
+    watermark uses.
+    """
+    def __init__(self, conversation_service: ConversationService, recent_turns: Optional[int] = None,
+                 max_attempts: int = 3):
+        self.conversation_service = conversation_service
+        self.recent_turns = max(1, recent_turns if recent_turns is not None
+                                else int(os.environ.get("CONVERSATION_RECENT_TURNS", "8")))
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def _unsummarized(db: Session, lead_id: int, after_id: int) -> List[ConversationLog]:
+        return db.query(ConversationLog).filter(
+            ConversationLog.lead_id == lead_id,
+            ConversationLog.id > after_id
+        ).order_by(ConversationLog.id).all()
+
+    @staticmethod
+    def _turns(logs: List[ConversationLog]) -> List[Dict[str, str]]:
+        return [{"sender": str(log.sender), "text": str(log.message)} for log in logs]
+
+    def load(self, db: Session, lead_id: int) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """
+        Returns (summary, recent turns) for the lead, ready for
+        ConversationService.generate_response.
+        """
+        state = db.query(ConversationState).filter(ConversationState.lead_id == lead_id).first()
+        after_id = state.summarized_through_id if state else 0
+        return (state.summary if state else None), self._turns(self._unsummarized(db, lead_id, after_id))
+
+    def _state(self, db: Session, lead_id: int) -> ConversationState:
+        query = db.query(ConversationState).filter(ConversationState.lead_id == lead_id)
+        state = query.first()
+        if state is None:
+            db.add(ConversationState(lead_id=lead_id, summarized_through_id=0))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another request created it first.
+                db.rollback()
+            state = query.first()
+        return state
+
+    def update(self, db: Session, lead_id: int) -> bool:
+        """
+        Folds the messages older than the last `recent_turns` into the
+        lead's summary and commits.
+
+        No lock is held while the summary is generated. The result is saved
+        only if the watermark is still the one it was based on; if another
+        request advanced it meanwhile, the fold is redone from the new state.
+
+        Returns:
+            True if the summary was advanced.
+        """
+        for _ in range(self.max_attempts):
+            state = self._state(db, lead_id)
+            through_id, previous_summary = state.summarized_through_id, state.summary
+            older = self._unsummarized(db, lead_id, through_id)[:-self.recent_turns]
+            turns, last_id = self._turns(older), (older[-1].id if older else None)
+            # End the read transaction before the (slow) model call.
+            db.commit()
+            if not older:
+                return False
+
+            summary = self.conversation_service.summarize_conversation(previous_summary, turns)
+            if summary is None:
+                # Keep the turns verbatim and try again after the next exchange.
+                return False
+
+            saved = db.query(ConversationState).filter(
+                ConversationState.lead_id == lead_id,
+                ConversationState.summarized_through_id == through_id,
+            ).update({"summary": summary, "summarized_through_id": last_id, "updated_at": datetime.utcnow()},
+                     synchronize_session=False)
+            db.commit()
+            if saved:
+                logger.info(f"Folded {len(turns)} messages into the conversation summary of lead {lead_id}.")
+                return True
+            db.expire_all()
+        logger.warning(f"Gave up updating the conversation summary of lead {lead_id} after concurrent updates.")
+        return False
@@ -1,10 +1,122 @@
+import hashlib
 import os
-from openai import OpenAI
+import threading
+import time
+from collections import deque
+from openai import AsyncOpenAI, OpenAI
 import json
-from typing import List, Dict, Any
+from typing import AsyncIterator, Iterable, List, Dict, Any, Optional
+from app.core.cache import MISSING, VariantCache
 from app.db.models import Lead, ConversationLog
 from openai.types.chat import ChatCompletionMessageParam
 
+# The endpoint batch analysis requests are sent to.
+BATCH_ENDPOINT = "/v1/chat/completions"
+ANALYSIS_FAILED = {"tag": "ANALYSIS_FAILED", "summary": "An error occurred during conversation analysis."}
+RESPONSE_PROMPT = """
+        You are an expert government contract acquisition specialist continuing a conversation on Facebook. Your goal is to be helpful, build rapport, and guide the conversation towards booking a meeting.
+
+        Below is the conversation history. The last message is from the potential lead. Your task is to draft the next response from our side.
+
+        **Instructions:**
+        1.  Analyze the tone and intent of the lead's last message.
+        2.  Address their questions or comments directly and professionally.
+        3.  If they show interest, suggest scheduling a brief call and provide a hypothetical link (e.g., "calendly.com/our-team").
+        4.  If they seem hesitant or have objections, address their concerns concisely and offer more information.
+        5.  Keep the response professional, friendly, and concise (under 80 words).
+        6.  Do not use emojis.
+
+        **Conversation History:**
+        """
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a Facebook conversation between our government contracting team "
+    "and a potential lead. Update the current summary with the new messages. Keep the facts that matter "
+    "for continuing the conversation: the lead's business and needs, questions asked and answered, "
+    "objections, offers made, and any agreed next steps or times. Write at most 120 words of plain prose."
+)
+INITIAL_MESSAGE_FALLBACK = "Hello, we are a company that specializes in government contracts and we believe we can help you. Would you be open to a brief chat?"
+RESPONSE_FALLBACK = "Thank you for your response. Would you be available for a quick call next week to discuss this further?"
+
+
+class LatencyTracker:
+    """
+    Keeps the most recent time-to-first-token and total latency samples of
+    streamed responses and reports their percentiles.
+    """
+    def __init__(self, maxlen: int = 500):
+        self._ttft = deque(maxlen=maxlen)
+        self._total = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, ttft: Optional[float], total: float):
+        with self._lock:
+            if ttft is not None:
+                self._ttft.append(ttft)
+            self._total.append(total)
+
+    @staticmethod
+    def _summary(samples: List[float]) -> Dict[str, Any]:
+        if not samples:
+            return {"count": 0, "p50": None, "p95": None}
+        ordered = sorted(samples)
+        def percentile(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 4)
+        return {"count": len(ordered), "p50": percentile(0.50), "p95": percentile(0.95)}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ttft, total = list(self._ttft), list(self._total)
+        return {"time_to_first_token": self._summary(ttft), "total": self._summary(total)}
+
+
+_stream_latency = LatencyTracker()
+
+
+def stream_latency_stats() -> Dict[str, Any]:
+    """
+    Returns p50/p95 time-to-first-token and total latency, in seconds, of
+    recent streamed responses.
+    """
+    return _stream_latency.stats()
+
+
+# Outreach drafts shared by every ConversationService in the process. Leads for
+# the same opportunity get one of up to OUTREACH_VARIANTS drafts instead of a
+# fresh gpt-4o call each; pools are dropped after OUTREACH_CACHE_TTL seconds.
+_initial_message_cache = VariantCache(
+    maxsize=int(os.environ.get("OUTREACH_CACHE_SIZE", "1024")),
+    variants=int(os.environ.get("OUTREACH_VARIANTS", "3")),
+    ttl=float(os.environ.get("OUTREACH_CACHE_TTL", str(7 * 24 * 60 * 60))),
+)
+
+
+def initial_message_key(opportunity_title: str, agency_name: str, opportunity_description: str,
+                        **model_params: Any) -> str:
+    """
+    Hashes the prompt inputs and model parameters of an outreach draft.
+    Case and whitespace are normalized, so the same opportunity copied with
+    different formatting shares a key.
+    """
+    def normalize(value: Any) -> str:
+        return " ".join(str(value).lower().split())
+
+    payload = {
+        "title": normalize(opportunity_title),
+        "agency": normalize(agency_name),
+        "description": normalize(opportunity_description),
+        **model_params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def initial_message_cache_stats() -> Dict[str, Any]:
+    """
+    Returns hit/miss counters for the outreach draft cache, overall and for
+    the most reused opportunities.
+    """
+    return _initial_message_cache.stats()
+
+
 class ConversationService:
     def __init__(self):
         # It's good practice to load the API key from environment variables
@@ -13,14 +125,46 @@ class ConversationService:
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set.")
         self.client = OpenAI(api_key=self.api_key)
+        self._async_client: Optional[AsyncOpenAI] = None
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """
+        The AsyncOpenAI client used for streaming, created on first use.
+        """
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=self.api_key)
+        return self._async_client
+
+    def close(self):
+        """
+        Closes the OpenAI client's connection pool.
+        """
+        self.client.close()
+
+    async def aclose(self):
+        """
+        Closes the async client. Call it before a short-lived event loop (e.g.
+        one started with asyncio.run) ends; a new client is created on next use.
+        """
+        if self._async_client is not None:
+            client, self._async_client = self._async_client, None
+            await client.close()
 
     def generate_initial_message(self, lead: Dict[str, Any]) -> str:
         """
         Generates an initial message to a lead based on the opportunity details.
+        Drafts are cached per opportunity (see _initial_message_cache).
         """
         opportunity_title = lead.get('opportunity_title', 'N/A')
         opportunity_description = lead.get('opportunity_description', 'N/A')
         agency_name = lead.get('agency_name', 'N/A')
+        model_params = {"model": "gpt-4o", "temperature": 0.7, "max_tokens": 150}
+
+        cache_key = initial_message_key(opportunity_title, agency_name, opportunity_description, **model_params)
+        cached = _initial_message_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
 
         prompt = f"""
         You are an expert government contract acquisition specialist. Your task is to craft a compelling, concise, and professional initial outreach message to a potential government lead on Facebook.
@@ -43,45 +187,45 @@ class ConversationService:
 
         try:
             response = self.client.chat.completions.create(
-                model="gpt-4o",
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7,
-                max_tokens=150,
+                **model_params,
             )
             message_content = response.choices[0].message.content
-            return message_content.strip() if message_content else "Could not generate a message."
         except Exception as e:
             print(f"Error generating initial message: {e}")
-            return "Hello, we are a company that specializes in government contracts and we believe we can help you. Would you be open to a brief chat?"
-
-    def generate_response(self, conversation_history: List[Dict[str, str]]) -> str:
-        """
-        Generates a follow-up response based on the conversation history.
-        """
-        prompt = """
-        You are an expert government contract acquisition specialist continuing a conversation on Facebook. Your goal is to be helpful, build rapport, and guide the conversation towards booking a meeting.
+            return INITIAL_MESSAGE_FALLBACK
+        if not message_content:
+            return "Could not generate a message."
+        message = message_content.strip()
+        _initial_message_cache.add(cache_key, message, label=f"{opportunity_title} ({agency_name})")
+        return message
 
-        Below is the conversation history. The last message is from the potential lead. Your task is to draft the next response from our side.
-
-        **Instructions:**
-        1.  Analyze the tone and intent of the lead's last message.
-        2.  Address their questions or comments directly and professionally.
-        3.  If they show interest, suggest scheduling a brief call and provide a hypothetical link (e.g., "calendly.com/our-team").
-        4.  If they seem hesitant or have objections, address their concerns concisely and offer more information.
-        5.  Keep the response professional, friendly, and concise (under 80 words).
-        6.  Do not use emojis.
-
-        **Conversation History:**
-        """
-
-        messages_for_api: List[ChatCompletionMessageParam] = [{"role": "system", "content": prompt}]
+    @staticmethod
+    def _response_messages(conversation_history: List[Dict[str, str]],
+                           summary: Optional[str] = None) -> List[ChatCompletionMessageParam]:
+        # The instructions come first and never change, so the provider can
+        # cache that prefix; the per-lead summary and turns follow it.
+        messages_for_api: List[ChatCompletionMessageParam] = [{"role": "system", "content": RESPONSE_PROMPT}]
+        if summary:
+            messages_for_api.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
         for message in conversation_history:
             role = "assistant" if message['sender'] == 'bot' else "user"
             messages_for_api.append({"role": role, "content": message['text']}) # type: ignore
+        return messages_for_api
 
+    def generate_response(self, conversation_history: List[Dict[str, str]], summary: Optional[str] = None) -> str:
+        """
+        Generates a follow-up response based on the conversation history.
+
+        Args:
+            conversation_history: The turns to send verbatim, oldest first.
+            summary: A summary of the turns before those, if any
+                     (see ConversationMemory).
+        """
+        messages_for_api = self._response_messages(conversation_history, summary)
         try:
             response = self.client.chat.completions.create(
                 model="gpt-4o",
@@ -93,12 +237,78 @@ class ConversationService:
             return message_content.strip() if message_content else "Could not generate a response."
         except Exception as e:
             print(f"Error generating response: {e}")
-            return "Thank you for your response. Would you be available for a quick call next week to discuss this further?"
+            return RESPONSE_FALLBACK
 
-    def analyze_conversation(self, conversation_history: List[Dict[str, str]]) -> Dict[str, Any]:
+    async def generate_response_stream(self, conversation_history: List[Dict[str, str]],
+                                       timings: Optional[Dict[str, float]] = None,
+                                       summary: Optional[str] = None) -> AsyncIterator[str]:
         """
-        Analyzes the conversation to determine the outcome and summarize it.
+        Streaming counterpart of generate_response: yields the reply as text
+        deltas while gpt-4o produces it.
+
+        Time-to-first-token and total latency (seconds) are recorded for
+        stream_latency_stats and, if `timings` is given, stored in it under
+        "ttft" and "total". If the request fails before anything was
+        streamed, the fallback reply is yielded instead; a failure after that
+        is raised, so the caller can tell the reply was cut short.
         """
+        timings = timings if timings is not None else {}
+        started = time.perf_counter()
+        ttft = None
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model="gpt-4o",
+                messages=self._response_messages(conversation_history, summary),
+                temperature=0.7,
+                max_tokens=150,
+                stream=True,
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                    timings["ttft"] = ttft
+                yield delta
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+            if ttft is not None:
+                raise
+            yield RESPONSE_FALLBACK
+        finally:
+            timings["total"] = time.perf_counter() - started
+            _stream_latency.record(ttft, timings["total"])
+
+    def summarize_conversation(self, previous_summary: Optional[str], turns: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Folds `turns` into the rolling summary of a conversation.
+
+        Returns:
+            The new summary, or None if it could not be generated (the caller
+            should then keep the turns as they are).
+        """
+        transcript = "\n".join(
+            f"{'Us' if turn['sender'] == 'bot' else 'Lead'}: {turn['text']}" for turn in turns
+        )
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"}
+                ],
+                temperature=0,
+                max_tokens=250,
+            )
+            message_content = response.choices[0].message.content
+            return message_content.strip() if message_content else None
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
+            return None
+
+    @staticmethod
+    def _analysis_messages(conversation_history: List[Dict[str, str]]) -> List[ChatCompletionMessageParam]:
         prompt = f"""
         You are an AI assistant tasked with analyzing a conversation for a government contracting business.
         Based on the conversation history provided below, please determine the outcome and provide a brief summary.
@@ -119,30 +329,107 @@ class ConversationService:
 
         Provide only the JSON object in your response.
         """
+        return [
+            {"role": "system", "content": "You are an AI assistant that provides JSON responses."},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _parse_analysis(message_content: Optional[str]) -> Dict[str, Any]:
+        if not message_content:
+            raise ValueError("No content in response")
+        analysis = json.loads(message_content)
+        return {
+            "tag": analysis.get("tag", "NEEDS_MORE_INFO"),
+            "summary": analysis.get("summary", "Analysis failed.")
+        }
+
+    def analyze_conversation(self, conversation_history: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Analyzes the conversation to determine the outcome and summarize it.
+        """
         try:
             response = self.client.chat.completions.create(
                 model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are an AI assistant that provides JSON responses."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._analysis_messages(conversation_history),
                 response_format={"type": "json_object"},
                 temperature=0,
             )
-            message_content = response.choices[0].message.content
-            if not message_content:
-                raise ValueError("No content in response")
-            analysis = json.loads(message_content)
-            return {
-                "tag": analysis.get("tag", "NEEDS_MORE_INFO"),
-                "summary": analysis.get("summary", "Analysis failed.")
-            }
+            return self._parse_analysis(response.choices[0].message.content)
         except Exception as e:
             print(f"Error analyzing conversation: {e}")
-            return {
-                "tag": "ANALYSIS_FAILED",
-                "summary": "An error occurred during conversation analysis."
-            }
+            return dict(ANALYSIS_FAILED)
+
+    async def analyze_conversation_async(self, conversation_history: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Async counterpart of analyze_conversation. Errors are raised rather
+        than turned into an ANALYSIS_FAILED result, so callers can retry
+        rate-limited or failed requests.
+        """
+        response = await self.async_client.chat.completions.create(
+            model="gpt-4o",
+            messages=self._analysis_messages(conversation_history),
+            response_format={"type": "json_object"},
+            temperature=0,
+        )
+        return self._parse_analysis(response.choices[0].message.content)
+
+    def analysis_batch_request(self, custom_id: str, conversation_history: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Returns one line of an OpenAI batch input file: the analyze_conversation
+        request for `conversation_history`, tagged with `custom_id`.
+        """
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": "gpt-4o",
+                "messages": self._analysis_messages(conversation_history),
+                "response_format": {"type": "json_object"},
+                "temperature": 0,
+            },
+        }
+
+    def write_analysis_batch(self, path: str, conversations: Dict[str, List[Dict[str, str]]]) -> int:
+        """
+        Writes a JSONL batch input file with one analysis request per
+        conversation, keyed by custom_id.
+
+        Returns:
+            The number of requests written.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for custom_id, history in conversations.items():
+                f.write(json.dumps(self.analysis_batch_request(custom_id, history)) + "\n")
+        return len(conversations)
+
+    @classmethod
+    def parse_analysis_batch_output(cls, lines: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Parses the lines of a batch output file into {custom_id: analysis}.
+
+        Requests the batch could not complete (an error or a non-200 status)
+        are left out, so they can be submitted again. A completed request
+        whose answer cannot be parsed is reported as ANALYSIS_FAILED, as in
+        analyze_conversation.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                continue
+            try:
+                content = response["body"]["choices"][0]["message"]["content"]
+                results[record["custom_id"]] = cls._parse_analysis(content)
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                print(f"Error parsing batch analysis {record.get('custom_id')}: {e}")
+                results[record["custom_id"]] = dict(ANALYSIS_FAILED)
+        return results
 
 # Example Usage (for testing)
 if __name__ == '__main__':
@@ -1,13 +1,13 @@
 import os
-import requests
-from requests.auth import HTTPBasicAuth
-from typing import Dict, Any
+import httpx
+from typing import Dict, Any, Optional
+from app.core.http_client import HTTPClient, get_http_client
 
 class DevOpsService:
     """
     A service to interact with the Azure DevOps API.
     """
-    def __init__(self):
+    def __init__(self, http_client: Optional[HTTPClient] = None):
         self.org_url = os.environ.get("ADO_ORG_URL")
         self.project_name = "GovBidGenie"
         self.pat = os.environ.get("ADO_PAT")
@@ -15,7 +15,9 @@ class DevOpsService:
         if not self.org_url or not self.pat:
             raise ValueError("Azure DevOps credentials (ADO_ORG_URL, ADO_PAT) are not set in environment variables.")
         
-        self.auth = HTTPBasicAuth('', self.pat)
+        self.auth = httpx.BasicAuth('', self.pat)
+        # Pooled keep-alive transport shared with the other integrations.
+        self.http = http_client if http_client is not None else get_http_client()
 
         self.state_map = {
             "IDENTIFIED": "Identified",
@@ -55,9 +57,9 @@ class DevOpsService:
             {"op": "add", "path": "/fields/System.State", "value": "Identified"},
         ]
 
-        response = requests.post(url, json=body, headers=self._get_headers(), auth=self.auth)
+        response = self.http.post(url, json=body, headers=self._get_headers(), auth=self.auth)
         
-        if not response.ok:
+        if not response.is_success:
             print(f"ERROR: Failed to create work item. Status: {response.status_code}, Body: {response.text}")
             response.raise_for_status()
 
@@ -77,9 +79,9 @@ class DevOpsService:
             {"op": "add", "path": "/fields/System.State", "value": devops_state},
         ]
 
-        response = requests.patch(url, json=body, headers=self._get_headers(), auth=self.auth)
+        response = self.http.patch(url, json=body, headers=self._get_headers(), auth=self.auth)
         
-        if not response.ok:
+        if not response.is_success:
             print(f"ERROR: Failed to update work item. Status: {response.status_code}, Body: {response.text}")
             response.raise_for_status()
 
@@ -100,9 +102,9 @@ class DevOpsService:
             "text": comment_text
         }
 
-        response = requests.post(url, json=body, headers=self._get_comment_headers(), auth=self.auth)
+        response = self.http.post(url, json=body, headers=self._get_comment_headers(), auth=self.auth)
         
-        if not response.ok:
+        if not response.is_success:
             print(f"ERROR: Failed to add comment. Status: {response.status_code}, Body: {response.text}")
             response.raise_for_status()
             
@@ -0,0 +1,189 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.cache import MISSING, TTLCache
+from app.db.models import ProcessedEvent
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = float(os.environ.get("PROCESSED_EVENT_RETENTION_DAYS", "7"))
+
+
+def comment_event_key(comment_id: str) -> str:
+    return f"facebook:comment:{comment_id}"
+
+
+def delivery_event_key(digest: str) -> str:
+    return f"facebook:delivery:{digest}"
+
+
+class EventLedger:
+    """
+    Remembers which webhook events have already been processed, so Facebook
+    redeliveries are dropped before any NAICS, SAM.gov or Graph API call.
+
+    Each event is one row in `processed_events`, keyed by a unique
+    `event_key`, so checking for a duplicate is a single index lookup. Keys
+    claimed recently are also held in memory, which lets hot redeliveries be
+    dropped without touching the database. Rows are kept for the retention
+    window (PROCESSED_EVENT_RETENTION_DAYS, default 7); an expired key counts
+    as new again and purge_expired deletes the old rows.
+
+    claim() commits the key on its own. Where the event's effects are written
+    to the database, use is_processed() + record() instead so the keys are
+    committed in the same transaction as those effects, then remember() them
+    after the commit: a crash before the commit then leaves the event
+    unprocessed rather than marked as done.
+    """
+    def __init__(self, retention: timedelta = timedelta(days=RETENTION_DAYS), cache: Optional[TTLCache] = None,
+                 clock: Callable[[], datetime] = datetime.utcnow):
+        self.retention = retention
+        self._recent = cache if cache is not None else TTLCache(maxsize=10000, ttl=retention.total_seconds())
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.stats = {"claimed": 0, "duplicates_dropped": 0, "released": 0, "purged": 0}
+        self.duplicates_by_source: Dict[str, int] = {}
+
+    def _count_duplicate(self, key: str, source: str):
+        with self._lock:
+            self.stats["duplicates_dropped"] += 1
+            self.duplicates_by_source[source] = self.duplicates_by_source.get(source, 0) + 1
+        logger.info(f"Dropping duplicate event {key}")
+
+    def claim(self, db: Session, key: str, source: str = "facebook") -> bool:
+        """
+        Records `key` as processed and commits.
+
+        Returns:
+            True if the event is new and should be processed, False if it was
+            already claimed within the retention window.
+        """
+        if self._recent.get(key) is not MISSING:
+            self._count_duplicate(key, source)
+            return False
+
+        now = self._clock()
+        db.add(ProcessedEvent(event_key=key, source=source, processed_at=now))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            existing = db.query(ProcessedEvent).filter(ProcessedEvent.event_key == key).first()
+            if existing is not None and existing.processed_at >= now - self.retention:
+                self._recent.set(key, True)
+                self._count_duplicate(key, source)
+                return False
+            if existing is not None:
+                # Past the retention window but not purged yet.
+                existing.processed_at = now
+                db.commit()
+
+        self._recent.set(key, True)
+        with self._lock:
+            self.stats["claimed"] += 1
+        return True
+
+    def is_processed(self, db: Session, key: str, source: str = "facebook") -> bool:
+        """
+        Tells whether `key` was recorded within the retention window, counting
+        it as a dropped duplicate if so.
+        """
+        if self._recent.get(key) is not MISSING:
+            self._count_duplicate(key, source)
+            return True
+        existing = db.query(ProcessedEvent).filter(ProcessedEvent.event_key == key).first()
+        if existing is not None and existing.processed_at >= self._clock() - self.retention:
+            self._recent.set(key, True)
+            self._count_duplicate(key, source)
+            return True
+        return False
+
+    def record(self, db: Session, keys: Iterable[str], source: str = "facebook"):
+        """
+        Adds the keys to the session without committing. The commit raises
+        IntegrityError if another worker recorded one of them first.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return
+        now = self._clock()
+        existing = {
+            row.event_key: row
+            for row in db.query(ProcessedEvent).filter(ProcessedEvent.event_key.in_(keys))
+        }
+        for key in keys:
+            if key in existing:
+                # Past the retention window but not purged yet.
+                existing[key].processed_at = now
+            else:
+                db.add(ProcessedEvent(event_key=key, source=source, processed_at=now))
+
+    def remember(self, keys: Iterable[str]):
+        """
+        Caches keys whose record() was committed.
+        """
+        keys = list(keys)
+        for key in keys:
+            self._recent.set(key, True)
+        with self._lock:
+            self.stats["claimed"] += len(keys)
+
+    def release(self, db: Session, key: str):
+        """
+        Forgets a claimed key, e.g. when processing failed and the event
+        should be accepted again on retry.
+        """
+        self._recent.pop(key)
+        db.query(ProcessedEvent).filter(ProcessedEvent.event_key == key).delete(synchronize_session=False)
+        db.commit()
+        with self._lock:
+            self.stats["released"] += 1
+
+    def purge_expired(self, db: Session) -> int:
+        """
+        Deletes rows older than the retention window.
+
+        Returns:
+            The number of rows deleted.
+        """
+        cutoff = self._clock() - self.retention
+        deleted = (
+            db.query(ProcessedEvent)
+            .filter(ProcessedEvent.processed_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        with self._lock:
+            self.stats["purged"] += deleted
+        return deleted
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "retention_days": self.retention.total_seconds() / 86400,
+                "stats": dict(self.stats),
+                "duplicates_by_source": dict(self.duplicates_by_source),
+                "cache": self._recent.stats(),
+            }
+
+
+_shared_ledger: Optional[EventLedger] = None
+_shared_lock = threading.Lock()
+
+
+def get_event_ledger() -> EventLedger:
+    """
+    Returns the process-wide ledger configured from
+    PROCESSED_EVENT_RETENTION_DAYS.
+    """
+    global _shared_ledger
+    with _shared_lock:
+        if _shared_ledger is None:
+            _shared_ledger = EventLedger()
+    return _shared_ledger
@@ -1,14 +1,55 @@
 import os
-import requests
-from typing import Dict, Any, Optional
+import json
+from typing import Dict, Any, Iterable, List, Optional
+from urllib.parse import urlencode
+from app.core.cache import MISSING, TTLCache
+from app.core.http_client import HTTPClient, get_http_client
 from app.db.models import Opportunity
 
+# Lookup caches shared by every FacebookService in the process. Found pages and
+# profiles are kept for FACEBOOK_CACHE_TTL seconds, "nothing found" answers
+# for the shorter FACEBOOK_NEGATIVE_CACHE_TTL so new pages show up eventually.
+CACHE_TTL = float(os.environ.get("FACEBOOK_CACHE_TTL", str(24 * 60 * 60)))
+NEGATIVE_CACHE_TTL = float(os.environ.get("FACEBOOK_NEGATIVE_CACHE_TTL", str(6 * 60 * 60)))
+_page_search_cache = TTLCache(maxsize=4096, ttl=CACHE_TTL)
+_page_info_cache = TTLCache(maxsize=4096, ttl=CACHE_TTL)
+_user_profile_cache = TTLCache(maxsize=4096, ttl=CACHE_TTL)
+# Errors that say nothing about whether the object exists, so are not cached.
+_TRANSIENT_STATUSES = {401, 403, 429}
+
+
+def normalize_page_query(page_name: str) -> str:
+    """
+    Normalizes a page search so "ACME  Corp" and "acme corp" share a cache entry.
+    """
+    return " ".join(page_name.lower().split())
+
+
+def lookup_cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Returns hit/miss counters for the shared Graph lookup caches.
+    """
+    return {
+        "page_search": _page_search_cache.stats(),
+        "page_info": _page_info_cache.stats(),
+        "user_profile": _user_profile_cache.stats(),
+    }
+
 class FacebookService:
     """
     Service to interact with the Facebook Graph API for managing a Page,
     including posting content and sending private replies to comments.
     """
-    def __init__(self):
+    GRAPH_URL = "https://graph.facebook.com/v20.0"
+    # The Graph API accepts at most 50 sub-requests per batch call.
+    GRAPH_BATCH_LIMIT = 50
+    PAGE_INFO_FIELDS = 'id,name,category'
+    USER_PROFILE_FIELDS = 'id,name'
+    PAGE_SEARCH_FIELDS = 'id,name'
+
+    def __init__(self, http_client: Optional[HTTPClient] = None, page_search_cache: Optional[TTLCache] = None,
+                 page_info_cache: Optional[TTLCache] = None, user_profile_cache: Optional[TTLCache] = None,
+                 negative_ttl: float = NEGATIVE_CACHE_TTL):
         self.page_id = os.environ.get("FACEBOOK_PAGE_ID")
         self.access_token = os.environ.get("FACEBOOK_PAGE_ACCESS_TOKEN")
         self.app_id = os.environ.get("FACEBOOK_APP_ID")
@@ -21,6 +62,12 @@ class FacebookService:
             )
             
         self.base_url = f"https://graph.facebook.com/v20.0/{self.page_id}"
+        # Pooled keep-alive transport shared with the other integrations.
+        self.http = http_client if http_client is not None else get_http_client()
+        self.page_search_cache = page_search_cache if page_search_cache is not None else _page_search_cache
+        self.page_info_cache = page_info_cache if page_info_cache is not None else _page_info_cache
+        self.user_profile_cache = user_profile_cache if user_profile_cache is not None else _user_profile_cache
+        self.negative_ttl = negative_ttl
 
     def send_private_reply(self, comment_id: str, message: str) -> Dict[str, Any]:
         """
@@ -43,9 +90,9 @@ class FacebookService:
             "tag": "CONFIRMED_EVENT_UPDATE" # Or another appropriate tag
         }
 
-        response = requests.post(endpoint, headers=headers, params=params, json=payload)
+        response = self.http.post(endpoint, headers=headers, params=params, json=payload)
         
-        if not response.ok:
+        if not response.is_success:
             print(f"ERROR: Failed to send private reply. Status: {response.status_code}, Body: {response.text}")
             response.raise_for_status()
             
@@ -79,28 +126,42 @@ class FacebookService:
             'access_token': self.access_token
         }
 
-        response = requests.post(endpoint, params=params)
+        response = self.http.post(endpoint, params=params)
 
-        if not response.ok:
+        if not response.is_success:
             print(f"ERROR: Failed to share and mention. Status: {response.status_code}, Body: {response.text}")
             response.raise_for_status()
             
         return response.json()
 
-    def send_outreach_dm(self, recipient_id: str, commenter_name: str, opportunity: Opportunity) -> Dict[str, Any]:
+    @staticmethod
+    def build_outreach_message(commenter_name: str, opportunity: Opportunity) -> str:
         """
-        Sends a personalized outreach DM to a specific user (recipient).
+        Builds the personalized outreach DM text for an opportunity.
         """
-        endpoint = f"https://graph.facebook.com/v20.0/me/messages"
-        
-        message = (
+        return (
             f"Hi {commenter_name}, thanks for your comment! "
             f"I saw that you're in the business of {opportunity.agency} and thought you might be "
             f"interested in a contract opportunity for '{opportunity.title}'. "
             f"You can see the details here: {opportunity.url}. "
             "Would you be open to a brief chat about it?"
         )
-        
+
+    def send_outreach_dm(self, recipient_id: str, commenter_name: str, opportunity: Opportunity) -> Dict[str, Any]:
+        """
+        Sends a personalized outreach DM to a specific user (recipient).
+        """
+        return self.send_direct_message(recipient_id, self.build_outreach_message(commenter_name, opportunity))
+
+    def send_direct_message(self, recipient_id: str, message: str) -> Dict[str, Any]:
+        """
+        Sends a DM with the given text to a specific user (recipient).
+
+        Returns:
+            The JSON response from the Facebook API.
+        """
+        endpoint = f"https://graph.facebook.com/v20.0/me/messages"
+
         payload = {
             "recipient": {"id": recipient_id},
             "message": {"text": message},
@@ -110,9 +171,9 @@ class FacebookService:
         
         params = {'access_token': self.access_token}
 
-        response = requests.post(endpoint, params=params, json=payload)
+        response = self.http.post(endpoint, params=params, json=payload)
         
-        if not response.ok:
+        if not response.is_success:
             print(f"ERROR: Failed to send DM. Status: {response.status_code}, Body: {response.text}")
             response.raise_for_status()
             
@@ -121,39 +182,63 @@ class FacebookService:
     def get_page_info(self, page_id: str) -> Optional[Dict[str, Any]]:
         """
         Fetches basic public information for a given Page ID.
+        Answers, including "no such page", are cached (see page_info_cache).
         """
-        endpoint = f"https://graph.facebook.com/v20.0/{page_id}"
-        params = {
-            'fields': 'id,name,category',
-            'access_token': self.access_token
-        }
+        cached = self.page_info_cache.get(page_id)
+        if cached is not MISSING:
+            return cached
+        response = self.http.get(f"{self.GRAPH_URL}/{page_id}", params=self._object_params(self.PAGE_INFO_FIELDS))
+        return self._object_from_response(self.page_info_cache, page_id, response, "page info")
 
-        response = requests.get(endpoint, params=params)
-
-        if not response.ok:
-            print(f"ERROR: Failed to get page info for ID '{page_id}'. Status: {response.status_code}, Body: {response.text}")
-            return None
-        
-        return response.json()
+    async def get_page_info_async(self, page_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Async counterpart of get_page_info, sharing its cache.
+        """
+        cached = self.page_info_cache.get(page_id)
+        if cached is not MISSING:
+            return cached
+        response = await self.http.aget(f"{self.GRAPH_URL}/{page_id}", params=self._object_params(self.PAGE_INFO_FIELDS))
+        return self._object_from_response(self.page_info_cache, page_id, response, "page info")
 
     def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
         Fetches public profile information for a given User ID.
         This may require specific permissions depending on what is being accessed.
+        Answers are cached like get_page_info's.
         """
-        endpoint = f"https://graph.facebook.com/v20.0/{user_id}"
-        params = {
-            'fields': 'id,name', # Basic fields are generally available
+        cached = self.user_profile_cache.get(user_id)
+        if cached is not MISSING:
+            return cached
+        # Basic fields are generally available
+        response = self.http.get(f"{self.GRAPH_URL}/{user_id}", params=self._object_params(self.USER_PROFILE_FIELDS))
+        return self._object_from_response(self.user_profile_cache, user_id, response, "user profile")
+
+    async def get_user_profile_async(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Async counterpart of get_user_profile, sharing its cache.
+        """
+        cached = self.user_profile_cache.get(user_id)
+        if cached is not MISSING:
+            return cached
+        response = await self.http.aget(f"{self.GRAPH_URL}/{user_id}",
+                                        params=self._object_params(self.USER_PROFILE_FIELDS))
+        return self._object_from_response(self.user_profile_cache, user_id, response, "user profile")
+
+    def _object_params(self, fields: str) -> Dict[str, str]:
+        return {
+            'fields': fields,
             'access_token': self.access_token
         }
 
-        response = requests.get(endpoint, params=params)
-
-        if not response.ok:
-            print(f"ERROR: Failed to get user profile for ID '{user_id}'. Status: {response.status_code}, Body: {response.text}")
+    def _object_from_response(self, cache: TTLCache, object_id: str, response, label: str) -> Optional[Dict[str, Any]]:
+        if not response.is_success:
+            print(f"ERROR: Failed to get {label} for ID '{object_id}'. Status: {response.status_code}, Body: {response.text}")
+            self._cache_failure(cache, object_id, response.status_code)
             return None
-        
-        return response.json()
+
+        body = response.json()
+        cache.set(object_id, body)
+        return body
 
     def find_page_by_name(self, page_name: str) -> Optional[Dict[str, str]]:
         """
@@ -162,20 +247,40 @@ class FacebookService:
         Args:
             page_name: The name of the page to search for.
 
+        Results are cached by normalized query; searches that find nothing are
+        cached for the shorter negative TTL so they are not retried every run.
+
         Returns:
             A dictionary containing the page ID and name if a page is found, otherwise None.
         """
-        endpoint = "https://graph.facebook.com/v20.0/pages/search"
-        params = {
+        cache_key = normalize_page_query(page_name)
+        cached = self.page_search_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+        response = self.http.get(f"{self.GRAPH_URL}/pages/search", params=self._page_search_params(page_name))
+        return self._page_from_search_response(cache_key, page_name, response)
+
+    async def find_page_by_name_async(self, page_name: str) -> Optional[Dict[str, str]]:
+        """
+        Async counterpart of find_page_by_name, sharing its cache.
+        """
+        cache_key = normalize_page_query(page_name)
+        cached = self.page_search_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+        response = await self.http.aget(f"{self.GRAPH_URL}/pages/search", params=self._page_search_params(page_name))
+        return self._page_from_search_response(cache_key, page_name, response)
+
+    def _page_search_params(self, page_name: str) -> Dict[str, Any]:
+        return {
             'q': page_name,
-            'fields': 'id,name',
+            'fields': self.PAGE_SEARCH_FIELDS,
             'limit': 1, # We only want the most likely result
             'access_token': self.access_token
         }
 
-        response = requests.get(endpoint, params=params)
-
-        if not response.ok:
+    def _page_from_search_response(self, cache_key: str, page_name: str, response) -> Optional[Dict[str, str]]:
+        if not response.is_success:
             print(f"ERROR: Failed to search for page '{page_name}'. Status: {response.status_code}, Body: {response.text}")
             return None
         
@@ -183,7 +288,132 @@ class FacebookService:
         if data:
             top_result = data[0]
             print(f"Found page '{top_result['name']}' with ID {top_result['id']} for search term '{page_name}'")
+            self.page_search_cache.set(cache_key, top_result)
             return top_result
         else:
             print(f"No Facebook Page found for search term '{page_name}'")
+            self.page_search_cache.set(cache_key, None, ttl=self.negative_ttl)
             return None
+
+    def _cache_failure(self, cache: TTLCache, key: str, status_code: int):
+        """
+        Negatively caches a failed lookup unless the failure was transient
+        (auth, permissions or throttling) rather than about the object itself.
+        """
+        if 400 <= status_code < 500 and status_code not in _TRANSIENT_STATUSES:
+            cache.set(key, None, ttl=self.negative_ttl)
+
+    def graph_batch(self, sub_requests: List[Dict[str, Any]]) -> List[Optional[Any]]:
+        """
+        Sends Graph API sub-requests as batch calls, GRAPH_BATCH_LIMIT per
+        round-trip, and returns their decoded bodies in the same order.
+
+        Args:
+            sub_requests: Dicts such as {"method": "GET", "relative_url": "me?fields=id"}.
+
+        Returns:
+            One entry per sub-request: the decoded JSON body, or None if that
+            sub-request (or the batch call carrying it) failed.
+        """
+        results: List[Optional[Any]] = []
+        for start in range(0, len(sub_requests), self.GRAPH_BATCH_LIMIT):
+            chunk = sub_requests[start:start + self.GRAPH_BATCH_LIMIT]
+            data = {
+                'access_token': self.access_token,
+                'batch': json.dumps(chunk),
+                'include_headers': 'false',
+            }
+            response = self.http.post(f"{self.GRAPH_URL}/", data=data)
+
+            if not response.is_success:
+                print(f"ERROR: Graph batch call failed. Status: {response.status_code}, Body: {response.text}")
+                results.extend([None] * len(chunk))
+                continue
+
+            # Sub-responses come back in request order; null means the
+            # sub-request timed out inside Facebook.
+            items = response.json() or []
+            for index, sub_request in enumerate(chunk):
+                item = items[index] if index < len(items) else None
+                if not item or item.get('code') != 200:
+                    print(f"ERROR: Graph batch request '{sub_request.get('relative_url')}' failed: {item}")
+                    results.append(None)
+                    continue
+                try:
+                    results.append(json.loads(item.get('body') or 'null'))
+                except ValueError:
+                    results.append(None)
+        return results
+
+    def _batch_get(self, relative_urls: Dict[str, str]) -> Dict[str, Optional[Any]]:
+        """
+        Batches one GET per key and fans the bodies back out by key.
+        """
+        keys = list(relative_urls)
+        bodies = self.graph_batch([{"method": "GET", "relative_url": relative_urls[key]} for key in keys])
+        return dict(zip(keys, bodies))
+
+    def _cached_batch_get(self, cache: TTLCache, ids: Iterable[str], fields: str) -> Dict[str, Optional[Any]]:
+        """
+        Serves what it can from `cache` and batches the rest. Only successful
+        answers are cached: a failed sub-request carries no reliable status.
+        """
+        results: Dict[str, Optional[Any]] = {}
+        to_fetch: Dict[str, str] = {}
+        for object_id in dict.fromkeys(ids):
+            cached = cache.get(object_id)
+            if cached is not MISSING:
+                results[object_id] = cached
+            else:
+                to_fetch[object_id] = f"{object_id}?{urlencode({'fields': fields})}"
+        for object_id, body in self._batch_get(to_fetch).items():
+            if body is not None:
+                cache.set(object_id, body)
+            results[object_id] = body
+        return results
+
+    def get_page_infos(self, page_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Batched get_page_info: returns {page_id: page info or None}.
+        """
+        return self._cached_batch_get(self.page_info_cache, page_ids, self.PAGE_INFO_FIELDS)
+
+    def get_user_profiles(self, user_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Batched get_user_profile: returns {user_id: profile or None}.
+        """
+        return self._cached_batch_get(self.user_profile_cache, user_ids, self.USER_PROFILE_FIELDS)
+
+    def find_pages_by_names(self, page_names: Iterable[str]) -> Dict[str, Optional[Dict[str, str]]]:
+        """
+        Batched find_page_by_name. Names that normalize to the same query are
+        searched once, and cached answers are not searched at all.
+
+        Returns:
+            {page_name: top matching page or None}.
+        """
+        names_by_query: Dict[str, List[str]] = {}
+        for name in dict.fromkeys(page_names):
+            names_by_query.setdefault(normalize_page_query(name), []).append(name)
+
+        pages_by_query: Dict[str, Optional[Dict[str, str]]] = {}
+        to_fetch: Dict[str, str] = {}
+        for query, names in names_by_query.items():
+            cached = self.page_search_cache.get(query)
+            if cached is not MISSING:
+                pages_by_query[query] = cached
+            else:
+                to_fetch[query] = (
+                    f"pages/search?{urlencode({'q': names[0], 'fields': self.PAGE_SEARCH_FIELDS, 'limit': 1})}"
+                )
+
+        for query, body in self._batch_get(to_fetch).items():
+            if body is None:
+                pages_by_query[query] = None # The call failed; try again next time.
+                continue
+            data = body.get('data') or []
+            page = data[0] if data else None
+            self.page_search_cache.set(query, page, ttl=None if page else self.negative_ttl)
+            pages_by_query[query] = page
+
+        return {name: pages_by_query[query] for query, names in names_by_query.items() for name in names}
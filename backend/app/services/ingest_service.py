@@ -0,0 +1,114 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.db.models import Lead, Opportunity
+
+# Columns copied from a parsed SAM.gov record (see SAMService._parse_opportunities).
+OPPORTUNITY_FIELDS = ("sam_gov_id", "title", "url", "agency", "posted_date", "description")
+
+
+class IngestService:
+    """
+    Writes batches of parsed opportunities (and optionally their placeholder
+    leads) in a single transaction with INSERT ... ON CONFLICT (sam_gov_id)
+    DO NOTHING, instead of one duplicate-check SELECT and commit per row.
+    """
+    def __init__(self, db_session: Session, chunk_size: int = 500):
+        self.db = db_session
+        self.chunk_size = chunk_size
+
+    def _dialect_insert(self):
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            return None
+        return dialect_insert
+
+    def bulk_upsert_opportunities(
+        self,
+        opportunities: List[Dict[str, Any]],
+        lead_status: Optional[str] = None,
+        lead_business_name: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """
+        Inserts the opportunities that aren't stored yet and skips the rest.
+
+        Args:
+            opportunities: Parsed opportunity dicts. Records without a
+                           sam_gov_id or title, and repeats within the batch,
+                           are skipped.
+            lead_status: If given, a Lead with this status is created for every
+                         newly inserted opportunity, in the same transaction.
+            lead_business_name: business_name for those leads.
+
+        Returns:
+            A dict with `inserted`, `skipped` and `leads_created` counts.
+        """
+        rows = []
+        seen_ids = set()
+        for opp_data in opportunities:
+            sam_id = opp_data.get('sam_gov_id')
+            if not sam_id or not opp_data.get('title') or sam_id in seen_ids:
+                continue
+            seen_ids.add(sam_id)
+            row = {field: opp_data.get(field) for field in OPPORTUNITY_FIELDS}
+            if row['posted_date'] is not None and row['posted_date'].tzinfo is not None:
+                row['posted_date'] = row['posted_date'].replace(tzinfo=None)
+            rows.append(row)
+
+        inserted_ids: List[int] = []
+        try:
+            for start in range(0, len(rows), self.chunk_size):
+                inserted_ids.extend(self._insert_chunk(rows[start:start + self.chunk_size]))
+
+            leads_created = 0
+            if lead_status is not None and inserted_ids:
+                self.db.execute(insert(Lead), [
+                    {"opportunity_id": opportunity_id, "status": lead_status, "business_name": lead_business_name}
+                    for opportunity_id in inserted_ids
+                ])
+                leads_created = len(inserted_ids)
+
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return {
+            "inserted": len(inserted_ids),
+            "skipped": len(opportunities) - len(inserted_ids),
+            "leads_created": leads_created,
+        }
+
+    def _insert_chunk(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        Inserts one chunk and returns the ids of the rows that were new.
+        """
+        if not rows:
+            return []
+
+        dialect_insert = self._dialect_insert()
+        if dialect_insert is not None:
+            statement = (
+                dialect_insert(Opportunity)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=[Opportunity.sam_gov_id])
+                .returning(Opportunity.id)
+            )
+            return [row[0] for row in self.db.execute(statement)]
+
+        # Generic fallback: one SELECT for the whole chunk, then a bulk insert.
+        existing = {
+            sam_id for (sam_id,) in self.db.query(Opportunity.sam_gov_id)
+            .filter(Opportunity.sam_gov_id.in_([row['sam_gov_id'] for row in rows]))
+        }
+        new_rows = [row for row in rows if row['sam_gov_id'] not in existing]
+        if not new_rows:
+            return []
+        result = self.db.execute(insert(Opportunity).returning(Opportunity.id), new_rows)
+        return [row[0] for row in result]
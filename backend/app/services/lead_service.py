@@ -1,8 +1,16 @@
+import asyncio
 import logging
+import os
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from app.core.container import ServiceContainer, get_container
 from app.db.models import Opportunity, Lead
-from app.services.facebook_service import FacebookService
+from app.core.quota import BULK, INTERACTIVE
+from app.services.event_ledger import comment_event_key, get_event_ledger
+from app.services.facebook_service import FacebookService, normalize_page_query
 from app.services.naics_service import NAICSService
+from app.services.outbound_queue import get_outbound_queue
 from app.services.psc_service import PSCService
 from app.services.sam_service import SAMService
 from datetime import datetime
@@ -12,12 +20,15 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 class LeadService:
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: Session, services: Optional[ServiceContainer] = None):
         self.db = db_session
-        self.facebook_service = FacebookService()
-        self.naics_service = NAICSService()
-        self.psc_service = PSCService()
-        self.sam_service = SAMService()
+        # The integrations are shared per process; see ServiceContainer.
+        services = services if services is not None else get_container()
+        self.facebook_service = services.get(FacebookService)
+        self.naics_service = services.get(NAICSService)
+        self.psc_service = services.get(PSCService)
+        self.sam_service = services.get(SAMService)
+        self.event_ledger = get_event_ledger()
 
     def get_lead_by_sam_id(self, sam_gov_id: str) -> Lead | None:
         """
@@ -60,9 +71,14 @@ class LeadService:
             lead.azure_devops_work_item_id = ado_id
             self.db.commit()
 
-    def process_new_opportunities(self):
+    def process_new_opportunities(self, concurrency: Optional[int] = None, commit_every: int = 50):
         """
         Processes new opportunities that haven't been converted into leads yet.
+
+        By default every distinct search term is looked up through batched
+        Graph calls. With `concurrency`, opportunities are instead prospected
+        concurrently (see prospect_opportunities_async), at most `concurrency`
+        at a time. Either way new leads are committed `commit_every` at a time.
         """
         logger.info("Starting to process new opportunities...")
         
@@ -73,43 +89,94 @@ class LeadService:
             return
 
         logger.info(f"Found {len(unprocessed_opportunities)} new opportunities to process.")
-        
-        for opportunity in unprocessed_opportunities:
-            logger.info(f"Processing opportunity ID {opportunity.id}: '{opportunity.title}'")
 
-            search_term = None
-            
-            # Attempt 1: Use the opportunity title
-            if opportunity.title:
-                logger.info(f"Attempting to find search term with Opportunity Title: '{opportunity.title}'")
-                search_term = opportunity.title # Use the title directly as the search term
+        if concurrency:
+            pages = asyncio.run(self._prospect_once(unprocessed_opportunities, concurrency))
+        else:
+            pages = self.prospect_opportunities(unprocessed_opportunities)
 
-            # Attempt 2: Fallback to NAICS code description
-            if not search_term:
-                naics_code = str(opportunity.naics_code) if opportunity.naics_code is not None else None
-                if naics_code:
-                    logger.info(f"Title search failed. Attempting with NAICS code {naics_code}...")
-                    search_term = self.naics_service.get_description_for_code(naics_code)
-                    if search_term:
-                        logger.info(f"Found NAICS description: '{search_term}'")
-
-            # Attempt 3: Fallback to PSC code description
-            if not search_term:
-                psc_code = str(opportunity.psc_code) if opportunity.psc_code is not None else None
-                if psc_code:
-                    logger.info(f"NAICS lookup failed. Attempting with PSC code {psc_code}...")
-                    search_term = self.psc_service.get_description_for_code(psc_code)
-                    if search_term:
-                        logger.info(f"Found PSC description: '{search_term}'")
+        self._create_prospected_leads(unprocessed_opportunities, pages, commit_every)
+        logger.info("Finished processing opportunities.")
+
+    def prospect_opportunities(self, opportunities: List[Opportunity]) -> Dict[int, Tuple[str, Optional[Dict[str, str]]]]:
+        """
+        Finds a Facebook page for each opportunity using batched Graph calls.
 
+        Returns:
+            {opportunity id: (search term, page or None)} for every opportunity
+            a search term could be found for.
+        """
+        # Pass 1: pick a search term for every opportunity.
+        search_terms = {}
+        for opportunity in opportunities:
+            logger.info(f"Processing opportunity ID {opportunity.id}: '{opportunity.title}'")
+            search_term = self._find_search_term(opportunity)
             if not search_term:
                 logger.warning(f"Could not determine a search term for opportunity {opportunity.id}. Skipping.")
                 continue
+            search_terms[opportunity.id] = search_term
 
-            # Find the Facebook Page ID using the determined search term
-            logger.info(f"Searching Facebook for pages matching '{search_term}'...")
-            target_page = self.facebook_service.find_page_by_name(search_term)
+        # Pass 2: search Facebook for every distinct term in a few Graph batch
+        # calls rather than one round-trip per opportunity.
+        logger.info(f"Searching Facebook for pages matching {len(set(search_terms.values()))} search terms...")
+        pages = self.facebook_service.find_pages_by_names(search_terms.values())
+        return {opportunity_id: (term, pages.get(term)) for opportunity_id, term in search_terms.items()}
 
+    async def prospect_opportunities_async(
+        self, opportunities: List[Opportunity], concurrency: Optional[int] = None
+    ) -> Dict[int, Tuple[str, Optional[Dict[str, str]]]]:
+        """
+        Concurrent counterpart of prospect_opportunities: each opportunity's
+        search term and page search run as one task, with at most
+        `concurrency` (default PROSPECT_CONCURRENCY, 8) in flight. Identical
+        search terms share a single in-flight search.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or int(os.environ.get("PROSPECT_CONCURRENCY", "8"))))
+        searches: Dict[str, asyncio.Task] = {}
+
+        async def prospect(opportunity: Opportunity):
+            async with semaphore:
+                logger.info(f"Processing opportunity ID {opportunity.id}: '{opportunity.title}'")
+                # NAICS/PSC fallbacks may block on the network; keep them off the loop.
+                search_term = await asyncio.to_thread(self._find_search_term, opportunity)
+                if not search_term:
+                    logger.warning(f"Could not determine a search term for opportunity {opportunity.id}. Skipping.")
+                    return opportunity.id, None
+                key = normalize_page_query(search_term)
+                if key not in searches:
+                    searches[key] = asyncio.ensure_future(self.facebook_service.find_page_by_name_async(search_term))
+                try:
+                    page = await asyncio.shield(searches[key])
+                except Exception as e:
+                    logger.error(f"Facebook search for '{search_term}' failed: {e}")
+                    page = None
+                return opportunity.id, (search_term, page)
+
+        results = await asyncio.gather(*(prospect(opportunity) for opportunity in opportunities))
+        return {opportunity_id: result for opportunity_id, result in results if result is not None}
+
+    async def _prospect_once(self, opportunities: List[Opportunity], concurrency: int):
+        """
+        Runs prospect_opportunities_async on a short-lived event loop
+        (asyncio.run), closing that loop's pooled connections before it ends.
+        """
+        try:
+            return await self.prospect_opportunities_async(opportunities, concurrency)
+        finally:
+            await self.facebook_service.http.aclose()
+
+    def _create_prospected_leads(self, opportunities: List[Opportunity],
+                                 pages: Dict[int, Tuple[str, Optional[Dict[str, str]]]], commit_every: int):
+        """
+        Adds a Prospected lead for every opportunity a page was found for,
+        committing in batches of `commit_every`.
+        """
+        pending = 0
+        for opportunity in opportunities:
+            if opportunity.id not in pages:
+                continue
+
+            search_term, target_page = pages[opportunity.id]
             if not target_page:
                 logger.warning(f"Could not find a Facebook page for '{search_term}' for opportunity {opportunity.id}. Skipping.")
                 continue
@@ -126,92 +193,210 @@ class LeadService:
                 business_name=page_name
             )
             self.db.add(new_lead)
+            pending += 1
+            logger.info(f"Created lead for opportunity {opportunity.id} targeting page {page_id}.")
+
+            if pending >= max(1, commit_every):
+                self.db.commit()
+                pending = 0
+
+        if pending:
             self.db.commit()
-            logger.info(f"Successfully created lead for opportunity {opportunity.id} targeting page {page_id}.")
 
-        logger.info("Finished processing opportunities.")
+    def _find_search_term(self, opportunity: Opportunity) -> str | None:
+        """
+        Picks the Facebook search term for an opportunity: its title, else its
+        NAICS description, else its PSC description.
+        """
+        search_term = None
+
+        # Attempt 1: Use the opportunity title
+        if opportunity.title:
+            logger.info(f"Attempting to find search term with Opportunity Title: '{opportunity.title}'")
+            search_term = opportunity.title # Use the title directly as the search term
+
+        # Attempt 2: Fallback to NAICS code description
+        if not search_term:
+            naics_code = str(opportunity.naics_code) if opportunity.naics_code is not None else None
+            if naics_code:
+                logger.info(f"Title search failed. Attempting with NAICS code {naics_code}...")
+                search_term = self.naics_service.get_description_for_code(naics_code)
+                if search_term:
+                    logger.info(f"Found NAICS description: '{search_term}'")
+
+        # Attempt 3: Fallback to PSC code description
+        if not search_term:
+            psc_code = str(opportunity.psc_code) if opportunity.psc_code is not None else None
+            if psc_code:
+                logger.info(f"NAICS lookup failed. Attempting with PSC code {psc_code}...")
+                # Batch job: never spend the quota held back for webhook lookups.
+                search_term = self.psc_service.get_description_for_code(psc_code, priority=BULK)
+                if search_term:
+                    logger.info(f"Found PSC description: '{search_term}'")
+
+        return search_term
 
     def process_comment(self, comment_text: str, user_id: str, comment_id: str):
         """
         Processes a new comment, finds a relevant opportunity, creates a lead,
-        and sends a private reply.
+        and sends a private reply. See process_comments.
+        """
+        self.process_comments([{"comment_text": comment_text, "user_id": user_id, "comment_id": comment_id}])
+
+    def process_comments(self, comments: List[Dict[str, str]]) -> List[Lead]:
+        """
+        Processes a batch of new comments (e.g. every comment in one webhook
+        delivery), each a {"comment_text", "user_id", "comment_id"} dict.
+
+        Facebook redelivers webhook events, so comments already in the event
+        ledger are dropped before any lookup. The comments are recorded in the
+        ledger in the same transaction as their leads and replies, so a batch
+        that fails or dies before its commit is processed again on retry. If
+        another worker commits one of the comments first, the rest of the
+        batch is processed again without it.
+
+        Returns:
+            The leads created.
         """
-        logger.info(f"Processing comment from user {user_id}: '{comment_text}'")
+        for _ in range(2):
+            fresh = []
+            for comment in comments:
+                if self.event_ledger.is_processed(self.db, comment_event_key(comment["comment_id"]),
+                                                  source="facebook_comment"):
+                    logger.info(f"Comment {comment['comment_id']} was already processed. Skipping.")
+                else:
+                    fresh.append(comment)
+            if not fresh:
+                return []
+
+            keys = [comment_event_key(comment["comment_id"]) for comment in fresh]
+            try:
+                leads = self._process_new_comments(fresh)
+                self.event_ledger.record(self.db, keys, source="facebook_comment")
+                self.db.commit()
+            except IntegrityError:
+                self.db.rollback()
+                continue
+            except Exception:
+                self.db.rollback()
+                raise
+            self.event_ledger.remember(keys)
+            for new_lead in leads:
+                logger.info(f"Created new lead {new_lead.id} for user {new_lead.business_name}")
+            return leads
+        raise RuntimeError("Comments kept conflicting with concurrent processing.")
 
-        # 1. Extract keywords from comment
+    @staticmethod
+    def comment_search_query(comment_text: str) -> str:
+        """
+        Reduces a comment to the keywords used for NAICS matching.
+        """
         stop_words = {'i', 'am', 'looking', 'for', 'a', 'an', 'the', 'in', 'on', 'of', 'and', 'is', 'are'}
         keywords = [word.strip('.,!?;:') for word in comment_text.lower().split() if word.lower() not in stop_words]
-        search_query = " ".join(keywords)
+        return " ".join(keywords)
 
-        if not search_query:
-            logger.info(f"No usable keywords found in comment: '{comment_text}'")
-            return
+    def _process_new_comments(self, comments: List[Dict[str, str]]) -> List[Lead]:
+        """
+        Creates leads and queues replies for the comments, leaving the
+        transaction for the caller to commit.
+        """
+        # 1. Extract keywords for every comment
+        query_by_comment: Dict[str, str] = {}
+        for comment in comments:
+            logger.info(f"Processing comment from user {comment['user_id']}: '{comment['comment_text']}'")
+            search_query = self.comment_search_query(comment["comment_text"])
+            if search_query:
+                query_by_comment[comment["comment_id"]] = search_query
+            else:
+                logger.info(f"No usable keywords found in comment: '{comment['comment_text']}'")
 
-        # 2. Find the best NAICS code for the keywords
-        logger.info(f"Finding NAICS code for keywords: '{search_query}'")
-        naics_code = self.naics_service.find_code_for_keywords(search_query)
+        # 2. Find the best NAICS code once per distinct keyword set
+        naics_by_query: Dict[str, Optional[str]] = {}
+        for search_query in dict.fromkeys(query_by_comment.values()):
+            logger.info(f"Finding NAICS code for keywords: '{search_query}'")
+            naics_by_query[search_query] = self.naics_service.find_code_for_keywords(search_query)
+            if not naics_by_query[search_query]:
+                logger.info(f"No NAICS code found for keywords: '{search_query}'")
 
-        if not naics_code:
-            logger.info(f"No NAICS code found for keywords: '{search_query}'")
-            return
+        # 3. Find a relevant opportunity on SAM.gov once per NAICS code. The
+        # users are waiting, so these lookups go ahead of any queued backfill.
+        opportunity_by_naics: Dict[str, Dict] = {}
+        for naics_code in dict.fromkeys(code for code in naics_by_query.values() if code):
+            logger.info(f"Found NAICS code {naics_code}. Searching SAM.gov for opportunities.")
+            opportunities = self.sam_service.fetch_opportunities(
+                params={'naics': naics_code, 'limit': 1}, priority=INTERACTIVE
+            )
+            if not opportunities:
+                logger.info(f"No opportunities found for NAICS code: '{naics_code}'")
+                continue
+            if not opportunities[0].get('sam_gov_id'):
+                logger.warning("Opportunity data is missing sam_gov_id. Skipping.")
+                continue
+            opportunity_by_naics[naics_code] = opportunities[0]
 
-        logger.info(f"Found NAICS code {naics_code}. Searching SAM.gov for opportunities.")
+        matches = []
+        for comment in comments:
+            search_query = query_by_comment.get(comment["comment_id"])
+            naics_code = naics_by_query.get(search_query) if search_query else None
+            if naics_code in opportunity_by_naics:
+                matches.append((comment, opportunity_by_naics[naics_code]))
+        if not matches:
+            return []
 
-        # 3. Find a relevant opportunity on SAM.gov using the NAICS code
-        opportunities = self.sam_service.fetch_opportunities(params={'naics': naics_code, 'limit': 1})
-        if not opportunities:
-            logger.info(f"No opportunities found for NAICS code: '{naics_code}'")
-            return
+        # 4. Get the commenters' names in one Graph API batch
+        profiles = self.facebook_service.get_user_profiles(comment["user_id"] for comment, _ in matches)
 
-        opportunity_data = opportunities[0]
-        if not opportunity_data.get('sam_gov_id'):
-            logger.warning("Opportunity data is missing sam_gov_id. Skipping.")
-            return
-        
-        # 4. Check if an opportunity for this sam_gov_id already exists, or create it
-        opportunity = self.db.query(Opportunity).filter(Opportunity.sam_gov_id == opportunity_data['sam_gov_id']).first()
-        if not opportunity:
+        # 5. Add opportunities, leads and queued replies to the transaction
+        opportunities = self._get_or_add_opportunities([data for _, data in matches])
+        leads = []
+        for comment, opportunity_data in matches:
+            profile = profiles.get(comment["user_id"])
+            leads.append(Lead(
+                opportunity=opportunities[opportunity_data['sam_gov_id']],
+                status="ENGAGED", # User has engaged with us
+                business_name=profile.get('name', 'there') if profile else 'there', # A good default
+            ))
+        self.db.add_all(leads)
+        self.db.flush()
+
+        # The outbound queue paces sends per page and recipient and marks each
+        # lead MESSAGED once its reply is delivered.
+        for (comment, _), new_lead in zip(matches, leads):
+            message = (
+                f"Hi {new_lead.business_name}, thanks for your comment! Based on what you said, "
+                f"I found a government contract opportunity you might be perfect for: '{new_lead.opportunity.title}'. "
+                f"You can see the details here: {new_lead.opportunity.url}. "
+                "Would you be interested in learning more?"
+            )
+            get_outbound_queue().enqueue(
+                self.db, "private_reply", comment["comment_id"], message,
+                lead_id=new_lead.id, lead_status_on_sent="MESSAGED", commit=False,
+                recipient_user_id=comment["user_id"],
+            )
+        return leads
+
+    def _get_or_add_opportunities(self, opportunity_data: List[Dict]) -> Dict[str, Opportunity]:
+        """
+        Returns {sam_gov_id: Opportunity}, adding (without committing) the
+        opportunities that are not stored yet.
+        """
+        sam_gov_ids = list(dict.fromkeys(data['sam_gov_id'] for data in opportunity_data))
+        opportunities = {
+            opportunity.sam_gov_id: opportunity
+            for opportunity in self.db.query(Opportunity).filter(Opportunity.sam_gov_id.in_(sam_gov_ids))
+        }
+        for data in opportunity_data:
+            if data['sam_gov_id'] in opportunities:
+                continue
+            data = dict(data)
             # Ensure posted_date is a datetime object if it exists
-            if 'posted_date' in opportunity_data and isinstance(opportunity_data['posted_date'], str):
+            if isinstance(data.get('posted_date'), str):
                 try:
-                    opportunity_data['posted_date'] = datetime.fromisoformat(opportunity_data['posted_date'].replace('Z', '+00:00'))
+                    data['posted_date'] = datetime.fromisoformat(data['posted_date'].replace('Z', '+00:00'))
                 except ValueError:
-                    opportunity_data['posted_date'] = None # or handle error appropriately
-
-            opportunity = Opportunity(**opportunity_data)
+                    data['posted_date'] = None
+            opportunity = Opportunity(**data)
             self.db.add(opportunity)
-            self.db.commit()
-            self.db.refresh(opportunity)
+            opportunities[opportunity.sam_gov_id] = opportunity
             logger.info(f"Created new opportunity: {opportunity.title}")
-        
-        # 5. Get user's name from their profile
-        user_profile = self.facebook_service.get_user_profile(user_id)
-        user_name = user_profile.get('name', 'there') if user_profile else 'there'
-
-        # 6. Create the Lead
-        new_lead = Lead(
-            opportunity_id=opportunity.id,
-            status="ENGAGED", # User has engaged with us
-            business_name=user_name, # A good default
-        )
-        self.db.add(new_lead)
-        self.db.commit()
-        self.db.refresh(new_lead)
-        logger.info(f"Created new lead {new_lead.id} for user {user_name}")
-        
-        # 7. Send a private reply to the comment
-        message = (
-            f"Hi {user_name}, thanks for your comment! Based on what you said, "
-            f"I found a government contract opportunity you might be perfect for: '{opportunity.title}'. "
-            f"You can see the details here: {opportunity.url}. "
-            "Would you be interested in learning more?"
-        )
-        
-        try:
-            self.facebook_service.send_private_reply(comment_id, message)
-            logger.info(f"Successfully sent private reply to comment {comment_id}")
-            # Update lead status after successful message
-            new_lead.status = "MESSAGED"
-            self.db.commit()
-        except Exception as e:
-            logger.error(f"Failed to send private reply to comment {comment_id}: {e}") 
\ No newline at end of file
+        return opportunities
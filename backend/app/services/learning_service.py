@@ -0,0 +1,361 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import openai
+from sqlalchemy.orm import Session
+
+from app.core.http_client import parse_retry_after
+from app.db.models import AnalysisBatch, ConversationLog, Lead, Learning
+from app.services.batch_backends import FINISHED_STATUSES, LocalBatchBackend, OpenAIBatchBackend, default_batch_dir
+from app.services.conversation_service import ANALYSIS_FAILED, BATCH_ENDPOINT, ConversationService
+
+logger = logging.getLogger(__name__)
+
+# Lead statuses whose conversations are finished and worth learning from.
+COMPLETED_STATUSES = ('Appointment Set', 'Disqualified')
+# OpenAI failures that are worth retrying.
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def load_pending_conversations(db: Session, exclude: Iterable[int] = ()) -> Dict[int, List[Dict[str, str]]]:
+    """
+    Returns {lead_id: conversation history} for every completed lead that
+    has not been analyzed, with all logs read in one query.
+    """
+    excluded = set(exclude)
+    lead_ids = [lead_id for (lead_id,) in db.query(Lead.id).filter(
+        Lead.status.in_(COMPLETED_STATUSES),
+        Lead.analyzed_for_learning.is_(False)
+    ).order_by(Lead.id) if lead_id not in excluded]
+    histories: Dict[int, List[Dict[str, str]]] = {lead_id: [] for lead_id in lead_ids}
+    if lead_ids:
+        logs = db.query(ConversationLog).filter(
+            ConversationLog.lead_id.in_(lead_ids)
+        ).order_by(ConversationLog.lead_id, ConversationLog.timestamp, ConversationLog.id)
+        for log in logs:
+            histories[log.lead_id].append({"sender": str(log.sender), "text": str(log.message)})
+    return histories
+
+
+def mark_analyzed(db: Session, lead_ids: List[int]):
+    db.query(Lead).filter(Lead.id.in_(lead_ids)).update({"analyzed_for_learning": True}, synchronize_session=False)
+
+
+class ConversationAnalyzer:
+    """
+    Analyzes the conversations of completed leads and stores the results as
+    learnings.
+
+    Up to `concurrency` analyses (ANALYSIS_CONCURRENCY, default 8) run at
+    once. Rate-limited, connection and 5xx failures are retried with
+    exponential backoff, honouring Retry-After. Results are committed every
+    `commit_every` leads, so a crash only repeats the uncommitted tail.
+
+    A lead whose analysis is rejected outright (e.g. an unparseable answer)
+    gets an ANALYSIS_FAILED learning, as before. A lead that still fails
+    after `max_retries` retries is left unanalyzed for the next run.
+    """
+    def __init__(self, conversation_service: ConversationService,
+                 session_factory: Optional[Callable[[], Session]] = None, concurrency: Optional[int] = None,
+                 max_retries: int = 5, base_backoff: float = 1.0, max_backoff: float = 60.0, commit_every: int = 20,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        self.conversation_service = conversation_service
+        self._session_factory = session_factory
+        self.concurrency = max(1, concurrency if concurrency is not None
+                               else int(os.environ.get("ANALYSIS_CONCURRENCY", "8")))
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.commit_every = max(1, commit_every)
+        self._sleep = sleep
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from app.db.client import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Analyzes every pending lead and returns the run's metrics.
+        """
+        return asyncio.run(self._run_once())
+
+    async def _run_once(self) -> Dict[str, Any]:
+        try:
+            return await self.run_async()
+        finally:
+            # The async OpenAI client is bound to this loop.
+            await self.conversation_service.aclose()
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("retry-after"))
+            if retry_after is not None:
+                delay = min(self.max_backoff, retry_after)
+        return delay
+
+    async def _analyze(self, semaphore: asyncio.Semaphore, lead_id: int, history: List[Dict[str, str]],
+                       metrics: Dict[str, Any]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """
+        Returns (lead_id, analysis), or (lead_id, None) if retries ran out.
+        """
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return lead_id, await self.conversation_service.analyze_conversation_async(history)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Giving up on lead {lead_id} after {attempt + 1} attempts: {e}")
+                        return lead_id, None
+                    delay = self._retry_delay(attempt, e)
+                    metrics["retries"] += 1
+                    logger.warning(f"Analysis of lead {lead_id} failed ({e}); retrying in {delay:.1f}s")
+                    await self._sleep(delay)
+                except Exception as e:
+                    logger.error(f"Error analyzing conversation of lead {lead_id}: {e}")
+                    return lead_id, dict(ANALYSIS_FAILED)
+        return lead_id, None
+
+    def _commit(self, db: Session, results: List[Tuple[int, Optional[Dict[str, Any]]]]):
+        """
+        Stores learnings for the analyzed leads and marks them analyzed.
+        """
+        for lead_id, analysis in results:
+            if analysis is not None:
+                db.add(Learning(lead_id=lead_id, outcome_tag=analysis.get('tag'), summary=analysis.get('summary')))
+        mark_analyzed(db, [lead_id for lead_id, _ in results])
+        db.commit()
+
+    async def run_async(self) -> Dict[str, Any]:
+        """
+        Analyzes every pending lead.
+
+        Returns:
+            Metrics: pending, analyzed, skipped (no conversation), failed,
+            retries, commits, elapsed seconds and leads per minute.
+        """
+        started = time.perf_counter()
+        metrics: Dict[str, Any] = {"pending": 0, "analyzed": 0, "skipped": 0, "failed": 0, "retries": 0, "commits": 0}
+        db = self.session_factory()
+        try:
+            histories = load_pending_conversations(db)
+            metrics["pending"] = len(histories)
+
+            # Leads without any conversation are marked without a learning.
+            empty = [(lead_id, None) for lead_id, history in histories.items() if not history]
+            if empty:
+                self._commit(db, empty)
+                metrics["skipped"] = len(empty)
+                metrics["commits"] += 1
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            tasks = [
+                asyncio.ensure_future(self._analyze(semaphore, lead_id, history, metrics))
+                for lead_id, history in histories.items() if history
+            ]
+            done: List[Tuple[int, Optional[Dict[str, Any]]]] = []
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    lead_id, analysis = await next_result
+                    if analysis is None:
+                        metrics["failed"] += 1
+                        continue
+                    done.append((lead_id, analysis))
+                    if len(done) >= self.commit_every:
+                        self._commit(db, done)
+                        metrics["analyzed"] += len(done)
+                        metrics["commits"] += 1
+                        done = []
+                if done:
+                    self._commit(db, done)
+                    metrics["analyzed"] += len(done)
+                    metrics["commits"] += 1
+            finally:
+                for task in tasks:
+                    task.cancel()
+        finally:
+            db.close()
+
+        elapsed = time.perf_counter() - started
+        metrics["elapsed_seconds"] = round(elapsed, 3)
+        metrics["leads_per_minute"] = round(metrics["analyzed"] / elapsed * 60, 1) if elapsed > 0 else None
+        return metrics
+
+
+def batch_backend_from_env(conversation_service: ConversationService):
+    """
+    Returns the batch backend selected by OPENAI_BATCH_BACKEND: "openai" (the
+    default) for the OpenAI Batch API, or "local" to run the requests
+    in-process through the regular chat completions API.
+    """
+    if os.environ.get("OPENAI_BATCH_BACKEND", "openai").lower() == "local":
+        return LocalBatchBackend(
+            lambda body: conversation_service.client.chat.completions.create(**body).model_dump()
+        )
+    return OpenAIBatchBackend(conversation_service.client)
+
+
+class BatchConversationAnalyzer:
+    """
+    Offline counterpart of ConversationAnalyzer for non-urgent analysis.
+
+    submit() writes the conversations of all pending leads to one JSONL
+    request file and hands it to a batch backend (OpenAIBatchBackend, or the
+    LocalBatchBackend stand-in). Each submission is tracked in
+    `analysis_batches`, and its leads are not submitted again while it is
+    open.
+
+    collect() polls the open batches and ingests finished ones into
+    `learnings` in one transaction per batch. Leads that already have a
+    learning are skipped, so ingesting a batch twice adds nothing. Requests
+    the batch could not complete stay pending and go into the next
+    submission.
+    """
+    def __init__(self, conversation_service: ConversationService, backend: Any = None,
+                 session_factory: Optional[Callable[[], Session]] = None, directory: Optional[str] = None,
+                 max_requests: int = 50000, clock: Callable[[], datetime] = datetime.utcnow):
+        self.conversation_service = conversation_service
+        self.backend = backend if backend is not None else batch_backend_from_env(conversation_service)
+        self._session_factory = session_factory
+        self.directory = directory or default_batch_dir()
+        self.max_requests = max_requests
+        self._clock = clock
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from app.db.client import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    @staticmethod
+    def _custom_id(lead_id: int) -> str:
+        return f"lead-{lead_id}"
+
+    @staticmethod
+    def _lead_id(custom_id: str) -> Optional[int]:
+        prefix, _, lead_id = custom_id.partition("-")
+        return int(lead_id) if prefix == "lead" and lead_id.isdigit() else None
+
+    def submit(self) -> Optional[Dict[str, Any]]:
+        """
+        Submits every pending lead that is not already in an open batch.
+
+        Returns:
+            {"batch_id", "requests", "skipped"}, or None if nothing was
+            submitted.
+        """
+        db = self.session_factory()
+        try:
+            in_flight = set()
+            for (lead_ids,) in db.query(AnalysisBatch.lead_ids).filter(AnalysisBatch.status == "submitted"):
+                in_flight.update(json.loads(lead_ids))
+            histories = load_pending_conversations(db, exclude=in_flight)
+
+            # Leads without any conversation are marked without a learning.
+            empty = [lead_id for lead_id, history in histories.items() if not history]
+            if empty:
+                mark_analyzed(db, empty)
+                db.commit()
+
+            conversations = {
+                self._custom_id(lead_id): history for lead_id, history in histories.items() if history
+            }
+            conversations = dict(list(conversations.items())[:self.max_requests])
+            if not conversations:
+                return None
+
+            path = os.path.join(self.directory, f"analysis-{self._clock():%Y%m%dT%H%M%S%f}.jsonl")
+            count = self.conversation_service.write_analysis_batch(path, conversations)
+            batch_id = self.backend.submit(path, BATCH_ENDPOINT)
+            db.add(AnalysisBatch(
+                batch_id=batch_id, status="submitted", request_count=count, input_path=path,
+                lead_ids=json.dumps([self._lead_id(custom_id) for custom_id in conversations]),
+                submitted_at=self._clock(),
+            ))
+            db.commit()
+            logger.info(f"Submitted analysis batch {batch_id} with {count} conversations.")
+            return {"batch_id": batch_id, "requests": count, "skipped": len(empty)}
+        finally:
+            db.close()
+
+    def ingest(self, db: Session, batch: AnalysisBatch, lines: Iterable[str]) -> int:
+        """
+        Stores the batch's results as learnings and marks their leads
+        analyzed, in one transaction.
+
+        Returns:
+            The number of learnings added.
+        """
+        results = {
+            self._lead_id(custom_id): analysis
+            for custom_id, analysis in self.conversation_service.parse_analysis_batch_output(lines).items()
+        }
+        results.pop(None, None)
+        already = {
+            lead_id for (lead_id,) in
+            db.query(Learning.lead_id).filter(Learning.lead_id.in_(list(results)))
+        }
+        added = 0
+        for lead_id, analysis in results.items():
+            if lead_id in already:
+                continue
+            db.add(Learning(lead_id=lead_id, outcome_tag=analysis.get('tag'), summary=analysis.get('summary')))
+            added += 1
+        if results:
+            mark_analyzed(db, list(results))
+        batch.status = "ingested"
+        batch.ingested_count = added
+        batch.finished_at = self._clock()
+        db.commit()
+        return added
+
+    def collect(self) -> Dict[str, int]:
+        """
+        Polls every open batch and ingests the finished ones.
+
+        Returns:
+            Counts of batches checked, ingested, failed and still pending, and
+            of learnings added.
+        """
+        metrics = {"checked": 0, "ingested": 0, "failed": 0, "pending": 0, "learnings": 0}
+        db = self.session_factory()
+        try:
+            batches = db.query(AnalysisBatch).filter(AnalysisBatch.status == "submitted").order_by(AnalysisBatch.id).all()
+            for batch in batches:
+                metrics["checked"] += 1
+                try:
+                    status = self.backend.status(batch.batch_id)
+                    if status not in FINISHED_STATUSES:
+                        metrics["pending"] += 1
+                        continue
+                    lines = self.backend.output_lines(batch.batch_id)
+                except Exception as e:
+                    logger.error(f"Could not check analysis batch {batch.batch_id}: {e}")
+                    metrics["pending"] += 1
+                    continue
+
+                if status == "failed" or (status == "cancelled" and not lines):
+                    batch.status = "failed"
+                    batch.finished_at = self._clock()
+                    db.commit()
+                    metrics["failed"] += 1
+                    logger.error(f"Analysis batch {batch.batch_id} {status}; its leads will be resubmitted.")
+                    continue
+
+                added = self.ingest(db, batch, lines)
+                metrics["ingested"] += 1
+                metrics["learnings"] += added
+                logger.info(f"Ingested analysis batch {batch.batch_id} ({status}): {added} learnings.")
+            return metrics
+        finally:
+            db.close()
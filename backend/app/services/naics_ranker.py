@@ -0,0 +1,154 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.naics_snapshot import NAICSSnapshot
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words that carry no signal in either comment text or NAICS definitions.
+STOP_WORDS = frozenset({
+    'a', 'am', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by', 'do', 'for', 'from',
+    'i', 'in', 'is', 'it', 'looking', 'me', 'my', 'of', 'on', 'or', 'our', 'the', 'this',
+    'to', 'us', 'we', 'with', 'you',
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases, splits on non-alphanumerics, drops stop words and folds simple
+    plurals so "Roofers' services" and "roofer service" produce the same terms.
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 4 and token.endswith('ies'):
+            token = token[:-3] + 'y'
+        elif len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class NAICSRanker:
+    """
+    BM25 ranking of 6-digit NAICS industries over their titles and definitions.
+
+    The term weights are precomputed into a term-major sparse matrix (CSR
+    arrays: term_ptr / doc_ids / weights). Scoring a batch gathers the rows for
+    the batch's unique terms into a small dense block and ranks every query with
+    a single matrix product.
+    """
+    def __init__(self, snapshot: Optional[NAICSSnapshot], k1: float = 1.2, b: float = 0.75, title_weight: float = 3.0):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+
+        self.codes: List[str] = []
+        documents: List[Dict[str, float]] = []
+        if snapshot is not None:
+            codes = snapshot.column("Code")
+            titles = snapshot.column("Class title")
+            for row, code in enumerate(codes):
+                if len(code) != 6 or not titles[row]:
+                    continue
+                term_frequencies: Dict[str, float] = {}
+                # Title terms count several times over, like a BM25F field boost.
+                for token in tokenize(titles[row]):
+                    term_frequencies[token] = term_frequencies.get(token, 0.0) + title_weight
+                for token in tokenize(snapshot.definition(row)):
+                    term_frequencies[token] = term_frequencies.get(token, 0.0) + 1.0
+                self.codes.append(code)
+                documents.append(term_frequencies)
+
+        self._build_matrix(documents)
+
+    def _build_matrix(self, documents: List[Dict[str, float]]):
+        self.vocabulary: Dict[str, int] = {}
+        postings: List[List[Tuple[int, float]]] = []
+        doc_lengths = np.array([sum(doc.values()) for doc in documents], dtype=np.float64)
+        average_length = float(doc_lengths.mean()) if len(documents) else 0.0
+
+        for doc_id, term_frequencies in enumerate(documents):
+            for term, frequency in term_frequencies.items():
+                term_id = self.vocabulary.setdefault(term, len(postings))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((doc_id, frequency))
+
+        n_docs = len(documents)
+        lengths = np.array([len(p) for p in postings], dtype=np.int64)
+        self.term_ptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.term_ptr[1:])
+        self.doc_ids = np.fromiter((d for p in postings for d, _ in p), dtype=np.int32, count=int(lengths.sum()))
+        frequencies = np.fromiter((f for p in postings for _, f in p), dtype=np.float64, count=int(lengths.sum()))
+
+        if n_docs:
+            idf = np.log1p((n_docs - lengths + 0.5) / (lengths + 0.5))
+            per_posting_idf = np.repeat(idf, lengths)
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lengths[self.doc_ids] / average_length)
+            self.weights = (per_posting_idf * frequencies * (self.k1 + 1.0) / (frequencies + norm)).astype(np.float32)
+        else:
+            self.weights = np.zeros(0, dtype=np.float32)
+
+    def _dense_term_rows(self, term_ids: np.ndarray) -> np.ndarray:
+        """
+        Expands the sparse rows for `term_ids` into a dense (terms x docs) block.
+        """
+        block = np.zeros((len(term_ids), len(self.codes)), dtype=np.float32)
+        starts = self.term_ptr[term_ids]
+        lengths = self.term_ptr[term_ids + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return block
+        block_rows = np.repeat(np.arange(len(term_ids)), lengths)
+        # Position of each gathered posting inside doc_ids/weights.
+        first_in_block = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        positions = np.repeat(starts, lengths) + (np.arange(total) - first_in_block)
+        block[block_rows, self.doc_ids[positions]] = self.weights[positions]
+        return block
+
+    def score_batch(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        Returns a (queries x industries) matrix of BM25 scores.
+        """
+        query_terms = [[self.vocabulary[t] for t in tokenize(q) if t in self.vocabulary] for q in queries]
+        unique_terms = np.unique(np.fromiter((t for terms in query_terms for t in terms), dtype=np.int64))
+        if len(unique_terms) == 0:
+            return np.zeros((len(queries), len(self.codes)), dtype=np.float32)
+
+        column_of_term = {int(term): column for column, term in enumerate(unique_terms)}
+        query_matrix = np.zeros((len(queries), len(unique_terms)), dtype=np.float32)
+        for row, terms in enumerate(query_terms):
+            for term in terms:
+                query_matrix[row, column_of_term[term]] += 1.0
+
+        return query_matrix @ self._dense_term_rows(unique_terms)
+
+    def top_k(self, queries: Sequence[str], k: int = 5, chunk_size: int = 512) -> List[List[Tuple[str, float]]]:
+        """
+        Ranks each query and returns its `k` best (code, score) pairs, highest
+        first. Queries with no known terms get an empty list.
+        """
+        results: List[List[Tuple[str, float]]] = []
+        if k <= 0 or not self.codes:
+            return [[] for _ in queries]
+        k = min(k, len(self.codes))
+
+        for chunk_start in range(0, len(queries), chunk_size):
+            scores = self.score_batch(queries[chunk_start:chunk_start + chunk_size])
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+            # Sort by score descending, then by CSV order for stable ties.
+            order = np.lexsort((candidates, -candidate_scores), axis=1)
+            for row in range(scores.shape[0]):
+                ranked = []
+                for column in order[row]:
+                    score = float(candidate_scores[row, column])
+                    if score <= 0.0:
+                        break
+                    ranked.append((self.codes[candidates[row, column]], score))
+                results.append(ranked)
+        return results
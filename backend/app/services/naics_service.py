@@ -1,80 +1,310 @@
-import csv
-import os
-from typing import Optional, List
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services.naics_ranker import NAICSRanker
+from app.services.naics_snapshot import NAICSSnapshot, get_shared_snapshot
+
+
+class _NAICSIndex:
+    """
+    Lookup structures derived from the NAICS snapshot. Built once per process
+    and shared by every NAICSService instance.
+    """
+    def __init__(self, snapshot: Optional[NAICSSnapshot]):
+        self.snapshot = snapshot
+        codes = snapshot.column("Code") if snapshot is not None else []
+        parents = snapshot.column("Parent") if snapshot is not None else []
+        titles = snapshot.column("Class title") if snapshot is not None else []
+        self._build_keyword_index(codes, titles)
+        self._build_code_tree(codes, parents)
+        self._ranker: Optional[NAICSRanker] = None
+        self._ranker_lock = threading.Lock()
+
+    @property
+    def ranker(self) -> NAICSRanker:
+        """
+        The BM25 ranker over titles and definitions. Built on first use, since
+        only batch re-classification needs it.
+        """
+        if self._ranker is None:
+            with self._ranker_lock:
+                if self._ranker is None:
+                    self._ranker = NAICSRanker(self.snapshot)
+        return self._ranker
+
+    def _build_keyword_index(self, codes: List[str], titles: List[str]):
+        """
+        Builds the token -> title inverted index used by find_code_for_keywords.
+
+        Only 6-digit codes with a title are indexed. Titles are also joined into
+        a single newline-separated blob so phrase matches can be located with one
+        C-level substring scan instead of a Python loop over every row.
+        """
+        self.indexed_codes: List[str] = []
+        self.token_index: Dict[str, List[int]] = {}
+        indexed_titles: List[str] = []
+
+        for code, title in zip(codes, titles):
+            if not code or len(code) != 6:
+                continue
+
+            description = title.lower()
+            if not description:
+                continue
+
+            position = len(self.indexed_codes)
+            self.indexed_codes.append(code)
+            indexed_titles.append(description)
+            for token in set(description.split()):
+                self.token_index.setdefault(token, []).append(position)
+
+        self.title_offsets: List[int] = []
+        offset = 0
+        for description in indexed_titles:
+            self.title_offsets.append(offset)
+            offset += len(description) + 1
+        self.title_blob = "\n".join(indexed_titles)
+
+    def _build_code_tree(self, codes: List[str], parents: List[str]):
+        """
+        Indexes the Code/Parent columns so lookups and hierarchy walks don't
+        rescan the table.
+
+        Manufacturing, retail and transportation sectors are published as ranges
+        ("31-33", "44-45", "48-49"); each 2-digit member of a range is mapped back
+        to its range code so callers can use plain numeric prefixes.
+        """
+        self.row_by_code: Dict[str, int] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.sector_aliases: Dict[str, str] = {}
+
+        for row, (code, parent) in enumerate(zip(codes, parents)):
+            if not code:
+                continue
+            self.row_by_code[code] = row
+            if parent:
+                self.children.setdefault(parent, []).append(code)
+
+            if '-' in code:
+                first, _, last = code.partition('-')
+                if first.isdigit() and last.isdigit():
+                    for sector in range(int(first), int(last) + 1):
+                        self.sector_aliases[str(sector)] = code
+
 
 class NAICSService:
     """
     A service to find NAICS codes and descriptions from a local CSV file.
+
+    The CSV is compiled once into a memory-mapped snapshot (see
+    naics_snapshot.py) and the derived indexes are shared process-wide, so
+    constructing a NAICSService per request costs nothing beyond the first load.
     """
+    _shared_index: Optional[_NAICSIndex] = None
+    _shared_lock = threading.Lock()
+
     def __init__(self):
-        self.naics_data = []
-        # Correctly locate the CSV file relative to this script's location
-        dir_path = os.path.dirname(os.path.realpath(__file__))
-        csv_path = os.path.join(dir_path, 'naics_codes.csv')
-        
-        try:
-            with open(csv_path, mode='r', encoding='utf-8-sig') as infile:
-                # Use DictReader to make it easy to access columns by name
-                reader = csv.DictReader(infile)
-                for row in reader:
-                    self.naics_data.append(row)
-        except FileNotFoundError:
-            print(f"ERROR: Could not find the NAICS data file at {csv_path}")
-        except Exception as e:
-            print(f"ERROR: Failed to load NAICS data: {e}")
+        index = self.preload()
+        self._index = index
+        self._snapshot = index.snapshot
+        self._indexed_codes = index.indexed_codes
+        self._token_index = index.token_index
+        self._title_offsets = index.title_offsets
+        self._title_blob = index.title_blob
+        self._row_by_code = index.row_by_code
+        self._children = index.children
+        self._sector_aliases = index.sector_aliases
+
+    @classmethod
+    def preload(cls) -> _NAICSIndex:
+        """
+        Loads the shared snapshot and indexes if they haven't been loaded yet.
+        Call this before forking server workers so they share the result.
+        """
+        if cls._shared_index is None:
+            with cls._shared_lock:
+                if cls._shared_index is None:
+                    cls._shared_index = _NAICSIndex(get_shared_snapshot())
+        return cls._shared_index
+
+    def _resolve_code(self, naics_code: str) -> Optional[str]:
+        if naics_code in self._row_by_code:
+            return naics_code
+        return self._sector_aliases.get(naics_code)
+
+    def _positions_containing_phrase(self, phrase: str) -> Iterable[int]:
+        """
+        Yields the index positions whose title contains `phrase` as a substring.
+        """
+        if not phrase:
+            # An empty phrase is a substring of every title.
+            yield from range(len(self._indexed_codes))
+            return
+        if "\n" in phrase:
+            # Titles never span lines, so a multi-line phrase cannot match.
+            return
+
+        start = 0
+        while True:
+            found = self._title_blob.find(phrase, start)
+            if found == -1:
+                return
+            position = bisect.bisect_right(self._title_offsets, found) - 1
+            yield position
+            # Skip to the next title; each title earns the bonus at most once.
+            if position + 1 >= len(self._title_offsets):
+                return
+            start = self._title_offsets[position + 1]
 
     def find_code_for_keywords(self, keywords: str) -> Optional[str]:
         """
         Searches for the most relevant NAICS code for a given set of keywords
         using a scoring system.
 
+        Each indexed title scores one point per keyword it shares with the query,
+        plus a bonus of 5 when the whole query appears in the title. Candidates
+        come from the inverted index, so the cost grows with the number of query
+        terms rather than with the size of the NAICS table. Ties go to the code
+        that appears first in the CSV.
+
         Args:
             keywords: A string of keywords to search for.
 
         Returns:
             The most relevant 6-digit NAICS code as a string, or None if not found.
         """
-        if not self.naics_data:
+        if not self._indexed_codes:
             return None
 
-        search_keywords = set(keywords.lower().split())
-        best_match_code = None
-        highest_score = 0
+        phrase = keywords.lower()
+        search_keywords: Set[str] = set(phrase.split())
+        scores: Dict[int, int] = {}
 
-        for row in self.naics_data:
-            # Ensure we are looking at 6-digit codes for specificity
-            code = row.get('Code')
-            if not code or len(code) != 6:
-                continue
+        # 1. Simple keyword match score
+        for keyword in search_keywords:
+            for position in self._token_index.get(keyword, ()):
+                scores[position] = scores.get(position, 0) + 1
 
-            description = row.get('Class title', '').lower()
-            if not description:
-                continue
-            
-            score = 0
-            # 1. Simple keyword match score
-            matched_keywords = search_keywords.intersection(description.split())
-            score += len(matched_keywords)
-
-            # 2. Bonus for full phrase match
-            if keywords.lower() in description:
-                score += 5 # A big bonus for a direct phrase match
-
-            if score > highest_score:
-                highest_score = score
-                best_match_code = code
-        
-        return best_match_code
+        # 2. Bonus for full phrase match
+        for position in self._positions_containing_phrase(phrase):
+            scores[position] = scores.get(position, 0) + 5 # A big bonus for a direct phrase match
+
+        if not scores:
+            return None
+
+        best_position, _ = min(scores.items(), key=self._rank_key)
+        return self._indexed_codes[best_position]
+
+    def find_codes_for_keywords_batch(self, queries: List[str], top_k: int = 5) -> List[List[Tuple[str, float]]]:
+        """
+        Ranks many keyword strings at once with BM25 over NAICS titles and
+        definitions.
+
+        Unlike find_code_for_keywords, this matches casual wording against the
+        long `Class definition` text too, and the whole batch is scored with one
+        matrix product, so it suits bulk re-classification jobs.
+
+        Args:
+            queries: The keyword strings (or raw comment text) to classify.
+            top_k: How many codes to return per query.
+
+        Returns:
+            One list per query of (6-digit code, score) pairs, best first. A query
+            with no recognised terms gets an empty list.
+        """
+        if not queries:
+            return []
+        return self._index.ranker.top_k(queries, k=top_k)
+
+    @staticmethod
+    def _rank_key(item: Tuple[int, int]) -> Tuple[int, int]:
+        position, score = item
+        return (-score, position)
 
     def get_description_for_code(self, naics_code: str) -> Optional[str]:
         """
         Fetches the title/description for a given NAICS code from local data.
         """
-        if not self.naics_data:
+        row = self._row_by_code.get(naics_code)
+        if row is None:
             return None
-            
-        for row in self.naics_data:
-            if row.get('Code') == naics_code:
-                return row.get('Class title')
-        
-        return None 
\ No newline at end of file
+        return self._snapshot.title(row)
+
+    def get_parent_code(self, naics_code: str) -> Optional[str]:
+        """
+        Returns the code one level up the hierarchy, or None for sectors and unknown codes.
+        """
+        row = self._row_by_code.get(naics_code)
+        if row is None:
+            return None
+        return self._snapshot.parent(row) or None
+
+    def get_ancestor_codes(self, naics_code: str) -> List[str]:
+        """
+        Returns the chain of parent codes, nearest first, ending at the sector.
+        """
+        ancestors = []
+        parent = self.get_parent_code(naics_code)
+        while parent:
+            ancestors.append(parent)
+            parent = self.get_parent_code(parent)
+        return ancestors
+
+    def get_child_codes(self, naics_code: str) -> List[str]:
+        """
+        Returns the codes directly beneath a code, in CSV order.
+        """
+        resolved = self._resolve_code(naics_code)
+        if resolved is None:
+            return []
+        children = self._children.get(resolved, [])
+        if resolved != naics_code:
+            # A 2-digit member of a range sector only owns its own subsectors.
+            children = [child for child in children if child.startswith(naics_code)]
+        return list(children)
+
+    def get_sibling_codes(self, naics_code: str) -> List[str]:
+        """
+        Returns the other codes that share this code's parent.
+        """
+        parent = self.get_parent_code(naics_code)
+        if parent is None:
+            return []
+        return [code for code in self._children.get(parent, []) if code != naics_code]
+
+    def get_industry_codes_under(self, naics_code: str) -> List[str]:
+        """
+        Rolls a sector, subsector or industry group up into every 6-digit
+        national industry code beneath it.
+
+        Args:
+            naics_code: Any NAICS code or 2-digit sector prefix (e.g. "32").
+
+        Returns:
+            The 6-digit codes under `naics_code` in CSV order. A 6-digit code
+            returns itself; unknown codes return an empty list.
+        """
+        if naics_code in self._row_by_code and len(naics_code) == 6:
+            return [naics_code]
+
+        industry_codes = []
+        pending = list(reversed(self.get_child_codes(naics_code)))
+        while pending:
+            code = pending.pop()
+            if len(code) == 6:
+                industry_codes.append(code)
+                continue
+            pending.extend(reversed(self._children.get(code, [])))
+        return industry_codes
+
+    def get_sibling_industry_codes(self, naics_code: str) -> List[str]:
+        """
+        Returns the other 6-digit codes in the same 4-digit industry group as
+        `naics_code`. Useful for widening a SAM.gov search to closely related
+        industries.
+        """
+        industry_group = next((code for code in self.get_ancestor_codes(naics_code) if len(code) == 4), None)
+        if industry_group is None:
+            return []
+        return [code for code in self.get_industry_codes_under(industry_group) if code != naics_code]
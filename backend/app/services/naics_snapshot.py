@@ -0,0 +1,251 @@
+import csv
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from typing import List, Optional, Tuple
+
+_MAGIC = b"NAICSSNP"
+_VERSION = 1
+# magic, version, byte order, source CSV size, source CSV mtime (ns), row count
+_HEADER = struct.Struct("<8sI1s3xQQI4x")
+# offsets position, blob position, blob length
+_COLUMN = struct.Struct("<QQQ")
+_LEVELS = struct.Struct("<Q")
+_STRING_COLUMNS = ("Code", "Parent", "Class title", "Class definition")
+_BYTE_ORDER = b"l" if sys.byteorder == "little" else b"b"
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def default_csv_path() -> str:
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), 'naics_codes.csv')
+
+
+def default_snapshot_path() -> str:
+    return os.environ.get(
+        "NAICS_SNAPSHOT_PATH",
+        os.path.join(tempfile.gettempdir(), "govbidgenie", "naics_codes.snapshot"),
+    )
+
+
+class NAICSSnapshot:
+    """
+    A compact, read-only, column-oriented copy of naics_codes.csv.
+
+    Each text column is stored as one UTF-8 blob plus an array of row offsets,
+    and levels as a byte array, so a snapshot file can be memory-mapped and
+    shared between processes without materialising per-row dicts. Strings are
+    decoded only when a row is actually read; the multi-paragraph
+    `Class definition` text stays in the mapping until someone asks for it.
+    """
+    def __init__(self, buffer, source_signature: Optional[Tuple[int, int]] = None):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, version, byte_order, size, mtime_ns, rows = _HEADER.unpack_from(view, 0)
+        if magic != _MAGIC or version != _VERSION or byte_order != _BYTE_ORDER:
+            raise ValueError("Not a compatible NAICS snapshot.")
+
+        self.source_signature = (size, mtime_ns)
+        if source_signature is not None and self.source_signature != source_signature:
+            raise ValueError("NAICS snapshot is stale.")
+
+        self._rows = rows
+        self._columns = {}
+        position = _HEADER.size
+        for name in _STRING_COLUMNS:
+            offsets_pos, blob_pos, blob_len = _COLUMN.unpack_from(view, position)
+            position += _COLUMN.size
+            offsets = view[offsets_pos:offsets_pos + (rows + 1) * 4].cast("I")
+            self._columns[name] = (offsets, view[blob_pos:blob_pos + blob_len])
+        (levels_pos,) = _LEVELS.unpack_from(view, position)
+        self._levels = view[levels_pos:levels_pos + rows]
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _string(self, column: str, row: int) -> str:
+        offsets, blob = self._columns[column]
+        return str(blob[offsets[row]:offsets[row + 1]], "utf-8")
+
+    def code(self, row: int) -> str:
+        return self._string("Code", row)
+
+    def parent(self, row: int) -> str:
+        return self._string("Parent", row)
+
+    def title(self, row: int) -> str:
+        return self._string("Class title", row)
+
+    def definition(self, row: int) -> str:
+        return self._string("Class definition", row)
+
+    def level(self, row: int) -> int:
+        return self._levels[row]
+
+    def column(self, column: str) -> List[str]:
+        """
+        Decodes a whole text column at once, e.g. for building an index.
+        """
+        offsets, blob = self._columns[column]
+        text = str(blob, "utf-8")
+        if text.isascii():
+            # Byte offsets are character offsets, so slice the decoded text.
+            return [text[offsets[i]:offsets[i + 1]] for i in range(self._rows)]
+        return [self._string(column, i) for i in range(self._rows)]
+
+    @staticmethod
+    def serialize(rows: List[dict], source_signature: Tuple[int, int] = (0, 0)) -> bytes:
+        """
+        Encodes parsed CSV rows into the snapshot file format.
+        """
+        sections = []
+        position = _align(_HEADER.size + _COLUMN.size * len(_STRING_COLUMNS) + _LEVELS.size)
+        column_headers = b""
+
+        for name in _STRING_COLUMNS:
+            offsets = array("I", [0])
+            encoded = []
+            total = 0
+            for row in rows:
+                value = (row.get(name) or "").encode("utf-8")
+                encoded.append(value)
+                total += len(value)
+                offsets.append(total)
+            offsets_bytes = offsets.tobytes()
+            blob = b"".join(encoded)
+
+            offsets_pos = position
+            position = _align(position + len(offsets_bytes))
+            blob_pos = position
+            position = _align(position + len(blob))
+            column_headers += _COLUMN.pack(offsets_pos, blob_pos, len(blob))
+            sections.append((offsets_pos, offsets_bytes))
+            sections.append((blob_pos, blob))
+
+        levels = bytes(int(row.get("Level") or 0) for row in rows)
+        levels_pos = position
+        position = _align(position + len(levels))
+        sections.append((levels_pos, levels))
+
+        output = bytearray(position)
+        header = _HEADER.pack(_MAGIC, _VERSION, _BYTE_ORDER, source_signature[0], source_signature[1], len(rows))
+        output[0:len(header)] = header
+        start = len(header)
+        output[start:start + len(column_headers)] = column_headers
+        start += len(column_headers)
+        output[start:start + _LEVELS.size] = _LEVELS.pack(levels_pos)
+        for section_pos, data in sections:
+            output[section_pos:section_pos + len(data)] = data
+        return bytes(output)
+
+    @classmethod
+    def from_csv(cls, csv_path: str) -> "NAICSSnapshot":
+        """
+        Parses the CSV and returns an in-memory snapshot (no file involved).
+        """
+        signature = _source_signature(csv_path)
+        with open(csv_path, mode='r', encoding='utf-8-sig') as infile:
+            rows = list(csv.DictReader(infile))
+        return cls(cls.serialize(rows, signature), signature)
+
+    @classmethod
+    def open(cls, snapshot_path: str, source_signature: Optional[Tuple[int, int]] = None) -> "NAICSSnapshot":
+        """
+        Memory-maps an existing snapshot file read-only.
+        """
+        with open(snapshot_path, "rb") as infile:
+            mapping = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(mapping, source_signature)
+        except Exception:
+            mapping.close()
+            raise
+
+
+def _source_signature(csv_path: str) -> Tuple[int, int]:
+    stat = os.stat(csv_path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def build_snapshot_file(csv_path: str, snapshot_path: str) -> None:
+    """
+    Compiles the CSV into a snapshot file, replacing any existing one atomically.
+    """
+    signature = _source_signature(csv_path)
+    with open(csv_path, mode='r', encoding='utf-8-sig') as infile:
+        rows = list(csv.DictReader(infile))
+    data = NAICSSnapshot.serialize(rows, signature)
+
+    directory = os.path.dirname(snapshot_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".naics-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as outfile:
+            outfile.write(data)
+        os.replace(tmp_path, snapshot_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(csv_path: Optional[str] = None, snapshot_path: Optional[str] = None) -> Optional[NAICSSnapshot]:
+    """
+    Returns a memory-mapped snapshot for the CSV, compiling it first if the
+    snapshot file is missing or older than the CSV. Falls back to an in-memory
+    snapshot when the snapshot location is not writable, and to None when the
+    CSV itself cannot be read.
+    """
+    csv_path = csv_path or default_csv_path()
+    snapshot_path = snapshot_path or default_snapshot_path()
+
+    try:
+        signature = _source_signature(csv_path)
+    except FileNotFoundError:
+        print(f"ERROR: Could not find the NAICS data file at {csv_path}")
+        return None
+
+    try:
+        return NAICSSnapshot.open(snapshot_path, signature)
+    except (OSError, ValueError, struct.error):
+        pass
+
+    try:
+        build_snapshot_file(csv_path, snapshot_path)
+        return NAICSSnapshot.open(snapshot_path, signature)
+    except OSError as e:
+        print(f"WARNING: Could not write NAICS snapshot to {snapshot_path}, keeping it in memory: {e}")
+
+    try:
+        return NAICSSnapshot.from_csv(csv_path)
+    except Exception as e:
+        print(f"ERROR: Failed to load NAICS data: {e}")
+        return None
+
+
+_shared_snapshot: Optional[NAICSSnapshot] = None
+_shared_snapshot_loaded = False
+_shared_lock = threading.Lock()
+
+
+def get_shared_snapshot() -> Optional[NAICSSnapshot]:
+    """
+    Returns the process-wide snapshot, loading it on first use.
+
+    Loading before the server forks its workers (e.g. at import time with
+    gunicorn --preload) lets every worker share the same mapped pages.
+    """
+    global _shared_snapshot, _shared_snapshot_loaded
+    if _shared_snapshot_loaded:
+        return _shared_snapshot
+    with _shared_lock:
+        if not _shared_snapshot_loaded:
+            _shared_snapshot = load_snapshot()
+            _shared_snapshot_loaded = True
+    return _shared_snapshot
@@ -0,0 +1,373 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core.quota import QuotaGovernor
+from app.db.models import ConversationLog, Lead, OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+# Graph API error codes that mean "slow down" rather than "this message is bad":
+# app, user and page level throttling, custom rate limits and Messenger
+# business-use-case limits.
+GRAPH_THROTTLE_CODES = frozenset({4, 17, 32, 613, 80001, 80006})
+
+KINDS = ("private_reply", "direct_message")
+
+
+def is_throttling_error(error: httpx.HTTPStatusError) -> bool:
+    """
+    Tells whether a failed Graph call was rejected for rate limiting.
+    """
+    if error.response.status_code == 429:
+        return True
+    try:
+        code = (error.response.json().get("error") or {}).get("code")
+    except ValueError:
+        return False
+    return code in GRAPH_THROTTLE_CODES
+
+
+class OutboundMessageQueue:
+    """
+    A persistent queue for Facebook private replies and DMs.
+
+    Callers enqueue and get an acknowledgement straight away; a pool of worker
+    threads delivers the messages from the `outbound_messages` table:
+
+    - Each sending page has a token bucket (OUTBOUND_PAGE_RATE messages per
+      minute, bursts of OUTBOUND_PAGE_BURST), shared across processes through
+      QuotaGovernor.
+    - Each recipient gets at most one message per OUTBOUND_RECIPIENT_INTERVAL
+      seconds, checked against the messages already sent to them. Private
+      replies go to a different comment ID each time, so the check is keyed
+      on the person (recipient_user_id) rather than on recipient_id.
+    - When Graph answers with a throttling error the page backs off
+      adaptively: the pause doubles on every consecutive throttle (up to
+      max_backoff) and resets after a successful send.
+    - Other failures are retried with exponential delays until max_attempts.
+
+    Delivery status is written back to the message's ConversationLog row.
+    Workers claim rows before sending, so several processes can drain the
+    same queue; a claim older than `claim_timeout` is assumed abandoned.
+    """
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None, facebook_service=None,
+                 page_rate_per_minute: Optional[float] = None, page_burst: Optional[int] = None,
+                 recipient_interval: Optional[float] = None, max_attempts: int = 5,
+                 base_backoff: float = 30.0, max_backoff: float = 15 * 60.0,
+                 claim_timeout: float = 5 * 60.0, poll_interval: float = 1.0,
+                 clock: Callable[[], datetime] = datetime.utcnow):
+        self._session_factory = session_factory
+        self._facebook_service = facebook_service
+        self.page_rate_per_minute = page_rate_per_minute or float(os.environ.get("OUTBOUND_PAGE_RATE", "30"))
+        self.page_burst = page_burst or int(os.environ.get("OUTBOUND_PAGE_BURST", "10"))
+        self.recipient_interval = recipient_interval if recipient_interval is not None else \
+            float(os.environ.get("OUTBOUND_RECIPIENT_INTERVAL", "60"))
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._page_limiters: Dict[str, QuotaGovernor] = {}
+        self._page_backoff: Dict[str, float] = {}
+        self._page_paused_until: Dict[str, datetime] = {}
+        self._stop = threading.Event()
+        self._workers: List[threading.Thread] = []
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from app.db.client import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    @property
+    def facebook_service(self):
+        if self._facebook_service is None:
+            from app.core.container import get_container
+            from app.services.facebook_service import FacebookService
+            self._facebook_service = get_container().get(FacebookService)
+        return self._facebook_service
+
+    def enqueue(self, db: Session, kind: str, recipient_id: str, message: str, lead_id: Optional[int] = None,
+                page_id: Optional[str] = None, lead_status_on_sent: Optional[str] = None,
+                commit: bool = True, recipient_user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queues a message for delivery.
+
+        Args:
+            db: The caller's session.
+            kind: "private_reply" (recipient_id is a comment ID) or
+                  "direct_message" (recipient_id is a user ID).
+            lead_id: If given, the message is logged to the lead's conversation
+                     with delivery_status "queued".
+            page_id: The sending page; defaults to FACEBOOK_PAGE_ID.
+            lead_status_on_sent: Lead status to set once the message is delivered.
+            commit: Commit the session (the default), or only flush so the
+                    message is committed with the caller's own transaction.
+            recipient_user_id: The user a private reply goes to (the
+                               commenter's ID); DMs use recipient_id.
+
+        Returns:
+            An acknowledgement: {"message_id": ..., "status": "queued"}.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown outbound message kind '{kind}'. Expected one of {KINDS}.")
+
+        conversation_log = None
+        if lead_id is not None:
+            conversation_log = ConversationLog(lead_id=lead_id, sender="bot", message=message,
+                                               delivery_status="queued")
+            db.add(conversation_log)
+
+        if recipient_user_id is None and kind == "direct_message":
+            recipient_user_id = recipient_id
+        outbound = OutboundMessage(
+            kind=kind,
+            page_id=page_id or os.environ.get("FACEBOOK_PAGE_ID") or "default",
+            recipient_id=str(recipient_id),
+            recipient_user_id=str(recipient_user_id) if recipient_user_id is not None else None,
+            message=message,
+            status="queued",
+            attempts=0,
+            next_attempt_at=self._clock(),
+            lead_id=lead_id,
+            conversation_log=conversation_log,
+            lead_status_on_sent=lead_status_on_sent,
+        )
+        db.add(outbound)
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        return {"message_id": outbound.id, "status": "queued"}
+
+    def _page_limiter(self, page_id: str) -> QuotaGovernor:
+        with self._lock:
+            limiter = self._page_limiters.get(page_id)
+            if limiter is None:
+                refill_period = self.page_burst / (self.page_rate_per_minute / 60.0)
+                limiter = QuotaGovernor(f"facebook.page:{page_id}", self.page_burst, refill_period=refill_period,
+                                        session_factory=self.session_factory)
+                self._page_limiters[page_id] = limiter
+            return limiter
+
+    def _claim(self, db: Session, limit: int) -> List[OutboundMessage]:
+        now = self._clock()
+        stale = now - timedelta(seconds=self.claim_timeout)
+        messages = (
+            db.query(OutboundMessage)
+            .filter(or_(
+                (OutboundMessage.status == "queued") & (OutboundMessage.next_attempt_at <= now),
+                (OutboundMessage.status == "sending") & (OutboundMessage.claimed_at < stale),
+            ))
+            .order_by(OutboundMessage.next_attempt_at, OutboundMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        # SKIP LOCKED keeps workers apart on Postgres; the conditional update
+        # also makes the claim safe where row locks are not available.
+        claimed_ids = []
+        for message in messages:
+            claimed = (
+                db.query(OutboundMessage)
+                .filter(OutboundMessage.id == message.id, OutboundMessage.status == message.status,
+                        OutboundMessage.claimed_at == message.claimed_at,
+                        OutboundMessage.attempts == message.attempts)
+                .update({"status": "sending", "claimed_at": now}, synchronize_session=False)
+            )
+            if claimed:
+                claimed_ids.append(message.id)
+        db.commit()
+        if not claimed_ids:
+            return []
+        return (
+            db.query(OutboundMessage)
+            .filter(OutboundMessage.id.in_(claimed_ids))
+            .order_by(OutboundMessage.next_attempt_at, OutboundMessage.id)
+            .all()
+        )
+
+    def _reschedule(self, message: OutboundMessage, delay: float, error: Optional[str] = None):
+        message.status = "queued"
+        message.next_attempt_at = self._clock() + timedelta(seconds=delay)
+        message.claimed_at = None
+        if error is not None:
+            message.last_error = error
+
+    def _rate_limit_delay(self, db: Session, message: OutboundMessage) -> float:
+        """
+        Returns 0 if the message may be sent now, else the seconds to wait.
+        Takes a page token when it returns 0.
+        """
+        now = self._clock()
+        paused_until = self._page_paused_until.get(message.page_id)
+        if paused_until is not None and paused_until > now:
+            return (paused_until - now).total_seconds()
+
+        if self.recipient_interval > 0:
+            if message.recipient_user_id is not None:
+                same_recipient = OutboundMessage.recipient_user_id == message.recipient_user_id
+            else:
+                # Queued before the user was recorded.
+                same_recipient = OutboundMessage.recipient_id == message.recipient_id
+            last_sent = db.query(func.max(OutboundMessage.sent_at)).filter(
+                same_recipient,
+                OutboundMessage.status == "sent",
+            ).scalar()
+            if last_sent is not None:
+                ready_at = last_sent + timedelta(seconds=self.recipient_interval)
+                if ready_at > now:
+                    return (ready_at - now).total_seconds()
+
+        if not self._page_limiter(message.page_id).acquire(timeout=0):
+            return 60.0 / self.page_rate_per_minute
+        return 0.0
+
+    def _throttled(self, page_id: str) -> float:
+        with self._lock:
+            backoff = min(self.max_backoff, max(self.base_backoff, self._page_backoff.get(page_id, 0.0) * 2))
+            self._page_backoff[page_id] = backoff
+            self._page_paused_until[page_id] = self._clock() + timedelta(seconds=backoff)
+        logger.warning("Graph throttled page %s; pausing its sends for %.0fs", page_id, backoff)
+        return backoff
+
+    def _send(self, message: OutboundMessage) -> Dict[str, Any]:
+        if message.kind == "private_reply":
+            return self.facebook_service.send_private_reply(message.recipient_id, message.message)
+        return self.facebook_service.send_direct_message(message.recipient_id, message.message)
+
+    def _set_delivery_status(self, message: OutboundMessage, status: str):
+        if message.conversation_log is not None:
+            message.conversation_log.delivery_status = status
+
+    def _deliver(self, db: Session, message: OutboundMessage):
+        delay = self._rate_limit_delay(db, message)
+        if delay > 0:
+            self._reschedule(message, delay)
+            db.commit()
+            return
+
+        message.attempts += 1
+        try:
+            result = self._send(message) or {}
+        except httpx.HTTPStatusError as e:
+            if is_throttling_error(e):
+                # Not the message's fault; it does not use up an attempt.
+                message.attempts -= 1
+                self._reschedule(message, self._throttled(message.page_id), error=str(e))
+            else:
+                self._retry_or_fail(message, str(e))
+        except httpx.HTTPError as e:
+            self._retry_or_fail(message, str(e))
+        else:
+            with self._lock:
+                self._page_backoff.pop(message.page_id, None)
+            message.status = "sent"
+            message.sent_at = self._clock()
+            message.claimed_at = None
+            message.last_error = None
+            message.graph_message_id = result.get("message_id") or result.get("id")
+            self._set_delivery_status(message, "sent")
+            if message.lead_status_on_sent and message.lead_id is not None:
+                db.query(Lead).filter(Lead.id == message.lead_id).update(
+                    {"status": message.lead_status_on_sent, "last_updated_at": self._clock()},
+                    synchronize_session=False,
+                )
+        db.commit()
+
+    def _retry_or_fail(self, message: OutboundMessage, error: str):
+        if message.attempts >= self.max_attempts:
+            logger.error("Giving up on outbound message %s after %s attempts: %s", message.id, message.attempts, error)
+            message.status = "failed"
+            message.claimed_at = None
+            message.last_error = error
+            self._set_delivery_status(message, "failed")
+            return
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (message.attempts - 1)))
+        logger.warning("Outbound message %s failed (%s); retrying in %.0fs", message.id, error, delay)
+        self._reschedule(message, delay, error=error)
+
+    def process_due(self, limit: int = 10) -> int:
+        """
+        Claims up to `limit` due messages and tries to deliver each one.
+
+        Returns:
+            The number of messages claimed.
+        """
+        db = self.session_factory()
+        try:
+            messages = self._claim(db, limit)
+            for message in messages:
+                try:
+                    self._deliver(db, message)
+                except Exception as e:
+                    logger.error("Unexpected error delivering outbound message %s: %s", message.id, e)
+                    db.rollback()
+            return len(messages)
+        finally:
+            db.close()
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.process_due(limit=1)
+            except Exception as e:
+                logger.error("Outbound queue worker error: %s", e)
+                claimed = 0
+            if not claimed:
+                self._stop.wait(self.poll_interval)
+
+    def start(self, workers: Optional[int] = None):
+        """
+        Starts the worker pool (OUTBOUND_WORKERS threads by default; 0 leaves
+        the queue to another process).
+        """
+        count = workers if workers is not None else int(os.environ.get("OUTBOUND_WORKERS", "4"))
+        if self._workers or count <= 0:
+            return
+        self._stop.clear()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"outbound-queue-{i}", daemon=True) for i in range(count)
+        ]
+        for worker in self._workers:
+            worker.start()
+        logger.info("Started %s outbound message workers.", count)
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def stats(self, db: Session) -> Dict[str, int]:
+        """
+        Returns the number of messages in each status.
+        """
+        counts = dict(db.query(OutboundMessage.status, func.count(OutboundMessage.id))
+                      .group_by(OutboundMessage.status).all())
+        return {status: counts.get(status, 0) for status in ("queued", "sending", "sent", "failed")}
+
+
+_shared_queue: Optional[OutboundMessageQueue] = None
+_shared_lock = threading.Lock()
+
+
+def get_outbound_queue() -> OutboundMessageQueue:
+    """
+    Returns the process-wide outbound message queue.
+    """
+    global _shared_queue
+    with _shared_lock:
+        if _shared_queue is None:
+            _shared_queue = OutboundMessageQueue()
+    return _shared_queue
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+
+def default_catalog_path() -> str:
+    """
+    PSC_CATALOG_PATH, or psc_catalog.sqlite3 under the user's data directory
+    ($XDG_DATA_HOME/govbidgenie, by default ~/.local/share/govbidgenie).
+    Unlike the temp directory, that location is kept across reboots.
+    """
+    if os.environ.get("PSC_CATALOG_PATH"):
+        return os.environ["PSC_CATALOG_PATH"]
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(data_home, "govbidgenie", "psc_catalog.sqlite3")
+
+
+class PSCCatalog:
+    """
+    A local, on-disk copy of the SAM.gov PSC code list.
+
+    Stored in a small SQLite file (see default_catalog_path) so it survives
+    restarts and can be shared by every process on the host. The catalog is replaced wholesale by
+    PSCService.refresh_catalog and topped up one code at a time when a live
+    lookup finds something the last bulk load didn't have.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_catalog_path()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS psc_codes ("
+                " code TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " refreshed_at TEXT NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Opens a connection for one transaction (committed on success, rolled
+        back on error) and closes it afterwards.
+        """
+        with closing(sqlite3.connect(self.path, timeout=10)) as conn, conn:
+            yield conn
+
+    def get(self, psc_code: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT name FROM psc_codes WHERE code = ?", (psc_code,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, psc_code: str, name: str):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO psc_codes (code, name, refreshed_at) VALUES (?, ?, ?)",
+                (psc_code, name, datetime.utcnow().isoformat()),
+            )
+
+    def replace_all(self, names_by_code: Dict[str, str]):
+        """
+        Swaps in a freshly downloaded code list in a single transaction.
+        """
+        refreshed_at = datetime.utcnow().isoformat()
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM psc_codes")
+            conn.executemany(
+                "INSERT INTO psc_codes (code, name, refreshed_at) VALUES (?, ?, ?)",
+                [(code, name, refreshed_at) for code, name in names_by_code.items()],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO catalog_meta (key, value) VALUES ('last_refreshed_at', ?)",
+                (refreshed_at,),
+            )
+
+    def last_refreshed_at(self) -> Optional[datetime]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'last_refreshed_at'").fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM psc_codes").fetchone()[0]
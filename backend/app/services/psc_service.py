@@ -1,29 +1,100 @@
-import requests
+import httpx
 import os
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from app.core.cache import MISSING, TTLCache
+from app.core.http_cache import HTTPResponseCache, ReplayMissError, get_http_cache
+from app.core.http_client import HTTPClient, get_http_client
+from app.core.quota import BULK, NORMAL, QuotaGovernor, get_quota_governor
+from app.services.psc_catalog import PSCCatalog
+
+# Shared by every PSCService in the process. Hits are kept for a day, misses
+# for an hour so a newly published code is picked up reasonably quickly.
+_description_cache = TTLCache(maxsize=4096, ttl=24 * 60 * 60)
+NEGATIVE_CACHE_TTL = 60 * 60
+CATALOG_MAX_AGE = timedelta(days=7)
+# Seconds a live lookup waits for SAM.gov quota before giving up.
+QUOTA_TIMEOUT = 30.0
+
+_shared_catalog: Optional[PSCCatalog] = None
+
+
+def _get_shared_catalog() -> Optional[PSCCatalog]:
+    global _shared_catalog
+    if _shared_catalog is None:
+        try:
+            _shared_catalog = PSCCatalog()
+        except Exception as e:
+            print(f"PSC Service: Local catalog unavailable, using live lookups only: {e}")
+            return None
+    return _shared_catalog
+
 
 class PSCService:
     """
     A service to interact with the SAM.gov PSC Public API to get descriptions for PSC codes.
     API documentation: https://open.gsa.gov/api/PSC-Public-API/
+
+    Lookups are served from an in-memory LRU+TTL cache, then from a local
+    on-disk catalog (see PSCCatalog), and only fall through to the live API
+    for codes neither of them knows. Live calls share the SAM.gov API quota
+    (see app.core.quota).
     """
-    def __init__(self):
+    def __init__(self, catalog: Optional[PSCCatalog] = None, cache: Optional[TTLCache] = None, timeout: float = 10.0,
+                 http_cache: Optional[HTTPResponseCache] = None, quota: Optional[QuotaGovernor] = None,
+                 http_client: Optional[HTTPClient] = None):
         self.base_url = "https://api.sam.gov/prod/locationservices/v1/api/publicpscdetails"
         self.api_key = os.getenv("SAM_GOV_API_KEY")
+        self.catalog = catalog if catalog is not None else _get_shared_catalog()
+        self.cache = cache if cache is not None else _description_cache
+        self.timeout = timeout
+        self.http = http_client if http_client is not None else get_http_client()
+        self.http_cache = http_cache if http_cache is not None else get_http_cache()
+        self.quota = quota if quota is not None else get_quota_governor()
 
-    def get_description_for_code(self, psc_code: str) -> Optional[str]:
+    def get_description_for_code(self, psc_code: str, priority: int = NORMAL) -> Optional[str]:
         """
         Fetches the name/description for a given PSC code.
 
         Args:
             psc_code: The PSC code.
+            priority: Quota priority for a live lookup (see app.core.quota).
 
         Returns:
             The official name string if found, otherwise None.
         """
+        cached = self.cache.get(psc_code)
+        if cached is not MISSING:
+            return cached
+
+        if self.catalog is not None:
+            name = self.catalog.get(psc_code)
+            if name:
+                self.cache.set(psc_code, name)
+                return name
+
+        name = self._fetch_description(psc_code, priority)
+        if name is MISSING:
+            # The lookup failed; try again next time rather than hiding the code.
+            return None
+        if name:
+            self.cache.set(psc_code, name)
+            if self.catalog is not None:
+                self.catalog.put(psc_code, name)
+        else:
+            self.cache.set(psc_code, None, ttl=NEGATIVE_CACHE_TTL)
+        return name
+
+    def _fetch_description(self, psc_code: str, priority: int = NORMAL) -> Any:
+        """
+        Returns:
+            The name, None if SAM.gov does not know the code, or MISSING if
+            the lookup could not be made (no API key, quota, network errors).
+        """
         if not self.api_key:
             print("PSC Service: SAM_GOV_API_KEY is not set. Cannot make API calls.")
-            return None
+            return MISSING
 
         params = {
             'api_key': self.api_key,
@@ -32,20 +103,71 @@ class PSCService:
         }
         
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
+            fetch = self.quota.guard(self.http.get, priority, timeout=QUOTA_TIMEOUT)
+            data = self.http_cache.get_json(fetch, self.base_url, params=params, timeout=self.timeout)
             
-            data = response.json()
-            
-            if data.get("totalRecords") != "0" and "productServiceCodeList" in data:
+            if data.get("totalRecords") != "0" and data.get("productServiceCodeList"):
                 # Return the name of the first result
                 return data["productServiceCodeList"][0].get("pscName")
             else:
                 print(f"PSC Service: No description found for PSC code '{psc_code}'.")
                 return None
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                print(f"PSC Service: No description found for PSC code '{psc_code}'.")
+                return None
+            print(f"PSC Service: API request failed: {e}")
+            return MISSING
+        except (httpx.HTTPError, ReplayMissError) as e:
             print(f"PSC Service: Could not connect to API: {e}")
-            return None
+            return MISSING
         except Exception as e:
             print(f"PSC Service: An error occurred: {e}")
-            return None 
\ No newline at end of file
+            return MISSING
+
+    def refresh_catalog(self, force: bool = False) -> int:
+        """
+        Bulk-downloads every PSC code into the local catalog.
+
+        Skipped when the catalog was refreshed within CATALOG_MAX_AGE, unless
+        `force` is set.
+
+        Returns:
+            The number of codes loaded, or 0 if nothing was refreshed.
+        """
+        if self.catalog is None or not self.api_key:
+            print("PSC Service: Catalog refresh skipped (no catalog or SAM_GOV_API_KEY).")
+            return 0
+
+        last_refreshed = self.catalog.last_refreshed_at()
+        if not force and last_refreshed and datetime.utcnow() - last_refreshed < CATALOG_MAX_AGE:
+            return 0
+
+        params = {
+            'api_key': self.api_key,
+            'q': '',
+            'active': 'ALL'
+        }
+        try:
+            fetch = self.quota.guard(self.http.get, BULK, timeout=QUOTA_TIMEOUT)
+            data = self.http_cache.get_json(
+                fetch, self.base_url, params=params, timeout=max(self.timeout, 60.0)
+            )
+            records = data.get("productServiceCodeList") or []
+        except (httpx.HTTPError, ValueError, ReplayMissError) as e:
+            print(f"PSC Service: Catalog refresh failed: {e}")
+            return 0
+
+        names_by_code: Dict[str, str] = {}
+        for record in records:
+            code, name = record.get("pscCode"), record.get("pscName")
+            if code and name:
+                names_by_code[code] = name
+        if not names_by_code:
+            print("PSC Service: Catalog refresh returned no codes; keeping the existing catalog.")
+            return 0
+
+        self.catalog.replace_all(names_by_code)
+        self.cache.clear()
+        print(f"PSC Service: Refreshed local catalog with {len(names_by_code)} codes.")
+        return len(names_by_code)
@@ -1,32 +1,78 @@
 import os
-import requests
+import asyncio
+import itertools
+import time
+import httpx
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 
+from app.core.http_cache import HTTPResponseCache, ReplayMissError, get_http_cache
+from app.core.http_client import HTTPClient, get_http_client
+from app.core.quota import BULK, INTERACTIVE, QuotaGovernor, get_quota_governor
+
 class SAMService:
     """
     Service to interact with the SAM.gov Opportunities API.
     """
-    def __init__(self):
+    # SAM.gov caps a single page at 1000 records.
+    MAX_PAGE_SIZE = 1000
+    # Seconds a request waits for quota before it is treated as failed.
+    QUOTA_TIMEOUT = 30.0
+    # Minimum seconds between sync probes of an up-to-date profile. Each probe
+    # costs a quota token per shard, so probing every 5 minutes would spend
+    # ~288 of the 1000 daily tokens per shard.
+    PROBE_INTERVAL = float(os.environ.get("SAM_SYNC_PROBE_INTERVAL", str(30 * 60)))
+
+    def __init__(self, http_cache: Optional[HTTPResponseCache] = None, quota: Optional[QuotaGovernor] = None,
+                 http_client: Optional[HTTPClient] = None):
         self.api_key = os.environ.get("SAM_GOV_API_KEY") # Corrected environment variable name
         self.base_url = "https://api.sam.gov/prod/opportunities/v2/search"
         self.headers = {'Accept': 'application/json'}
+        # Record/replay response cache; see app.core.http_cache for the modes.
+        self.http_cache = http_cache if http_cache is not None else get_http_cache()
+        # Daily API quota shared with every other process; see app.core.quota.
+        self.quota = quota if quota is not None else get_quota_governor()
+        # Pooled keep-alive transport shared with the other integrations.
+        self.http = http_client if http_client is not None else get_http_client()
 
-    def fetch_opportunities(self, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    def fetch_opportunities(self, params: Optional[Dict[str, Any]] = None, priority: int = INTERACTIVE) -> List[Dict[str, Any]]:
         """
         Fetches a list of opportunities from the SAM.gov API.
 
         Args:
             params: A dictionary of query parameters to filter the results.
                     Example: {'postedFrom': 'MM/DD/YYYY', 'postedTo': 'MM/DD/YYYY', 'limit': 10}
+            priority: Quota priority. Defaults to INTERACTIVE because this is
+                      the lookup made while a user waits for a reply.
 
         Returns:
             A list of opportunity dictionaries.
         """
-        if params is None:
-            params = {}
+        params = self._prepare_params(params)
+
+        try:
+            data = self._request_page(params, priority=priority)
+            opportunities = data.get("opportunitiesData", [])
+            
+            return self._parse_opportunities(opportunities)
+
+        except httpx.HTTPError as e:
+            print(f"ERROR: Failed to fetch data from SAM.gov. Error: {e}")
+            return []
+        except ValueError: # Catches JSON decoding errors
+            print("ERROR: Failed to decode JSON response from SAM.gov.")
+            return []
+        except ReplayMissError as e:
+            print(f"ERROR: {e}")
+            return []
+
+    def _prepare_params(self, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Copies the caller's params and fills in the API key and default date range.
+        """
+        params = dict(params or {})
 
         # Add the API key to every request
         if self.api_key:
@@ -38,23 +84,251 @@ class SAMService:
             thirty_days_ago = today - timedelta(days=30)
             params['postedTo'] = today.strftime('%Y-%m-%d')
             params['postedFrom'] = thirty_days_ago.strftime('%Y-%m-%d')
+        return params
+
+    def _request_page(self, params: Dict[str, Any], revalidate: bool = False, priority: int = BULK) -> Dict[str, Any]:
+        """
+        Performs one search request and returns the decoded JSON body.
+        Raises on HTTP errors and undecodable responses, QuotaExhaustedError
+        when no quota is available in time, and ReplayMissError when replaying
+        a query that was never recorded.
+
+        Responses served from the HTTP cache do not use any quota.
+        """
+        # Use a GET request with all parameters in the URL. Bad status codes
+        # (4xx or 5xx) raise.
+        fetch = self.quota.guard(self.http.get, priority, timeout=self.QUOTA_TIMEOUT)
+        return self.http_cache.get_json(
+            fetch, self.base_url, params=params, headers=self.headers, revalidate=revalidate
+        )
+
+    def iter_opportunity_pages(
+        self,
+        params: Optional[Dict[str, Any]] = None,
+        page_size: int = MAX_PAGE_SIZE,
+        start_offset: int = 0,
+        max_pages: Optional[int] = None,
+    ) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Walks every page of a search, yielding each page as soon as it arrives.
+
+        SAM.gov's `offset` parameter is a page index, so each yielded item is a
+        `(next_offset, parsed_opportunities)` pair: `next_offset` is the cursor
+        to pass back as `start_offset` to resume after this page. Only one page
+        is held in memory at a time.
+
+        Args:
+            params: Search filters, as for fetch_opportunities. `limit` and
+                    `offset` are managed by the iterator.
+            page_size: Records per request, at most MAX_PAGE_SIZE.
+            start_offset: The page index to start from (a saved cursor).
+            max_pages: Stop after this many pages, if given.
+
+        Raises:
+            httpx.HTTPError or ValueError if a page cannot
+            be fetched or decoded. Pages yielded before the failure are complete,
+            so the last cursor received is safe to resume from.
+        """
+        params = self._prepare_params(params)
+        page_size = max(1, min(page_size, self.MAX_PAGE_SIZE))
+        offset = start_offset
+        pages_fetched = 0
+
+        while max_pages is None or pages_fetched < max_pages:
+            params['limit'] = page_size
+            params['offset'] = offset
+            data = self._request_page(params)
+            raw_page = data.get("opportunitiesData") or []
+            pages_fetched += 1
+            offset += 1
 
+            if raw_page:
+                yield offset, self._parse_opportunities(raw_page)
+
+            total_records = int(data.get("totalRecords") or 0)
+            if len(raw_page) < page_size or offset * page_size >= total_records:
+                return
+
+    def iter_opportunities(self, params: Optional[Dict[str, Any]] = None, page_size: int = MAX_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Yields every parsed opportunity matching `params`, across all pages.
+        """
+        for _, page in self.iter_opportunity_pages(params, page_size=page_size):
+            yield from page
+
+    @staticmethod
+    def build_shards(
+        keywords: Optional[Sequence[str]] = None,
+        naics_codes: Optional[Sequence[str]] = None,
+        posted_from: Optional[datetime] = None,
+        posted_to: Optional[datetime] = None,
+        shard_days: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Expands keyword, NAICS and date filters into one query per combination.
+
+        Keywords are searched as SAM.gov `title` filters and NAICS codes as
+        `ncode`. When `shard_days` is set, the posted date range is split into
+        consecutive sub-ranges of at most that many days.
+        """
+        posted_to = posted_to or datetime.now()
+        posted_from = posted_from or posted_to - timedelta(days=30)
+
+        date_ranges = []
+        if shard_days:
+            range_start = posted_from
+            while range_start <= posted_to:
+                range_end = min(range_start + timedelta(days=shard_days - 1), posted_to)
+                date_ranges.append((range_start, range_end))
+                range_start = range_end + timedelta(days=1)
+        else:
+            date_ranges.append((posted_from, posted_to))
+
+        shards = []
+        for keyword, naics_code, (range_start, range_end) in itertools.product(
+            keywords or [None], naics_codes or [None], date_ranges
+        ):
+            shard = {
+                'postedFrom': range_start.strftime('%m/%d/%Y'),
+                'postedTo': range_end.strftime('%m/%d/%Y'),
+            }
+            if keyword:
+                shard['title'] = keyword
+            if naics_code:
+                shard['ncode'] = naics_code
+            shards.append(shard)
+        return shards
+
+    async def _iter_pages_async(
+        self, client: Optional[httpx.AsyncClient], params: Dict[str, Any], page_size: int
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Async counterpart of iter_opportunity_pages for a single shard. Uses
+        the shared HTTP client unless a specific `client` is given.
+        """
+        params = self._prepare_params(params)
+        page_size = max(1, min(page_size, self.MAX_PAGE_SIZE))
+        offset = 0
+        while True:
+            params['limit'] = page_size
+            params['offset'] = offset
+            get = client.get if client is not None else self.http.aget
+            fetch = self.quota.guard_async(get, BULK, timeout=self.QUOTA_TIMEOUT)
+            data = await self.http_cache.get_json_async(fetch, self.base_url, params=params, headers=self.headers)
+            raw_page = data.get("opportunitiesData") or []
+            offset += 1
+
+            if raw_page:
+                yield self._parse_opportunities(raw_page)
+
+            total_records = int(data.get("totalRecords") or 0)
+            if len(raw_page) < page_size or offset * page_size >= total_records:
+                return
+
+    async def iter_fan_out(
+        self,
+        shards: Sequence[Dict[str, Any]],
+        concurrency: int = 8,
+        page_size: int = MAX_PAGE_SIZE,
+        shard_timings: Optional[List[Dict[str, Any]]] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Runs every shard concurrently and yields each unique opportunity as soon
+        as the page containing it arrives.
+
+        At most `concurrency` shards are in flight at once. Results are
+        deduplicated by `sam_gov_id` across shards. A failing shard is recorded
+        in `shard_timings` and does not stop the others.
+
+        Args:
+            shards: Query parameter dicts, e.g. from build_shards.
+            concurrency: Maximum number of shards fetched at the same time.
+            page_size: Records per request.
+            shard_timings: If given, one dict per shard is appended with its
+                           params, page and record counts, elapsed seconds and
+                           any error.
+            client: An httpx.AsyncClient to use instead of the shared HTTP
+                    client (which pools connections and retries).
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        queue: "asyncio.Queue" = asyncio.Queue()
+        done_marker = object()
+        seen_ids = set()
+
+        async def run_shard(shard: Dict[str, Any]):
+            async with semaphore:
+                timing = {"shard": dict(shard), "pages": 0, "records": 0, "seconds": 0.0, "error": None}
+                started = time.perf_counter()
+                try:
+                    async for page in self._iter_pages_async(client, shard, page_size):
+                        timing["pages"] += 1
+                        timing["records"] += len(page)
+                        await queue.put(page)
+                except (httpx.HTTPError, ValueError, ReplayMissError) as e:
+                    timing["error"] = str(e)
+                    print(f"ERROR: SAM.gov shard {shard} failed: {e}")
+                finally:
+                    timing["seconds"] = time.perf_counter() - started
+                    if shard_timings is not None:
+                        shard_timings.append(timing)
+                    await queue.put(done_marker)
+
+        tasks = [asyncio.create_task(run_shard(shard)) for shard in shards]
         try:
-            # Use a GET request with all parameters in the URL
-            response = requests.get(self.base_url, params=params, headers=self.headers)
-            response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+            remaining = len(tasks)
+            while remaining:
+                item = await queue.get()
+                if item is done_marker:
+                    remaining -= 1
+                    continue
+                for opportunity in item:
+                    sam_id = opportunity.get('sam_gov_id')
+                    if sam_id and sam_id in seen_ids:
+                        continue
+                    if sam_id:
+                        seen_ids.add(sam_id)
+                    yield opportunity
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
-            data = response.json()
-            opportunities = data.get("opportunitiesData", [])
-            
-            return self._parse_opportunities(opportunities)
+    async def fan_out(
+        self,
+        keywords: Optional[Sequence[str]] = None,
+        naics_codes: Optional[Sequence[str]] = None,
+        posted_from: Optional[datetime] = None,
+        posted_to: Optional[datetime] = None,
+        shard_days: Optional[int] = None,
+        concurrency: int = 8,
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Searches SAM.gov across keywords, NAICS codes and date sub-ranges
+        concurrently instead of one query after another.
 
-        except requests.exceptions.RequestException as e:
-            print(f"ERROR: Failed to fetch data from SAM.gov. Error: {e}")
-            return []
-        except ValueError: # Catches JSON decoding errors
-            print("ERROR: Failed to decode JSON response from SAM.gov.")
-            return []
+        Returns:
+            A tuple of (deduplicated opportunities, per-shard timings).
+        """
+        shards = self.build_shards(keywords, naics_codes, posted_from, posted_to, shard_days)
+        shard_timings: List[Dict[str, Any]] = []
+        opportunities = [
+            opportunity async for opportunity in self.iter_fan_out(
+                shards, concurrency=concurrency, shard_timings=shard_timings, client=client
+            )
+        ]
+        return opportunities, shard_timings
+
+    async def _fan_out_once(self, **kwargs) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Runs fan_out on a short-lived event loop (asyncio.run), closing that
+        loop's pooled connections before the loop goes away.
+        """
+        try:
+            return await self.fan_out(**kwargs)
+        finally:
+            await self.http.aclose()
 
     def _parse_opportunities(self, opportunities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -85,12 +359,14 @@ class SAMService:
             parsed_list.append(parsed_opp)
         return parsed_list
 
-    def fetch_and_store_opportunities(self, db: "Session"):
+    def fetch_and_store_opportunities(self, db: "Session", page_size: int = MAX_PAGE_SIZE):
         """
         Fetches opportunities from the SAM.gov API and stores them in the database.
         Prevents duplicates by checking the sam_gov_id.
+
+        Every page of the last 24 hours is ingested and committed as it arrives,
+        so a busy day is no longer truncated and memory stays bounded by one page.
         """
-        from app.db.models import Opportunity
         from datetime import datetime, timedelta
 
         print("SAM Service: Starting to fetch and store opportunities...")
@@ -101,49 +377,165 @@ class SAMService:
         posted_to = today.strftime('%m/%d/%Y')
 
         params = {
-            'limit': 100,
             'postedFrom': posted_from,
             'postedTo': posted_to
         }
 
-        opportunities_data = self.fetch_opportunities(params=params)
-        if not opportunities_data:
-            print("SAM Service: No new opportunities found in the last 24 hours.")
-            return
-
+        seen_count = 0
         new_opportunities_count = 0
-        for opp_data in opportunities_data:
-            sam_id = opp_data.get('sam_gov_id')
-            if not sam_id:
-                continue
-
-            exists = db.query(Opportunity).filter(Opportunity.sam_gov_id == sam_id).first()
-            if not exists:
-                posted_date_obj = None
-                if opp_data.get('posted_date'):
-                    try:
-                        posted_date_obj = datetime.strptime(opp_data['posted_date'], '%Y-%m-%d')
-                    except (ValueError, TypeError):
-                        continue
-                
-                new_opp = Opportunity(
-                    sam_gov_id=sam_id,
-                    title=opp_data.get('title'),
-                    url=opp_data.get('url'),
-                    agency=opp_data.get('agency'),
-                    posted_date=posted_date_obj,
-                    naics_code=opp_data.get('naicsCode'),
-                    psc_code=opp_data.get('classificationCode')
-                )
-                db.add(new_opp)
-                new_opportunities_count += 1
-        
-        if new_opportunities_count > 0:
-            db.commit()
+        try:
+            for cursor, page in self.iter_opportunity_pages(params=params, page_size=page_size):
+                seen_count += len(page)
+                new_opportunities_count += self._store_opportunities(db, page)
+                print(f"SAM Service: Page done ({seen_count} seen, {new_opportunities_count} new, next offset {cursor}).")
+        except (httpx.HTTPError, ValueError, ReplayMissError) as e:
+            print(f"ERROR: SAM.gov fetch stopped early after {seen_count} opportunities. Error: {e}")
+
+        if seen_count == 0:
+            print("SAM Service: No new opportunities found in the last 24 hours.")
+        elif new_opportunities_count > 0:
             print(f"SAM Service: Successfully stored {new_opportunities_count} new opportunities.")
         else:
             print("SAM Service: No new opportunities to store.")
 
+    def _store_opportunities(self, db: "Session", opportunities: List[Dict[str, Any]]) -> int:
+        """
+        Stores the opportunities that aren't stored yet in one bulk upsert.
+
+        Returns:
+            The number of new opportunities stored.
+        """
+        from app.services.ingest_service import IngestService
+
+        if not opportunities:
+            return 0
+        return IngestService(db).bulk_upsert_opportunities(opportunities)["inserted"]
+
+    def _count_window(self, shards: List[Dict[str, Any]]) -> int:
+        """
+        Asks SAM.gov how many records each shard matches (one record per
+        request) and returns the total.
+        """
+        total = 0
+        for shard in shards:
+            params = self._prepare_params(shard)
+            params['limit'] = 1
+            params['offset'] = 0
+            # The probe decides whether to sync at all, so never trust a cached count.
+            total += int(self._request_page(params, revalidate=True).get("totalRecords") or 0)
+        return total
+
+    def sync_opportunities(
+        self,
+        db: "Session",
+        profile: str = "default",
+        keywords: Optional[Sequence[str]] = None,
+        naics_codes: Optional[Sequence[str]] = None,
+        initial_lookback_days: int = 1,
+        shard_days: int = 30,
+        concurrency: int = 4,
+    ) -> Dict[str, Any]:
+        """
+        Incrementally syncs one query profile from its persisted watermark.
+
+        The search window starts on the day of the newest postedDate already
+        ingested for the profile (SAM.gov dates are day-granular, so that day is
+        re-read to catch late same-day postings) and runs to today. After
+        downtime the window simply gets longer and is fetched in
+        `shard_days`-sized date shards through fan_out. Before fetching, a
+        one-record probe compares SAM.gov's totalRecords for the window with the
+        last completed run; if the window and count are unchanged the run is a
+        no-op. A profile that was up to date less than PROBE_INTERVAL seconds
+        ago is not probed at all ("skipped"), so syncing every few minutes
+        costs no quota between probes.
+
+        The watermark only advances when every shard succeeded, so a failed or
+        partial run is retried from the same point next time.
+
+        Returns:
+            A summary dict with the run's status, window and counts.
+        """
+        from app.db.models import SamSyncState
+
+        now = datetime.now()
+        state = db.query(SamSyncState).filter(SamSyncState.profile == profile).first()
+        if state is None:
+            state = SamSyncState(profile=profile)
+            db.add(state)
+
+        if state.watermark_posted_date is not None:
+            window_start = datetime.combine(state.watermark_posted_date.date(), datetime.min.time())
+        else:
+            window_start = datetime.combine((now - timedelta(days=initial_lookback_days)).date(), datetime.min.time())
+
+        summary = {"profile": profile, "window_start": window_start, "window_end": now, "status": None,
+                   "new_count": 0, "seen_count": 0, "shard_timings": []}
+        if (state.window_start == window_start and state.last_success_at is not None
+                and (now - state.last_success_at).total_seconds() < self.PROBE_INTERVAL):
+            db.commit()
+            summary["status"] = "skipped"
+            return summary
+
+        shards = self.build_shards(keywords, naics_codes, window_start, now, shard_days)
+        state.last_run_at = now
+
+        try:
+            window_total = self._count_window(shards)
+        except (httpx.HTTPError, ValueError, ReplayMissError) as e:
+            print(f"ERROR: SAM.gov sync probe failed for profile '{profile}': {e}")
+            db.commit()
+            summary["status"] = "failed"
+            return summary
+
+        if state.window_start == window_start and state.window_total == window_total:
+            state.last_success_at = now
+            db.commit()
+            summary["status"] = "unchanged"
+            return summary
+
+        opportunities, shard_timings = asyncio.run(self._fan_out_once(
+            keywords=keywords,
+            naics_codes=naics_codes,
+            posted_from=window_start,
+            posted_to=now,
+            shard_days=shard_days,
+            concurrency=concurrency,
+        ))
+        summary["shard_timings"] = shard_timings
+        summary["seen_count"] = len(opportunities)
+        summary["new_count"] = self._store_opportunities(db, opportunities)
+
+        if any(timing["error"] for timing in shard_timings):
+            print(f"SAM Service: Sync for profile '{profile}' was partial; keeping the watermark.")
+            # Fetch the window again on the next run instead of trusting an old count.
+            state.window_start, state.window_total = None, None
+            state.last_new_count = summary["new_count"]
+            db.commit()
+            summary["status"] = "partial"
+            return summary
+
+        posted_dates = [opp['posted_date'].replace(tzinfo=None) for opp in opportunities if opp.get('posted_date')]
+        if posted_dates:
+            newest = max(posted_dates)
+            if state.watermark_posted_date is None or newest > state.watermark_posted_date:
+                state.watermark_posted_date = newest
+        elif state.watermark_posted_date is None:
+            state.watermark_posted_date = window_start
+
+        # Remember the count for the window the *next* run will ask about.
+        next_window_start = datetime.combine(state.watermark_posted_date.date(), datetime.min.time())
+        if next_window_start == window_start:
+            state.window_start, state.window_total = window_start, window_total
+        else:
+            state.window_start, state.window_total = None, None
+        state.last_new_count = summary["new_count"]
+        state.last_success_at = now
+        db.commit()
+
+        print(f"SAM Service: Synced profile '{profile}': {summary['seen_count']} seen, {summary['new_count']} new.")
+        summary["status"] = "synced"
+        return summary
+
 # Example usage (for testing or direct script execution):
 if __name__ == '__main__':
     service = SAMService()
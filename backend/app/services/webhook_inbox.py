@@ -0,0 +1,257 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models import WebhookEvent
+from app.services.event_ledger import EventLedger, delivery_event_key, get_event_ledger
+
+logger = logging.getLogger(__name__)
+
+
+def iter_comment_events(payload: Dict[str, Any]) -> Iterator[Dict[str, str]]:
+    """
+    Yields {"comment_text", "user_id", "comment_id"} for every new comment in a
+    Facebook page webhook payload. Edits, deletes and incomplete comments are
+    skipped.
+    """
+    if payload.get("object") != "page":
+        return
+    for entry in payload.get("entry", []):
+        for change in entry.get("changes", []):
+            if change.get("field") == "feed" and change.get("value", {}).get("item") == "comment":
+                comment_data = change.get("value")
+                # We only care about new comments, not edits or deletes
+                if comment_data.get("verb") != "add":
+                    continue
+
+                user_id = comment_data.get("from", {}).get("id")
+                comment_id = comment_data.get("comment_id")
+                comment_text = comment_data.get("message")
+
+                if user_id and comment_id and comment_text:
+                    yield {"comment_text": comment_text, "user_id": user_id, "comment_id": comment_id}
+
+
+class WebhookInbox:
+    """
+    A durable inbox for webhook deliveries.
+
+    The webhook endpoint only records the raw request body (one row in
+    `webhook_inbox`) and returns, so Facebook gets its acknowledgement in
+    milliseconds. A pool of worker threads (WEBHOOK_WORKERS, default 4) claims
+    pending events and runs the comment pipeline for them through
+    LeadService.process_comments.
+
+    A failed event is retried with exponential delays until max_attempts, then
+    left as "failed" for inspection. Claims older than `claim_timeout` are
+    assumed abandoned by a crashed worker and picked up again.
+
+    Redelivered bodies are dropped at record time through the event ledger;
+    individual comments are deduplicated again in process_comments.
+    """
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None,
+                 lead_service_factory: Optional[Callable[[Session], Any]] = None, max_attempts: int = 5,
+                 base_backoff: float = 10.0, max_backoff: float = 10 * 60.0, claim_timeout: float = 5 * 60.0,
+                 poll_interval: float = 0.5, clock: Callable[[], datetime] = datetime.utcnow,
+                 ledger: Optional[EventLedger] = None):
+        self._session_factory = session_factory
+        self.ledger = ledger if ledger is not None else get_event_ledger()
+        self._lead_service_factory = lead_service_factory
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._workers: List[threading.Thread] = []
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from app.db.client import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def _lead_service(self, db: Session):
+        if self._lead_service_factory is None:
+            from app.services.lead_service import LeadService
+            self._lead_service_factory = LeadService
+        return self._lead_service_factory(db)
+
+    def record(self, db: Session, payload: str, source: str = "facebook") -> Optional[int]:
+        """
+        Stores a raw webhook body and commits it. Nothing is parsed here.
+
+        Returns:
+            The inbox event ID, or None if the same body was already recorded.
+        """
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        key = delivery_event_key(digest)
+        # The delivery key is committed together with the inbox row, so a
+        # failed write leaves Facebook's retry free to be recorded.
+        if self.ledger.is_processed(db, key, source=f"{source}_delivery"):
+            return None
+        event = WebhookEvent(source=source, payload=payload, status="pending", attempts=0,
+                             next_attempt_at=self._clock())
+        self.ledger.record(db, [key], source=f"{source}_delivery")
+        db.add(event)
+        try:
+            db.commit()
+        except IntegrityError:
+            # The same body was recorded concurrently.
+            db.rollback()
+            self.ledger.is_processed(db, key, source=f"{source}_delivery")
+            return None
+        except Exception:
+            db.rollback()
+            raise
+        self.ledger.remember([key])
+        # Let an idle worker pick it up without waiting for its next poll.
+        self._wake.set()
+        return event.id
+
+    def _claim(self, db: Session, limit: int) -> List[WebhookEvent]:
+        now = self._clock()
+        stale = now - timedelta(seconds=self.claim_timeout)
+        events = (
+            db.query(WebhookEvent)
+            .filter(or_(
+                (WebhookEvent.status == "pending") & (WebhookEvent.next_attempt_at <= now),
+                (WebhookEvent.status == "processing") & (WebhookEvent.claimed_at < stale),
+            ))
+            .order_by(WebhookEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        # SKIP LOCKED keeps workers apart on Postgres; the conditional update
+        # also makes the claim safe where row locks are not available.
+        claimed_ids = []
+        for event in events:
+            claimed = (
+                db.query(WebhookEvent)
+                .filter(WebhookEvent.id == event.id, WebhookEvent.attempts == event.attempts)
+                .update({"status": "processing", "claimed_at": now, "attempts": event.attempts + 1},
+                        synchronize_session=False)
+            )
+            if claimed:
+                claimed_ids.append(event.id)
+        db.commit()
+        if not claimed_ids:
+            return []
+        return db.query(WebhookEvent).filter(WebhookEvent.id.in_(claimed_ids)).order_by(WebhookEvent.id).all()
+
+    def handle(self, db: Session, event: WebhookEvent):
+        """
+        Runs the comment pipeline for all new comments in the event as one
+        batch, so comments with the same keywords share their lookups.
+        """
+        comments = list(iter_comment_events(json.loads(event.payload)))
+        if comments:
+            logger.info(f"Processing {len(comments)} comments from webhook event {event.id}")
+            self._lead_service(db).process_comments(comments)
+
+    def _process(self, db: Session, event: WebhookEvent):
+        try:
+            self.handle(db, event)
+        except Exception as e:
+            db.rollback()
+            # Undecodable payloads will never succeed.
+            if isinstance(e, json.JSONDecodeError) or event.attempts >= self.max_attempts:
+                logger.error(f"Webhook event {event.id} failed permanently: {e}")
+                event.status = "failed"
+            else:
+                delay = min(self.max_backoff, self.base_backoff * (2 ** (event.attempts - 1)))
+                logger.warning(f"Webhook event {event.id} failed ({e}); retrying in {delay:.0f}s")
+                event.status = "pending"
+                event.next_attempt_at = self._clock() + timedelta(seconds=delay)
+            event.last_error = str(e)
+        else:
+            event.status = "done"
+            event.processed_at = self._clock()
+            event.last_error = None
+        event.claimed_at = None
+        db.commit()
+
+    def process_due(self, limit: int = 10) -> int:
+        """
+        Claims up to `limit` due events and processes each one.
+
+        Returns:
+            The number of events claimed.
+        """
+        db = self.session_factory()
+        try:
+            events = self._claim(db, limit)
+            for event in events:
+                self._process(db, event)
+            return len(events)
+        finally:
+            db.close()
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.process_due(limit=1)
+            except Exception as e:
+                logger.error(f"Webhook inbox worker error: {e}")
+                claimed = 0
+            if not claimed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self, workers: Optional[int] = None):
+        """
+        Starts the worker pool (WEBHOOK_WORKERS threads by default; 0 leaves
+        the inbox to another process).
+        """
+        count = workers if workers is not None else int(os.environ.get("WEBHOOK_WORKERS", "4"))
+        if self._workers or count <= 0:
+            return
+        self._stop.clear()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"webhook-inbox-{i}", daemon=True) for i in range(count)
+        ]
+        for worker in self._workers:
+            worker.start()
+        logger.info(f"Started {count} webhook inbox workers.")
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        self._wake.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def stats(self, db: Session) -> Dict[str, int]:
+        """
+        Returns the number of events in each status.
+        """
+        counts = dict(db.query(WebhookEvent.status, func.count(WebhookEvent.id))
+                      .group_by(WebhookEvent.status).all())
+        return {status: counts.get(status, 0) for status in ("pending", "processing", "done", "failed")}
+
+
+_shared_inbox: Optional[WebhookInbox] = None
+_shared_lock = threading.Lock()
+
+
+def get_webhook_inbox() -> WebhookInbox:
+    """
+    Returns the process-wide webhook inbox.
+    """
+    global _shared_inbox
+    with _shared_lock:
+        if _shared_inbox is None:
+            _shared_inbox = WebhookInbox()
+    return _shared_inbox
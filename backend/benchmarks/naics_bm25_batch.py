@@ -0,0 +1,45 @@
+"""
+Measures NAICSService.find_codes_for_keywords_batch scoring a whole batch of
+comments with one matrix product versus one query at a time.
+
+Run from the backend directory:
+    python benchmarks/naics_bm25_batch.py
+"""
+import os
+import random
+import sys
+import time
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.naics_service import NAICSService
+from naics_keyword_matching import SAMPLE_COMMENTS
+
+
+def run(batch_size: int = 500, seed: int = 7):
+    service = NAICSService()
+    rng = random.Random(seed)
+    comments = [rng.choice(SAMPLE_COMMENTS) for _ in range(batch_size)]
+
+    # Build the ranker outside the timed sections.
+    service.find_codes_for_keywords_batch(comments[:1])
+
+    started = time.perf_counter()
+    one_at_a_time = [service.find_codes_for_keywords_batch([c], top_k=5)[0] for c in comments]
+    single_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = service.find_codes_for_keywords_batch(comments, top_k=5)
+    batch_elapsed = time.perf_counter() - started
+
+    mismatches = sum(1 for a, b in zip(one_at_a_time, batched) if [c for c, _ in a] != [c for c, _ in b])
+    print(f"Comments:       {batch_size}")
+    print(f"One at a time:  {single_elapsed * 1000:.1f} ms")
+    print(f"Single batch:   {batch_elapsed * 1000:.1f} ms")
+    print(f"Speedup:        {single_elapsed / batch_elapsed:.1f}x")
+    print(f"Mismatches:     {mismatches}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,88 @@
+"""
+Benchmarks NAICSService.find_code_for_keywords against the original full-table
+scan on a stream of comment-like queries.
+
+Run from the backend directory:
+    python benchmarks/naics_keyword_matching.py
+"""
+import csv
+import os
+import random
+import sys
+import time
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.naics_service import NAICSService
+from app.services.naics_snapshot import default_csv_path
+
+SAMPLE_COMMENTS = [
+    "I am looking for roofing contracts in Texas",
+    "We do commercial janitorial services and floor care",
+    "Small business, cybersecurity and software development",
+    "Looking for construction work on federal buildings!",
+    "Any opportunities for landscaping or snow removal?",
+    "We provide IT consulting and computer systems design",
+    "Trucking company, general freight, long-distance",
+    "Plumbing, heating and air-conditioning contractors here",
+    "Medical equipment and supplies wholesaler",
+    "Interested in engineering services for the army",
+    "Our bakery makes bread for commissaries",
+    "Great post!",
+]
+
+# Mirrors the keyword extraction in LeadService.process_comment.
+STOP_WORDS = {'i', 'am', 'looking', 'for', 'a', 'an', 'the', 'in', 'on', 'of', 'and', 'is', 'are'}
+
+
+def to_search_query(comment_text: str) -> str:
+    keywords = [word.strip('.,!?;:') for word in comment_text.lower().split() if word.lower() not in STOP_WORDS]
+    return " ".join(keywords)
+
+
+def linear_find_code_for_keywords(naics_data, keywords):
+    search_keywords = set(keywords.lower().split())
+    best_match_code = None
+    highest_score = 0
+    for row in naics_data:
+        code = row.get('Code')
+        if not code or len(code) != 6:
+            continue
+        description = row.get('Class title', '').lower()
+        if not description:
+            continue
+        score = len(search_keywords.intersection(description.split()))
+        if keywords.lower() in description:
+            score += 5
+        if score > highest_score:
+            highest_score = score
+            best_match_code = code
+    return best_match_code
+
+
+def run(stream_length: int = 5000, seed: int = 7):
+    service = NAICSService()
+    with open(default_csv_path(), mode='r', encoding='utf-8-sig') as infile:
+        naics_data = list(csv.DictReader(infile))
+    rng = random.Random(seed)
+    queries = [to_search_query(rng.choice(SAMPLE_COMMENTS)) for _ in range(stream_length)]
+
+    started = time.perf_counter()
+    linear_results = [linear_find_code_for_keywords(naics_data, q) for q in queries]
+    linear_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    indexed_results = [service.find_code_for_keywords(q) for q in queries]
+    indexed_elapsed = time.perf_counter() - started
+
+    mismatches = sum(1 for a, b in zip(linear_results, indexed_results) if a != b)
+    print(f"Queries:        {stream_length}")
+    print(f"Linear scan:    {linear_elapsed * 1000:.1f} ms ({linear_elapsed / stream_length * 1e6:.1f} us/query)")
+    print(f"Inverted index: {indexed_elapsed * 1000:.1f} ms ({indexed_elapsed / stream_length * 1e6:.1f} us/query)")
+    print(f"Speedup:        {linear_elapsed / indexed_elapsed:.1f}x")
+    print(f"Mismatches:     {mismatches}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,54 @@
+"""
+Compares the cost of loading NAICS data the old way (csv.DictReader into a
+list of row dicts on every NAICSService construction) with the compiled,
+memory-mapped snapshot and the process-wide shared index.
+
+Run from the backend directory:
+    python benchmarks/naics_snapshot_load.py
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.naics_service import NAICSService
+from app.services.naics_snapshot import build_snapshot_file, default_csv_path, NAICSSnapshot
+
+
+def parse_csv():
+    with open(default_csv_path(), mode='r', encoding='utf-8-sig') as infile:
+        return list(csv.DictReader(infile))
+
+
+def measure(label, fn, repeat):
+    tracemalloc.start()
+    started = time.perf_counter()
+    results = [fn() for _ in range(repeat)]
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} {elapsed / repeat * 1000:8.2f} ms/load  {current / repeat / 1024:9.1f} KiB retained/load  {peak / 1024:9.1f} KiB peak")
+    return results
+
+
+def run(repeat: int = 20):
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, "naics.snapshot")
+        started = time.perf_counter()
+        build_snapshot_file(default_csv_path(), snapshot_path)
+        print(f"Snapshot compile (one-off):         {(time.perf_counter() - started) * 1000:.2f} ms, {os.path.getsize(snapshot_path) / 1024:.1f} KiB on disk")
+
+        measure("CSV DictReader (old, per request)", parse_csv, repeat)
+        measure("mmap snapshot open (cold start)", lambda: NAICSSnapshot.open(snapshot_path), repeat)
+
+    NAICSService.preload()
+    measure("NAICSService() (warm, per request)", NAICSService, repeat * 50)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,158 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import json
+import os
+import sys
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.db.models import AnalysisBatch, Base, ConversationLog, Lead, Learning
+from app.services.batch_backends import LocalBatchBackend, OpenAIBatchBackend
+from app.services.conversation_service import ConversationService
+from app.services.learning_service import BatchConversationAnalyzer
+
+
+def completion(content):
+    return {"id": "chatcmpl-1", "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+
+
+class TestBatchConversationAnalyzer(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.db = self.Session()
+        self.addCleanup(self.db.close)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}):
+            self.service = ConversationService()
+        self.requests = []
+        self.backend = LocalBatchBackend(self.handle, directory=os.path.join(self.directory, "backend"))
+        self.analyzer = BatchConversationAnalyzer(self.service, backend=self.backend, session_factory=self.Session,
+                                                  directory=self.directory)
+
+    def handle(self, body):
+        self.requests.append(body)
+        last = json.loads(body["messages"][-1]["content"].split("**Conversation History:**")[1]
+                          .split("**Instructions:**")[0])[-1]["text"]
+        if last == "boom":
+            raise RuntimeError("server error")
+        if last == "garbled":
+            return completion("not json")
+        return completion(json.dumps({"tag": "APPOINTMENT_SET", "summary": last}))
+
+    def add_lead(self, *messages, status="Appointment Set"):
+        lead = Lead(business_name="Acme", status=status, analyzed_for_learning=False)
+        self.db.add(lead)
+        self.db.flush()
+        for message in messages:
+            self.db.add(ConversationLog(lead_id=lead.id, sender="user", message=message))
+        self.db.commit()
+        return lead.id
+
+    def test_submit_writes_one_jsonl_request_per_conversation(self):
+        first = self.add_lead("Hello", "Book me in")
+        second = self.add_lead("No thanks", status="Disqualified")
+        empty = self.add_lead()
+        self.add_lead("Still talking", status="Messaged")
+
+        submitted = self.analyzer.submit()
+
+        self.assertEqual(submitted["requests"], 2)
+        self.assertEqual(submitted["skipped"], 1)
+        batch = self.db.query(AnalysisBatch).one()
+        self.assertEqual(json.loads(batch.lead_ids), [first, second])
+        with open(batch.input_path) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line["custom_id"] for line in lines], [f"lead-{first}", f"lead-{second}"])
+        self.assertEqual(lines[0]["url"], "/v1/chat/completions")
+        self.assertEqual(lines[0]["body"]["response_format"], {"type": "json_object"})
+        self.db.expire_all()
+        self.assertTrue(self.db.get(Lead, empty).analyzed_for_learning)
+
+        # Leads in an open batch are not submitted twice.
+        self.assertIsNone(self.analyzer.submit())
+
+    def test_collect_ingests_results_idempotently(self):
+        ok = self.add_lead("Book me in")
+        garbled = self.add_lead("garbled")
+        failed = self.add_lead("boom")
+        self.analyzer.submit()
+
+        metrics = self.analyzer.collect()
+
+        self.assertEqual(metrics, {"checked": 1, "ingested": 1, "failed": 0, "pending": 0, "learnings": 2})
+        learnings = {learning.lead_id: learning for learning in self.db.query(Learning)}
+        self.assertEqual(learnings[ok].summary, "Book me in")
+        self.assertEqual(learnings[garbled].outcome_tag, "ANALYSIS_FAILED")
+        self.assertNotIn(failed, learnings)
+        self.db.expire_all()
+        self.assertFalse(self.db.get(Lead, failed).analyzed_for_learning)
+
+        # Re-ingesting the same output adds nothing.
+        batch = self.db.query(AnalysisBatch).one()
+        self.assertEqual(self.analyzer.ingest(self.db, batch, self.backend.output_lines(batch.batch_id)), 0)
+        self.assertEqual(self.db.query(Learning).count(), 2)
+        self.assertEqual(self.analyzer.collect()["checked"], 0)
+
+        # The request that errored goes into the next batch.
+        self.assertEqual(self.analyzer.submit()["requests"], 1)
+
+    def test_unfinished_and_failed_batches(self):
+        self.add_lead("Book me in")
+        backend = MagicMock()
+        backend.submit.return_value = "batch_1"
+        backend.status.return_value = "in_progress"
+        analyzer = BatchConversationAnalyzer(self.service, backend=backend, session_factory=self.Session,
+                                             directory=self.directory)
+        analyzer.submit()
+
+        self.assertEqual(analyzer.collect()["pending"], 1)
+
+        backend.status.return_value = "failed"
+        backend.output_lines.return_value = []
+        self.assertEqual(analyzer.collect()["failed"], 1)
+        self.assertEqual(self.db.query(AnalysisBatch).one().status, "failed")
+        # Its leads are free to be submitted again.
+        backend.submit.return_value = "batch_2"
+        self.assertEqual(analyzer.submit()["batch_id"], "batch_2")
+
+
+class TestOpenAIBatchBackend(unittest.TestCase):
+
+    def test_submit_uploads_file_and_creates_batch(self):
+        client = MagicMock()
+        client.files.create.return_value.id = "file-in"
+        client.batches.create.return_value.id = "batch_abc"
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write("{}\n")
+        self.addCleanup(os.unlink, f.name)
+
+        backend = OpenAIBatchBackend(client)
+        batch_id = backend.submit(f.name, "/v1/chat/completions")
+
+        self.assertEqual(batch_id, "batch_abc")
+        self.assertEqual(client.files.create.call_args.kwargs["purpose"], "batch")
+        client.batches.create.assert_called_once_with(
+            input_file_id="file-in", endpoint="/v1/chat/completions", completion_window="24h")
+
+        client.batches.retrieve.return_value.output_file_id = "file-out"
+        client.files.content.return_value.text = '{"a": 1}\n{"b": 2}\n'
+        self.assertEqual(backend.output_lines("batch_abc"), ['{"a": 1}', '{"b": 2}'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import asyncio
+import threading
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.core.container import ServiceContainer, _build_container
+from app.core.http_client import HTTPClient, get_http_client
+from app.services.conversation_service import ConversationService
+from app.services.lead_service import LeadService
+
+
+class Counter:
+    built = 0
+
+    def __init__(self):
+        Counter.built += 1
+        self.closed = False
+
+
+class Dependent:
+    def __init__(self, counter):
+        self.counter = counter
+
+
+class TestServiceContainer(unittest.TestCase):
+
+    def setUp(self):
+        Counter.built = 0
+        self.container = ServiceContainer()
+
+    def test_services_are_built_lazily_and_shared(self):
+        self.assertEqual(Counter.built, 0)
+
+        first = self.container.get(Counter)
+        second = self.container.get(Counter)
+
+        self.assertIs(first, second)
+        self.assertEqual(Counter.built, 1)
+
+    def test_concurrent_first_use_builds_one_instance(self):
+        instances = []
+        threads = [threading.Thread(target=lambda: instances.append(self.container.get(Counter))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Counter.built, 1)
+        self.assertEqual(len({id(instance) for instance in instances}), 1)
+
+    def test_shutdown_closes_in_reverse_order_and_resets(self):
+        closed = []
+        self.container.register(Counter, close=lambda c: closed.append("counter"))
+        self.container.register(Dependent, lambda: Dependent(self.container.get(Counter)),
+                                close=lambda d: closed.append("dependent"))
+
+        dependent = self.container.get(Dependent)
+        self.container.shutdown()
+
+        self.assertEqual(closed, ["dependent", "counter"])
+        self.assertIsNot(self.container.get(Dependent), dependent)
+
+    def test_close_errors_do_not_stop_shutdown(self):
+        closed = []
+        self.container.register(Counter, close=lambda c: closed.append("counter"))
+        self.container.register(Dependent, lambda: Dependent(self.container.get(Counter)),
+                                close=MagicMock(side_effect=RuntimeError("boom")))
+        self.container.get(Dependent)
+
+        self.container.shutdown()
+
+        self.assertEqual(closed, ["counter"])
+
+    def test_shutdown_does_not_leave_a_closed_shared_http_client(self):
+        container = _build_container()
+        client = container.get(HTTPClient)
+        self.assertIs(client, get_http_client())
+
+        container.shutdown()
+
+        self.assertTrue(client._client.is_closed)
+        fresh = get_http_client()
+        self.assertIsNot(fresh, client)
+        self.assertFalse(fresh._client.is_closed)
+        self.assertIs(container.get(HTTPClient), fresh)
+
+    def test_async_close_hooks_are_awaited(self):
+        closed = []
+        async def close(counter):
+            closed.append("counter")
+        self.container.register(Counter, close=close)
+
+        self.container.get(Counter)
+        self.container.shutdown()
+        self.container.get(Counter)
+        asyncio.run(self.container.ashutdown())
+
+        self.assertEqual(closed, ["counter", "counter"])
+
+    def test_shutdown_closes_the_conversation_clients(self):
+        container = _build_container()
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}):
+            service = container.get(ConversationService)
+        # Built lazily the first time a reply is streamed.
+        async_client = service.async_client
+
+        asyncio.run(container.ashutdown())
+
+        self.assertTrue(service.client.is_closed())
+        self.assertTrue(async_client.is_closed())
+        self.assertIsNone(service._async_client)
+
+    def test_lead_service_reuses_the_container_services(self):
+        with patch('app.services.lead_service.FacebookService') as facebook, \
+                patch('app.services.lead_service.NAICSService'), \
+                patch('app.services.lead_service.PSCService'), \
+                patch('app.services.lead_service.SAMService'):
+            first = LeadService(MagicMock(), services=self.container)
+            second = LeadService(MagicMock(), services=self.container)
+
+        facebook.assert_called_once_with()
+        self.assertIs(first.facebook_service, second.facebook_service)
+        self.assertIs(first.sam_service, second.sam_service)
+
+
+if __name__ == '__main__':
+    unittest.main()
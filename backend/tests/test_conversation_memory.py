@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import MagicMock
+from datetime import datetime, timedelta
+import os
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.db.models import Base, ConversationLog, ConversationState, Lead
+from app.services.conversation_memory import ConversationMemory
+from app.services.conversation_service import RESPONSE_PROMPT, ConversationService
+
+
+class TestConversationMemory(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        self.addCleanup(self.db.close)
+        self.db.add(Lead(id=1, business_name="Acme", status="Messaged"))
+        self.db.commit()
+        self.start = datetime(2026, 1, 1)
+        self.count = 0
+
+        self.service = MagicMock()
+        self.service.summarize_conversation.side_effect = \
+            lambda previous, turns: f"{previous or ''}[{','.join(t['text'] for t in turns)}]"
+        self.memory = ConversationMemory(self.service, recent_turns=2)
+
+    def log(self, *messages):
+        for message in messages:
+            sender = "user" if self.count % 2 == 0 else "bot"
+            self.db.add(ConversationLog(lead_id=1, sender=sender, message=message,
+                                        timestamp=self.start + timedelta(minutes=self.count)))
+            self.count += 1
+        self.db.commit()
+
+    def test_short_conversation_is_sent_verbatim(self):
+        self.log("m1", "m2")
+
+        self.assertFalse(self.memory.update(self.db, 1))
+        summary, turns = self.memory.load(self.db, 1)
+
+        self.assertIsNone(summary)
+        self.assertEqual(turns, [{"sender": "user", "text": "m1"}, {"sender": "bot", "text": "m2"}])
+        self.service.summarize_conversation.assert_not_called()
+
+    def test_older_turns_are_folded_into_the_summary(self):
+        self.log("m1", "m2", "m3", "m4", "m5")
+        self.assertTrue(self.memory.update(self.db, 1))
+
+        summary, turns = self.memory.load(self.db, 1)
+        self.assertEqual(summary, "[m1,m2,m3]")
+        self.assertEqual([t["text"] for t in turns], ["m4", "m5"])
+
+        # The next fold only summarizes what came after the last one.
+        self.log("m6", "m7")
+        self.memory.update(self.db, 1)
+        summary, turns = self.memory.load(self.db, 1)
+        self.assertEqual(summary, "[m1,m2,m3][m4,m5]")
+        self.assertEqual([t["text"] for t in turns], ["m6", "m7"])
+        self.assertEqual(self.service.summarize_conversation.call_args.args[1],
+                         [{"sender": "bot", "text": "m4"}, {"sender": "user", "text": "m5"}])
+
+    def test_failed_summary_keeps_the_turns(self):
+        self.log("m1", "m2", "m3")
+        self.service.summarize_conversation.side_effect = None
+        self.service.summarize_conversation.return_value = None
+
+        self.assertFalse(self.memory.update(self.db, 1))
+
+        summary, turns = self.memory.load(self.db, 1)
+        self.assertIsNone(summary)
+        self.assertEqual(len(turns), 3)
+        self.assertEqual(self.db.query(ConversationState).one().summarized_through_id, 0)
+
+    def test_concurrent_fold_is_not_overwritten(self):
+        self.log("m1", "m2", "m3", "m4", "m5")
+        summarize = self.service.summarize_conversation.side_effect
+        def racing_summarize(previous, turns):
+            if self.service.summarize_conversation.call_count == 1:
+                # Another request folds m1..m3 while this one is summarizing.
+                self.db.query(ConversationState).update({"summary": "[other]", "summarized_through_id": 3})
+                self.db.commit()
+            return summarize(previous, turns)
+        self.service.summarize_conversation.side_effect = racing_summarize
+        self.log("m6")
+
+        self.assertTrue(self.memory.update(self.db, 1))
+
+        summary, turns = self.memory.load(self.db, 1)
+        self.assertEqual(summary, "[other][m4]")
+        self.assertEqual([t["text"] for t in turns], ["m5", "m6"])
+
+    def test_messages_are_ordered_by_id(self):
+        self.log("m1", "m2", "m3")
+        # A late write with an earlier timestamp still comes after the others.
+        self.db.add(ConversationLog(lead_id=1, sender="user", message="m4", timestamp=self.start))
+        self.db.commit()
+
+        self.memory.update(self.db, 1)
+
+        summary, turns = self.memory.load(self.db, 1)
+        self.assertEqual(summary, "[m1,m2]")
+        self.assertEqual([t["text"] for t in turns], ["m3", "m4"])
+
+
+class TestResponsePrompt(unittest.TestCase):
+
+    def test_instructions_come_before_the_summary(self):
+        messages = ConversationService._response_messages([{"sender": "user", "text": "Hi"}], summary="Asked about 8(a).")
+
+        self.assertEqual(messages[0], {"role": "system", "content": RESPONSE_PROMPT})
+        self.assertEqual(messages[1]["content"], "Summary of the earlier conversation: Asked about 8(a).")
+        self.assertEqual(messages[2], {"role": "user", "content": "Hi"})
+        self.assertEqual(len(ConversationService._response_messages([])), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
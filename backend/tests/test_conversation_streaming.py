@@ -0,0 +1,162 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.api.deps import get_conversation_service
+from app.db.client import get_db
+from app.db.models import Base, ConversationLog, Lead
+from app.main import app
+from app.services.conversation_service import RESPONSE_FALLBACK, ConversationService, LatencyTracker
+
+
+def chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeStream:
+    def __init__(self, deltas, error=None):
+        self.deltas = deltas
+        self.error = error
+
+    async def __aiter__(self):
+        for delta in self.deltas:
+            await asyncio.sleep(0)
+            yield chunk(delta)
+        if self.error is not None:
+            raise self.error
+
+
+def make_service(stream=None, error=None):
+    with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}):
+        service = ConversationService()
+    async def create(**kwargs):
+        if error is not None:
+            raise error
+        return stream
+    service._async_client = MagicMock()
+    service._async_client.chat.completions.create.side_effect = create
+    return service
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestResponseStream(unittest.TestCase):
+
+    def test_yields_deltas_and_records_timings(self):
+        service = make_service(FakeStream(["Hi", None, " there", "!"]))
+        timings = {}
+
+        deltas = asyncio.run(collect(service.generate_response_stream([{"sender": "user", "text": "Hello"}], timings)))
+
+        self.assertEqual(deltas, ["Hi", " there", "!"])
+        self.assertLessEqual(timings["ttft"], timings["total"])
+        kwargs = service._async_client.chat.completions.create.call_args.kwargs
+        self.assertTrue(kwargs["stream"])
+        self.assertEqual(kwargs["messages"][-1], {"role": "user", "content": "Hello"})
+
+    def test_failure_before_first_token_yields_fallback(self):
+        service = make_service(error=RuntimeError("OpenAI down"))
+        timings = {}
+
+        deltas = asyncio.run(collect(service.generate_response_stream([], timings)))
+
+        self.assertEqual(deltas, [RESPONSE_FALLBACK])
+        self.assertNotIn("ttft", timings)
+        self.assertIn("total", timings)
+
+    def test_failure_mid_stream_is_raised_after_partial_reply(self):
+        service = make_service(FakeStream(["Partial"], error=RuntimeError("reset")))
+        deltas = []
+
+        async def consume():
+            async for delta in service.generate_response_stream([]):
+                deltas.append(delta)
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(consume())
+        self.assertEqual(deltas, ["Partial"])
+
+    def test_latency_percentiles(self):
+        tracker = LatencyTracker()
+        for i in range(1, 101):
+            tracker.record(i / 100, i / 10)
+        tracker.record(None, 20.0)
+
+        stats = tracker.stats()
+        self.assertEqual(stats["time_to_first_token"], {"count": 100, "p50": 0.51, "p95": 0.96})
+        self.assertEqual(stats["total"]["count"], 101)
+
+
+class TestStreamingConversationEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        self.db = Session()
+        self.addCleanup(self.db.close)
+        self.db.add(Lead(id=1, business_name="Acme", status="Messaged"))
+        self.db.commit()
+
+        self.service = make_service(FakeStream(["Happy ", "to help."]))
+        app.dependency_overrides[get_db] = lambda: Session()
+        app.dependency_overrides[get_conversation_service] = lambda: self.service
+        self.addCleanup(app.dependency_overrides.clear)
+        patcher = patch("app.api.v1.endpoints.leads.SessionLocal", Session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(app)
+
+    def test_streams_sse_and_logs_reply(self):
+        response = self.client.post("/api/v1/leads/conversation-webhook/1/stream", json={"message": "Can you help?"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = [block for block in response.text.split("\n\n") if block]
+        self.assertEqual(json.loads(events[0].removeprefix("data: ")), {"delta": "Happy "})
+        self.assertTrue(events[-1].startswith("event: done\n"))
+        done = json.loads(events[-1].split("data: ", 1)[1])
+        self.assertEqual(done["message"], "Happy to help.")
+        self.assertIsNotNone(done["ttft"])
+
+        self.db.expire_all()
+        logs = self.db.query(ConversationLog).order_by(ConversationLog.id).all()
+        self.assertEqual([(log.sender, log.message) for log in logs],
+                         [("user", "Can you help?"), ("bot", "Happy to help.")])
+
+    def test_cut_off_stream_ends_with_error_event(self):
+        self.service = make_service(FakeStream(["Happy "], error=RuntimeError("reset")))
+
+        response = self.client.post("/api/v1/leads/conversation-webhook/1/stream", json={"message": "Can you help?"})
+
+        events = [block for block in response.text.split("\n\n") if block]
+        self.assertEqual(json.loads(events[0].removeprefix("data: ")), {"delta": "Happy "})
+        self.assertTrue(events[-1].startswith("event: error\n"))
+        self.assertEqual(json.loads(events[-1].split("data: ", 1)[1])["message"], "Happy")
+        self.assertFalse(any(event.startswith("event: done") for event in events))
+        self.db.expire_all()
+        self.assertEqual(self.db.query(ConversationLog).filter(ConversationLog.sender == "bot").one().message, "Happy")
+
+    def test_unknown_lead_returns_404(self):
+        response = self.client.post("/api/v1/leads/conversation-webhook/99/stream", json={"message": "Hi"})
+
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
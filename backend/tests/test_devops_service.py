@@ -12,19 +12,20 @@ from app.services.devops_service import DevOpsService
 class TestDevOpsService(unittest.TestCase):
 
     @patch.dict(os.environ, {"ADO_ORG_URL": "https://dev.azure.com/testorg", "ADO_PAT": "testpat"})
-    @patch('requests.post')
-    def test_create_work_item_sends_correct_initial_state(self, mock_post):
+    def test_create_work_item_sends_correct_initial_state(self):
         """
         Verify that create_work_item sends the correct initial state ("Identified").
         """
         # Configure the mock to return a successful response
         mock_response = Mock()
-        mock_response.ok = True
+        mock_response.is_success = True
         mock_response.json.return_value = {"id": 123, "rev": 1}
-        mock_post.return_value = mock_response
+        http_client = Mock()
+        http_client.post.return_value = mock_response
+        mock_post = http_client.post
 
-        # Instantiate the service and call the method
-        service = DevOpsService()
+        # Instantiate the service with the mocked HTTP client and call the method
+        service = DevOpsService(http_client=http_client)
         service.create_work_item(
             title="New Lead: Test",
             opportunity_url="http://test.com",
@@ -32,7 +33,7 @@ class TestDevOpsService(unittest.TestCase):
             source="Test Source"
         )
 
-        # Verify that requests.post was called
+        # Verify that the client's post was called
         self.assertTrue(mock_post.called)
 
         # Check the payload sent to the API
@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import Mock, patch
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.core.cache import TTLCache
+from app.db.models import Base, ProcessedEvent
+from app.services.event_ledger import EventLedger, comment_event_key
+from app.services.lead_service import LeadService
+
+
+class TestEventLedger(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.db = self.Session()
+        self.addCleanup(self.db.close)
+        self.now = [datetime(2025, 7, 1, 12, 0, 0)]
+        self.ledger = EventLedger(retention=timedelta(days=7), clock=lambda: self.now[0])
+
+    def test_second_claim_is_a_duplicate(self):
+        self.assertTrue(self.ledger.claim(self.db, "facebook:comment:c-1", source="facebook_comment"))
+        self.assertFalse(self.ledger.claim(self.db, "facebook:comment:c-1", source="facebook_comment"))
+
+        self.assertEqual(self.db.query(ProcessedEvent).count(), 1)
+        status = self.ledger.status()
+        self.assertEqual(status["stats"]["claimed"], 1)
+        self.assertEqual(status["stats"]["duplicates_dropped"], 1)
+        self.assertEqual(status["duplicates_by_source"], {"facebook_comment": 1})
+
+    def test_duplicate_is_detected_from_the_table(self):
+        # Another process (with its own memory cache) claimed the key.
+        other = EventLedger(clock=lambda: self.now[0], cache=TTLCache())
+        other.claim(self.db, "facebook:comment:c-1")
+
+        self.assertFalse(self.ledger.claim(self.db, "facebook:comment:c-1"))
+
+    def test_released_key_can_be_claimed_again(self):
+        self.ledger.claim(self.db, "facebook:comment:c-1")
+        self.ledger.release(self.db, "facebook:comment:c-1")
+
+        self.assertTrue(self.ledger.claim(self.db, "facebook:comment:c-1"))
+
+    def test_expired_rows_are_reclaimable_and_purged(self):
+        self.ledger.claim(self.db, "facebook:comment:old")
+        self.now[0] += timedelta(days=8)
+        fresh = EventLedger(retention=timedelta(days=7), clock=lambda: self.now[0])
+
+        self.assertTrue(fresh.claim(self.db, "facebook:comment:old"))
+        fresh.claim(self.db, "facebook:comment:new")
+        self.now[0] += timedelta(days=8)
+        fresh.claim(self.db, "facebook:comment:newest")
+
+        self.assertEqual(fresh.purge_expired(self.db), 2)
+        self.assertEqual([e.event_key for e in self.db.query(ProcessedEvent).all()], ["facebook:comment:newest"])
+
+
+class TestProcessCommentDeduplication(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        self.addCleanup(self.db.close)
+        with patch('app.services.lead_service.FacebookService'), \
+                patch('app.services.lead_service.NAICSService'), \
+                patch('app.services.lead_service.PSCService'), \
+                patch('app.services.lead_service.SAMService'):
+            self.service = LeadService(self.db)
+        self.service.event_ledger = EventLedger()
+        self.service._process_new_comments = Mock(return_value=[])
+
+    def test_redelivered_comment_skips_all_lookups(self):
+        self.service.process_comment("janitorial services", "u-1", "c-1")
+        self.service.process_comment("janitorial services", "u-1", "c-1")
+
+        self.service._process_new_comments.assert_called_once_with(
+            [{"comment_text": "janitorial services", "user_id": "u-1", "comment_id": "c-1"}])
+
+    def test_failed_comment_is_not_recorded(self):
+        self.service._process_new_comments.side_effect = [RuntimeError("SAM.gov down"), []]
+
+        with self.assertRaises(RuntimeError):
+            self.service.process_comment("janitorial services", "u-1", "c-1")
+        self.assertIsNone(self.db.query(ProcessedEvent)
+                          .filter(ProcessedEvent.event_key == comment_event_key("c-1")).first())
+
+        self.service.process_comment("janitorial services", "u-1", "c-1")
+        self.assertEqual(self.service._process_new_comments.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
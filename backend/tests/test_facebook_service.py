@@ -0,0 +1,149 @@
+import unittest
+from unittest.mock import Mock, patch
+import json
+import os
+import sys
+from urllib.parse import parse_qs, urlparse
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.core.cache import TTLCache
+from app.services.facebook_service import FacebookService
+
+FACEBOOK_ENV = {
+    "FACEBOOK_PAGE_ID": "1",
+    "FACEBOOK_PAGE_ACCESS_TOKEN": "token",
+    "FACEBOOK_APP_ID": "app",
+    "FACEBOOK_APP_SECRET": "secret",
+}
+
+
+def graph_batch_handler(url, data=None, **kwargs):
+    """
+    Answers a Graph batch call: page searches for names starting with "No"
+    return no data, everything else echoes its query back.
+    """
+    items = []
+    for sub_request in json.loads(data["batch"]):
+        parsed = urlparse(sub_request["relative_url"])
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        if parsed.path == "pages/search":
+            found = [] if query["q"].startswith("No") else [{"id": f"id-{query['q']}", "name": query["q"]}]
+            items.append({"code": 200, "body": json.dumps({"data": found})})
+        elif parsed.path == "broken":
+            items.append({"code": 400, "body": json.dumps({"error": {"message": "bad"}})})
+        else:
+            items.append({"code": 200, "body": json.dumps({"id": parsed.path, "fields": query["fields"]})})
+    response = Mock(is_success=True)
+    response.json.return_value = items
+    return response
+
+
+class TestFacebookGraphBatch(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.dict(os.environ, FACEBOOK_ENV)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.http = Mock()
+        self.http.post.side_effect = graph_batch_handler
+        self.service = FacebookService(http_client=self.http, page_search_cache=TTLCache(),
+                                       page_info_cache=TTLCache(), user_profile_cache=TTLCache())
+
+    def test_page_search_is_packed_fifty_per_call_and_fanned_back_out(self):
+        names = [f"Agency {i}" for i in range(120)] + ["Agency 3", "No Such Page"]
+
+        pages = self.service.find_pages_by_names(names)
+
+        # 121 distinct names -> 3 round-trips.
+        self.assertEqual(self.http.post.call_count, 3)
+        batch_sizes = [len(json.loads(call.kwargs["data"]["batch"])) for call in self.http.post.call_args_list]
+        self.assertEqual(batch_sizes, [50, 50, 21])
+        self.assertEqual(self.http.post.call_args.kwargs["data"]["access_token"], "token")
+        self.assertEqual(pages["Agency 3"], {"id": "id-Agency 3", "name": "Agency 3"})
+        self.assertIsNone(pages["No Such Page"])
+        self.assertEqual(len(pages), 121)
+
+    def test_profiles_and_page_infos_keep_per_item_failures(self):
+        profiles = self.service.get_user_profiles(["42", "broken", "42"])
+        self.assertEqual(profiles, {"42": {"id": "42", "fields": "id,name"}, "broken": None})
+
+        infos = self.service.get_page_infos(["7"])
+        self.assertEqual(infos["7"]["fields"], "id,name,category")
+
+    def test_failed_batch_call_yields_none_for_each_sub_request(self):
+        self.http.post.side_effect = None
+        self.http.post.return_value = Mock(is_success=False, status_code=500, text="oops")
+
+        self.assertEqual(self.service.graph_batch([{"method": "GET", "relative_url": "me"}] * 3), [None] * 3)
+
+    def test_batched_search_uses_and_fills_the_cache(self):
+        self.service.find_pages_by_names(["Acme Corp", "No Match"])
+        self.http.post.reset_mock()
+
+        pages = self.service.find_pages_by_names(["ACME  corp", "no match", "Globex"])
+
+        sent = json.loads(self.http.post.call_args.kwargs["data"]["batch"])
+        self.assertEqual([r["relative_url"] for r in sent], ["pages/search?q=Globex&fields=id%2Cname&limit=1"])
+        self.assertEqual(pages["ACME  corp"]["id"], "id-Acme Corp")
+        self.assertIsNone(pages["no match"])
+
+
+def graph_response(status_code=200, body=None):
+    response = Mock(is_success=200 <= status_code < 300, status_code=status_code, text="")
+    response.json.return_value = body
+    return response
+
+
+class TestFacebookLookupCache(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.dict(os.environ, FACEBOOK_ENV)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = [0.0]
+        clock = lambda: self.now[0]
+        self.http = Mock()
+        self.service = FacebookService(
+            http_client=self.http,
+            page_search_cache=TTLCache(ttl=1000, clock=clock),
+            page_info_cache=TTLCache(ttl=1000, clock=clock),
+            user_profile_cache=TTLCache(ttl=1000, clock=clock),
+            negative_ttl=100,
+        )
+
+    def test_page_search_hits_are_cached_by_normalized_query(self):
+        self.http.get.return_value = graph_response(body={"data": [{"id": "9", "name": "Acme"}]})
+
+        self.assertEqual(self.service.find_page_by_name("Acme Corp")["id"], "9")
+        self.assertEqual(self.service.find_page_by_name("  acme   CORP ")["id"], "9")
+        self.assertEqual(self.http.get.call_count, 1)
+        self.assertEqual(self.service.page_search_cache.stats()["hits"], 1)
+
+    def test_empty_searches_are_negatively_cached_for_the_shorter_ttl(self):
+        self.http.get.return_value = graph_response(body={"data": []})
+
+        self.assertIsNone(self.service.find_page_by_name("Nobody"))
+        self.now[0] = 99
+        self.assertIsNone(self.service.find_page_by_name("Nobody"))
+        self.assertEqual(self.http.get.call_count, 1)
+        self.now[0] = 101
+        self.service.find_page_by_name("Nobody")
+        self.assertEqual(self.http.get.call_count, 2)
+
+    def test_only_non_transient_errors_are_cached(self):
+        self.http.get.return_value = graph_response(status_code=429)
+        self.assertIsNone(self.service.get_user_profile("1"))
+        self.assertIsNone(self.service.get_user_profile("1"))
+        self.assertEqual(self.http.get.call_count, 2)
+
+        self.http.get.return_value = graph_response(status_code=404)
+        self.assertIsNone(self.service.get_page_info("2"))
+        self.assertIsNone(self.service.get_page_info("2"))
+        self.assertEqual(self.http.get.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
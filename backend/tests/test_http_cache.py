@@ -0,0 +1,110 @@
+import unittest
+import asyncio
+import glob
+import os
+import sys
+import tempfile
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.core.http_cache import HTTPResponseCache, ReplayMissError
+
+URL = "https://api.sam.gov/prod/opportunities/v2/search"
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self._body = body
+        self.headers = headers or {}
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeServer:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        self.calls.append({"url": url, "params": params, "headers": headers})
+        return self.responses.pop(0)
+
+
+class TestHTTPResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.now = [1000.0]
+
+    def make_cache(self, mode, ttl=60):
+        return HTTPResponseCache(directory=self.tmp.name, ttl=ttl, mode=mode, clock=lambda: self.now[0])
+
+    def test_key_ignores_secrets_and_param_order(self):
+        cache = self.make_cache("cache")
+        self.assertEqual(
+            cache.key(URL, {"limit": 10, "api_key": "secret-1", "ncode": "541511"}),
+            cache.key(URL, {"ncode": "541511", "limit": "10", "api_key": "secret-2"}),
+        )
+
+    def test_record_then_replay_offline(self):
+        server = FakeServer(FakeResponse(body={"totalRecords": 1}))
+        self.make_cache("record").get_json(server.get, URL, params={"limit": 1, "api_key": "k"})
+
+        replay = self.make_cache("replay")
+        self.assertEqual(replay.get_json(server.get, URL, params={"limit": 1, "api_key": "other"}), {"totalRecords": 1})
+        self.assertEqual(len(server.calls), 1)
+        with self.assertRaises(ReplayMissError):
+            replay.get_json(server.get, URL, params={"limit": 2})
+
+        (stored_path,) = glob.glob(os.path.join(self.tmp.name, "*", "*.json"))
+        with open(stored_path) as stored:
+            self.assertNotIn('"k"', stored.read())
+
+    def test_fresh_hits_then_conditional_revalidation(self):
+        server = FakeServer(
+            FakeResponse(body={"v": 1}, headers={"ETag": '"abc"', "Cache-Control": "max-age=30"}),
+            FakeResponse(status_code=304),
+        )
+        cache = self.make_cache("cache", ttl=60)
+
+        self.assertEqual(cache.get_json(server.get, URL, params={"q": "x"}), {"v": 1})
+        self.now[0] += 10
+        self.assertEqual(cache.get_json(server.get, URL, params={"q": "x"}), {"v": 1})
+        self.assertEqual(len(server.calls), 1)
+
+        # max-age (30s) is shorter than the TTL, so the entry is stale now.
+        self.now[0] += 25
+        self.assertEqual(cache.get_json(server.get, URL, params={"q": "x"}), {"v": 1})
+        self.assertEqual(server.calls[1]["headers"]["If-None-Match"], '"abc"')
+        self.assertEqual(cache.stats["revalidated"], 1)
+
+    def test_no_store_responses_are_not_written(self):
+        server = FakeServer(FakeResponse(body={"v": 1}, headers={"Cache-Control": "no-store"}),
+                            FakeResponse(body={"v": 2}))
+        cache = self.make_cache("cache")
+        cache.get_json(server.get, URL)
+        self.assertEqual(cache.get_json(server.get, URL), {"v": 2})
+        self.assertEqual(len(server.calls), 2)
+
+    def test_async_replay(self):
+        server = FakeServer(FakeResponse(body={"totalRecords": 3}))
+        self.make_cache("record").get_json(server.get, URL, params={"title": "IT"})
+
+        async def fetch(*args, **kwargs):
+            raise AssertionError("replay must not hit the network")
+
+        body = asyncio.run(self.make_cache("replay").get_json_async(fetch, URL, params={"title": "IT"}))
+        self.assertEqual(body, {"totalRecords": 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
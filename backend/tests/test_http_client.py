@@ -0,0 +1,86 @@
+import unittest
+import asyncio
+import os
+import sys
+
+import httpx
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.core.http_client import HTTPClient, parse_retry_after
+
+
+class TestHTTPClient(unittest.TestCase):
+
+    def make_client(self, handler, **kwargs):
+        self.sleeps = []
+        return HTTPClient(transport=httpx.MockTransport(handler), sleep=self.sleeps.append, **kwargs)
+
+    def test_get_retries_unavailable_and_honors_retry_after(self):
+        statuses = iter([503, 429, 200])
+
+        def handler(request):
+            status = next(statuses)
+            headers = {"Retry-After": "7"} if status == 429 else {}
+            return httpx.Response(status, headers=headers, json={"ok": status == 200})
+
+        client = self.make_client(handler, backoff_factor=0.5)
+        response = client.get("https://api.sam.gov/search", params={"q": "x"})
+
+        self.assertEqual(response.json(), {"ok": True})
+        self.assertEqual(self.sleeps, [0.5, 7.0])
+        self.assertEqual(client.stats, {"requests": 3, "retries": 2})
+
+    def test_post_is_only_retried_when_the_server_did_not_process_it(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request.method)
+            if request.url.path == "/throttled" and len(calls) == 1:
+                return httpx.Response(429)
+            return httpx.Response(503 if request.url.path == "/down" else 200)
+
+        client = self.make_client(handler)
+        self.assertEqual(client.post("https://graph.facebook.com/down").status_code, 503)
+        self.assertEqual(len(calls), 1)
+
+        calls.clear()
+        self.assertEqual(client.post("https://graph.facebook.com/throttled").status_code, 200)
+        self.assertEqual(len(calls), 2)
+
+    def test_connection_errors_are_retried_then_raised(self):
+        def handler(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        client = self.make_client(handler, retries=2, backoff_factor=1, max_backoff=1.5)
+        with self.assertRaises(httpx.ConnectError):
+            client.post("https://dev.azure.com/org")
+        self.assertEqual(self.sleeps, [1, 1.5])
+
+    def test_async_facade_shares_the_retry_policy(self):
+        statuses = iter([502, 200])
+
+        async def handler(request):
+            return httpx.Response(next(statuses))
+
+        client = HTTPClient(async_transport=httpx.MockTransport(handler), backoff_factor=0)
+
+        async def run():
+            try:
+                return await client.aget("https://api.sam.gov/search")
+            finally:
+                await client.aclose()
+
+        self.assertEqual(asyncio.run(run()).status_code, 200)
+        self.assertEqual(client.stats["retries"], 1)
+
+    def test_parse_retry_after_accepts_seconds_and_dates(self):
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:30 GMT", now=1445412500.0), 10.0)
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.db.models import Base, Lead, Opportunity
+from app.services.ingest_service import IngestService
+
+
+def parsed(n):
+    return {
+        "sam_gov_id": f"SOL-{n}",
+        "title": f"Opportunity {n}",
+        "url": f"https://sam.gov/opp/{n}",
+        "agency": "GSA",
+        "posted_date": datetime(2025, 7, 1, tzinfo=timezone.utc),
+    }
+
+
+class TestBulkUpsert(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.addCleanup(self.db.close)
+        self.db.add(Opportunity(sam_gov_id="SOL-0", title="Already stored"))
+        self.db.commit()
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: self.statements.append(statement))
+
+    def test_inserts_new_rows_and_skips_existing_and_repeats(self):
+        batch = [parsed(n) for n in range(5)] + [parsed(2), {"title": "no id"}]
+
+        counts = IngestService(self.db).bulk_upsert_opportunities(batch)
+
+        self.assertEqual(counts, {"inserted": 4, "skipped": 3, "leads_created": 0})
+        self.assertEqual(self.db.query(Opportunity).count(), 5)
+        self.assertEqual(self.db.query(Opportunity).filter_by(sam_gov_id="SOL-0").one().title, "Already stored")
+
+    def test_creates_leads_for_new_rows_in_a_handful_of_statements(self):
+        batch = [parsed(n) for n in range(1200)]
+
+        counts = IngestService(self.db, chunk_size=500).bulk_upsert_opportunities(
+            batch, lead_status="Identified", lead_business_name="Placeholder Business"
+        )
+
+        self.assertEqual(counts["inserted"], 1199)
+        self.assertEqual(counts["leads_created"], 1199)
+        leads = self.db.query(Lead).all()
+        self.assertEqual(len(leads), 1199)
+        self.assertTrue(all(lead.status == "Identified" for lead in leads))
+        self.assertNotIn("SOL-0", {lead.opportunity.sam_gov_id for lead in leads})
+        writes = [s for s in self.statements if s.lstrip().upper().startswith("INSERT")]
+        self.assertLess(len(writes), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import json
+import os
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.db.models import Base, Lead, Opportunity, ProcessedEvent, WebhookEvent
+from app.services.event_ledger import EventLedger
+from app.services.lead_service import LeadService
+from app.services.webhook_inbox import WebhookInbox
+
+
+def comment(comment_id, user_id, text):
+    return {"comment_text": text, "user_id": user_id, "comment_id": comment_id}
+
+
+class TestBatchedCommentProcessing(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.db = self.Session()
+        self.addCleanup(self.db.close)
+
+        self.queue = MagicMock()
+        patchers = [
+            patch('app.services.lead_service.FacebookService'),
+            patch('app.services.lead_service.NAICSService'),
+            patch('app.services.lead_service.PSCService'),
+            patch('app.services.lead_service.SAMService'),
+            patch('app.services.lead_service.get_outbound_queue', return_value=self.queue),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.service = LeadService(self.db)
+        self.service.event_ledger = EventLedger()
+
+        naics = {"janitorial services": "561720", "cleaning": "561720", "roofing": "238160"}
+        self.service.naics_service.find_code_for_keywords.side_effect = naics.get
+        self.service.sam_service.fetch_opportunities.side_effect = lambda params, priority: [{
+            "sam_gov_id": f"SOL-{params['naics']}", "title": f"Contract {params['naics']}",
+            "url": f"https://sam.gov/{params['naics']}", "posted_date": "2025-07-01T00:00:00Z",
+        }]
+        self.service.facebook_service.get_user_profiles.side_effect = lambda ids: {
+            user_id: {"name": f"User {user_id}"} for user_id in ids
+        }
+
+    def test_lookups_are_shared_across_the_batch(self):
+        leads = self.service.process_comments([
+            comment("c-1", "u-1", "Janitorial services"),
+            comment("c-2", "u-2", "janitorial services!"),
+            comment("c-3", "u-3", "Cleaning"),
+            comment("c-4", "u-4", "Roofing"),
+            comment("c-5", "u-5", "the"),
+        ])
+
+        self.assertEqual(len(leads), 4)
+        # Three distinct keyword sets, two distinct NAICS codes, one profile batch.
+        self.assertEqual(self.service.naics_service.find_code_for_keywords.call_count, 3)
+        self.assertEqual(self.service.sam_service.fetch_opportunities.call_count, 2)
+        self.service.facebook_service.get_user_profiles.assert_called_once()
+
+        self.assertEqual(self.db.query(Opportunity).count(), 2)
+        self.assertEqual(self.db.query(Lead).filter(Lead.status == "ENGAGED").count(), 4)
+        self.assertEqual(self.queue.enqueue.call_count, 4)
+        args, kwargs = self.queue.enqueue.call_args_list[0]
+        self.assertEqual(args[1:3], ("private_reply", "c-1"))
+        self.assertIn("Hi User u-1", args[3])
+        self.assertFalse(kwargs["commit"])
+        self.assertEqual(kwargs["recipient_user_id"], "u-1")
+
+    def test_batch_is_written_in_one_transaction(self):
+        self.db.add(Opportunity(sam_gov_id="SOL-561720", title="Existing contract"))
+        self.db.commit()
+
+        with patch.object(self.db, 'commit', wraps=self.db.commit) as commit:
+            self.service.process_comments([
+                comment("c-1", "u-1", "cleaning"),
+                comment("c-2", "u-2", "roofing"),
+            ])
+
+        # The ledger keys are committed together with the leads.
+        self.assertEqual(commit.call_count, 1)
+        self.assertEqual(self.db.query(Opportunity).count(), 2)
+        self.assertEqual(self.db.query(Lead).first().opportunity.title, "Existing contract")
+
+    def test_failure_rolls_back_the_whole_batch(self):
+        self.queue.enqueue.side_effect = [None, RuntimeError("database is locked")]
+
+        with self.assertRaises(RuntimeError):
+            self.service.process_comments([
+                comment("c-1", "u-1", "cleaning"),
+                comment("c-2", "u-2", "roofing"),
+            ])
+
+        self.assertEqual(self.db.query(Lead).count(), 0)
+        self.assertEqual(self.db.query(Opportunity).count(), 0)
+        # Both comments can be processed on retry.
+        self.queue.enqueue.side_effect = None
+        self.assertEqual(len(self.service.process_comments([comment("c-1", "u-1", "cleaning"),
+                                                            comment("c-2", "u-2", "roofing")])), 2)
+
+    def test_inbox_retry_after_a_crash_creates_the_leads(self):
+        ledger = EventLedger()
+        def lead_service(db):
+            service = LeadService(db)
+            service.event_ledger = ledger
+            return service
+        inbox = WebhookInbox(session_factory=self.Session, lead_service_factory=lead_service,
+                             base_backoff=0, ledger=ledger)
+        inbox.record(self.db, json.dumps({"object": "page", "entry": [{"id": "page-1", "changes": [{
+            "field": "feed",
+            "value": {"item": "comment", "verb": "add", "comment_id": "c-1",
+                      "from": {"id": "u-1"}, "message": "cleaning"},
+        }]}]}))
+
+        # The worker dies after building the leads but before committing them.
+        with patch.object(EventLedger, 'record', side_effect=RuntimeError("worker killed")):
+            inbox.process_due()
+        self.assertEqual(self.db.query(Lead).count(), 0)
+        self.assertEqual(self.db.query(ProcessedEvent).filter(ProcessedEvent.source == "facebook_comment").count(), 0)
+
+        self.assertEqual(inbox.process_due(), 1)
+        self.db.expire_all()
+        self.assertEqual(self.db.query(Lead).count(), 1)
+        self.assertEqual(self.db.query(WebhookEvent).one().status, "done")
+
+
+if __name__ == '__main__':
+    unittest.main()
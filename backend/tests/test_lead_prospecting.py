@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import asyncio
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.db.models import Base, Lead, Opportunity
+from app.services.lead_service import LeadService
+
+
+class TestConcurrentProspecting(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        self.addCleanup(self.db.close)
+
+        self.facebook = MagicMock()
+        self.in_flight = {"now": 0, "max": 0}
+        self.searched = []
+
+        async def find_page_by_name_async(term):
+            self.searched.append(term)
+            self.in_flight["now"] += 1
+            self.in_flight["max"] = max(self.in_flight["max"], self.in_flight["now"])
+            await asyncio.sleep(0.05)
+            self.in_flight["now"] -= 1
+            if term.startswith("Unknown"):
+                return None
+            return {"id": f"page-{term}", "name": term}
+
+        self.facebook.find_page_by_name_async.side_effect = find_page_by_name_async
+        self.facebook.http.aclose = MagicMock(side_effect=lambda: asyncio.sleep(0))
+
+        patchers = [
+            patch('app.services.lead_service.FacebookService', return_value=self.facebook),
+            patch('app.services.lead_service.NAICSService'),
+            patch('app.services.lead_service.PSCService'),
+            patch('app.services.lead_service.SAMService'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.service = LeadService(self.db)
+
+    def add_opportunities(self, titles):
+        self.db.add_all(Opportunity(sam_gov_id=f"SOL-{i}", title=title) for i, title in enumerate(titles))
+        self.db.commit()
+
+    def test_searches_run_under_the_semaphore_and_leads_are_committed_in_batches(self):
+        titles = [f"Agency {i}" for i in range(12)] + ["Agency 0", "Unknown Vendor"]
+        self.add_opportunities(titles)
+
+        with patch.object(self.db, 'commit', wraps=self.db.commit) as commit:
+            started = time.perf_counter()
+            self.service.process_new_opportunities(concurrency=4, commit_every=5)
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(self.in_flight["max"], 4)
+        # 13 distinct terms, 4 at a time at 50ms each: ~4 rounds, not 14.
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(sorted(self.searched), sorted(set(titles)))
+        self.assertEqual(self.db.query(Lead).count(), 13)
+        self.assertEqual(commit.call_count, 3)
+        self.facebook.find_page_by_name.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
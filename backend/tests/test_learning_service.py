@@ -0,0 +1,143 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import openai
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.db.models import Base, ConversationLog, Lead, Learning
+from app.services.learning_service import ConversationAnalyzer
+
+
+def rate_limit_error(retry_after="3"):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+class TestConversationAnalyzer(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.db = self.Session()
+        self.addCleanup(self.db.close)
+
+        self.service = MagicMock()
+        self.service.aclose = AsyncMock()
+        self.service.analyze_conversation_async = AsyncMock()
+        self.in_flight = {"now": 0, "max": 0}
+        self.sleeps = []
+
+        async def sleep(seconds):
+            self.sleeps.append(seconds)
+
+        self.sleep = sleep
+
+    def add_leads(self, count, status="Appointment Set", with_logs=True):
+        leads = [Lead(business_name=f"Lead {i}", status=status, analyzed_for_learning=False) for i in range(count)]
+        self.db.add_all(leads)
+        self.db.flush()
+        if with_logs:
+            for lead in leads:
+                self.db.add(ConversationLog(lead_id=lead.id, sender="bot", message="Hi"))
+                self.db.add(ConversationLog(lead_id=lead.id, sender="user", message=f"Reply from {lead.id}"))
+        self.db.commit()
+        return [lead.id for lead in leads]
+
+    def analyzer(self, **kwargs):
+        kwargs.setdefault("sleep", self.sleep)
+        return ConversationAnalyzer(self.service, session_factory=self.Session, **kwargs)
+
+    def test_analyses_run_concurrently_under_the_limit(self):
+        lead_ids = self.add_leads(12)
+        self.add_leads(1, status="Messaged")
+
+        async def analyze(history):
+            self.in_flight["now"] += 1
+            self.in_flight["max"] = max(self.in_flight["max"], self.in_flight["now"])
+            await asyncio.sleep(0.05)
+            self.in_flight["now"] -= 1
+            return {"tag": "APPOINTMENT_SET", "summary": history[-1]["text"]}
+
+        self.service.analyze_conversation_async.side_effect = analyze
+
+        started = time.perf_counter()
+        metrics = self.analyzer(concurrency=4, commit_every=5).run()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(self.in_flight["max"], 4)
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(metrics["pending"], 12)
+        self.assertEqual(metrics["analyzed"], 12)
+        self.assertEqual(metrics["commits"], 3)
+        self.assertIsNotNone(metrics["leads_per_minute"])
+        self.service.aclose.assert_called_once()
+
+        learnings = {learning.lead_id: learning.summary for learning in self.db.query(Learning)}
+        self.assertEqual(learnings, {lead_id: f"Reply from {lead_id}" for lead_id in lead_ids})
+        self.assertEqual(self.db.query(Lead).filter(Lead.analyzed_for_learning.is_(True)).count(), 12)
+
+    def test_rate_limits_are_retried_with_retry_after(self):
+        self.add_leads(1)
+        self.service.analyze_conversation_async.side_effect = [
+            rate_limit_error("3"), rate_limit_error("bogus"), {"tag": "GHOSTED", "summary": "No reply."},
+        ]
+
+        metrics = self.analyzer(base_backoff=0.5).run()
+
+        self.assertEqual(self.sleeps, [3.0, 1.0])
+        self.assertEqual(metrics["retries"], 2)
+        self.assertEqual(self.db.query(Learning).one().outcome_tag, "GHOSTED")
+
+    def test_exhausted_retries_leave_lead_for_next_run(self):
+        lead_ids = self.add_leads(2)
+        failing = lead_ids[0]
+
+        async def analyze(history):
+            if history[-1]["text"] == f"Reply from {failing}":
+                raise rate_limit_error()
+            return {"tag": "NOT_INTERESTED", "summary": "Declined."}
+
+        self.service.analyze_conversation_async.side_effect = analyze
+
+        metrics = self.analyzer(max_retries=2).run()
+
+        self.assertEqual(metrics["failed"], 1)
+        self.assertEqual(metrics["analyzed"], 1)
+        self.db.expire_all()
+        self.assertFalse(self.db.get(Lead, failing).analyzed_for_learning)
+        self.assertTrue(self.db.get(Lead, lead_ids[1]).analyzed_for_learning)
+
+    def test_unparseable_answer_is_stored_as_failed_analysis(self):
+        self.add_leads(1)
+        self.service.analyze_conversation_async.side_effect = ValueError("No content in response")
+
+        self.analyzer().run()
+
+        self.assertEqual(self.db.query(Learning).one().outcome_tag, "ANALYSIS_FAILED")
+
+    def test_leads_without_conversation_are_marked_without_learning(self):
+        self.add_leads(2, status="Disqualified", with_logs=False)
+
+        metrics = self.analyzer().run()
+
+        self.assertEqual(metrics["skipped"], 2)
+        self.assertEqual(self.db.query(Learning).count(), 0)
+        self.assertEqual(self.db.query(Lead).filter(Lead.analyzed_for_learning.is_(True)).count(), 2)
+        self.service.analyze_conversation_async.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
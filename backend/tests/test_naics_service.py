@@ -0,0 +1,170 @@
+import unittest
+import csv
+import os
+import sys
+import tempfile
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.services.naics_service import NAICSService
+from app.services.naics_snapshot import NAICSSnapshot, default_csv_path, load_snapshot
+
+
+def load_csv_rows():
+    with open(default_csv_path(), mode='r', encoding='utf-8-sig') as infile:
+        return list(csv.DictReader(infile))
+
+
+def linear_find_code_for_keywords(naics_data, keywords):
+    """
+    The original full-table scan, kept here as the reference the index must agree with.
+    """
+    search_keywords = set(keywords.lower().split())
+    best_match_code = None
+    highest_score = 0
+    for row in naics_data:
+        code = row.get('Code')
+        if not code or len(code) != 6:
+            continue
+        description = row.get('Class title', '').lower()
+        if not description:
+            continue
+        score = len(search_keywords.intersection(description.split()))
+        if keywords.lower() in description:
+            score += 5
+        if score > highest_score:
+            highest_score = score
+            best_match_code = code
+    return best_match_code
+
+
+class TestNAICSKeywordIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = NAICSService()
+        cls.naics_data = load_csv_rows()
+
+    def test_matches_linear_scan(self):
+        """
+        The inverted index must return exactly what the full-table scan returned.
+        """
+        queries = [
+            "roofing contractors",
+            "software publishers",
+            "need help with cybersecurity software",
+            "janitorial services",
+            "construction",
+            "roof",
+            "and",
+            "commercial and institutional building construction",
+            "we do plumbing heating and air-conditioning",
+            "zzzz nothing matches this",
+            "",
+            "   ",
+            "Soybean Farming",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.service.find_code_for_keywords(query),
+                    linear_find_code_for_keywords(self.naics_data, query),
+                )
+
+    def test_phrase_bonus_wins_over_single_token_overlap(self):
+        self.assertEqual(self.service.find_code_for_keywords("soybean farming"), "111110")
+
+    def test_no_match_returns_none(self):
+        self.assertIsNone(self.service.find_code_for_keywords("qwertyuiop"))
+
+
+class TestNAICSCodeTree(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = NAICSService()
+
+    def test_description_lookup(self):
+        self.assertEqual(self.service.get_description_for_code("111110"), "Soybean farming")
+        self.assertIsNone(self.service.get_description_for_code("999999"))
+
+    def test_parent_and_ancestors(self):
+        self.assertEqual(self.service.get_parent_code("111110"), "11111")
+        self.assertEqual(self.service.get_ancestor_codes("111110"), ["11111", "1111", "111", "11"])
+        self.assertIsNone(self.service.get_parent_code("11"))
+
+    def test_range_sector_prefix_rolls_up_only_its_own_subsectors(self):
+        codes = self.service.get_industry_codes_under("32")
+        self.assertTrue(codes)
+        self.assertTrue(all(code.startswith("32") and len(code) == 6 for code in codes))
+        self.assertGreater(len(self.service.get_industry_codes_under("31-33")), len(codes))
+
+    def test_sibling_industries_share_industry_group(self):
+        siblings = self.service.get_sibling_industry_codes("238160")
+        self.assertIn("238110", siblings)
+        self.assertNotIn("238160", siblings)
+        self.assertTrue(all(code.startswith("2381") for code in siblings))
+
+
+class TestNAICSBatchRanking(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = NAICSService()
+
+    def test_batch_ranks_casual_comment_text(self):
+        results = self.service.find_codes_for_keywords_batch(
+            ["We do roofing and gutters", "janitorial cleaning for offices", "zzzz"],
+            top_k=3,
+        )
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0][0][0], "238160")
+        self.assertEqual(results[1][0][0], "561722")
+        self.assertEqual(results[2], [])
+
+    def test_scores_are_sorted_and_limited_to_top_k(self):
+        (ranked,) = self.service.find_codes_for_keywords_batch(["construction of buildings"], top_k=4)
+        self.assertEqual(len(ranked), 4)
+        scores = [score for _, score in ranked]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_batch_matches_single_queries(self):
+        queries = ["software publishers", "plumbing contractors", "bread bakeries"]
+        batch = self.service.find_codes_for_keywords_batch(queries, top_k=2)
+        for query, expected in zip(queries, batch):
+            (single,) = self.service.find_codes_for_keywords_batch([query], top_k=2)
+            self.assertEqual([c for c, _ in single], [c for c, _ in expected])
+
+
+class TestNAICSSnapshot(unittest.TestCase):
+
+    def test_snapshot_round_trips_csv_columns(self):
+        rows = load_csv_rows()
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot = load_snapshot(snapshot_path=os.path.join(tmp, "naics.snapshot"))
+            self.assertEqual(len(snapshot), len(rows))
+            for row_number in (0, 1, len(rows) // 2, len(rows) - 1):
+                row = rows[row_number]
+                self.assertEqual(snapshot.code(row_number), row['Code'])
+                self.assertEqual(snapshot.parent(row_number), row['Parent'])
+                self.assertEqual(snapshot.title(row_number), row['Class title'])
+                self.assertEqual(snapshot.definition(row_number), row['Class definition'])
+                self.assertEqual(snapshot.level(row_number), int(row['Level']))
+            self.assertEqual(snapshot.column("Code"), [row['Code'] for row in rows])
+
+    def test_stale_snapshot_is_rejected(self):
+        data = NAICSSnapshot.serialize([{'Code': '11', 'Level': '1'}], (1, 2))
+        self.assertEqual(NAICSSnapshot(data, (1, 2)).code(0), '11')
+        with self.assertRaises(ValueError):
+            NAICSSnapshot(data, (1, 3))
+
+    def test_services_share_one_index(self):
+        first, second = NAICSService(), NAICSService()
+        self.assertIs(first._token_index, second._token_index)
+        self.assertIs(first._snapshot, second._snapshot)
+
+
+if __name__ == '__main__':
+    unittest.main()
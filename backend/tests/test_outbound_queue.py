@@ -0,0 +1,183 @@
+import unittest
+from unittest.mock import Mock
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.db.models import Base, ConversationLog, Lead, OutboundMessage
+from app.services.outbound_queue import OutboundMessageQueue
+
+
+def graph_error(status_code, code=None):
+    request = httpx.Request("POST", "https://graph.facebook.com/v20.0/me/messages")
+    body = {"error": {"code": code, "message": "nope"}} if code is not None else {}
+    response = httpx.Response(status_code, json=body, request=request)
+    return httpx.HTTPStatusError("Graph error", request=request, response=response)
+
+
+class TestOutboundMessageQueue(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.db = self.Session()
+        self.addCleanup(self.db.close)
+        self.now = [datetime(2025, 7, 1, 12, 0, 0)]
+        self.facebook = Mock()
+        self.facebook.send_private_reply.return_value = {"message_id": "m-1"}
+        self.facebook.send_direct_message.return_value = {"message_id": "m-2"}
+        self.queue = OutboundMessageQueue(
+            session_factory=self.Session, facebook_service=self.facebook,
+            page_rate_per_minute=6000, page_burst=100, recipient_interval=60,
+            base_backoff=30, max_backoff=300, clock=lambda: self.now[0],
+        )
+        self.lead = Lead(business_name="Acme", status="ENGAGED")
+        self.db.add(self.lead)
+        self.db.commit()
+
+    def advance(self, seconds):
+        self.now[0] += timedelta(seconds=seconds)
+
+    def message(self, message_id):
+        self.db.expire_all()
+        return self.db.get(OutboundMessage, message_id)
+
+    def test_enqueue_acks_immediately_and_delivery_updates_the_log_and_lead(self):
+        ack = self.queue.enqueue(self.db, "private_reply", "comment-1", "Hi!", lead_id=self.lead.id,
+                                 page_id="page", lead_status_on_sent="MESSAGED")
+        self.assertEqual(ack["status"], "queued")
+        self.facebook.send_private_reply.assert_not_called()
+        log = self.db.query(ConversationLog).one()
+        self.assertEqual(log.delivery_status, "queued")
+
+        self.assertEqual(self.queue.process_due(), 1)
+
+        self.facebook.send_private_reply.assert_called_once_with("comment-1", "Hi!")
+        self.db.expire_all()
+        self.assertEqual(self.db.query(ConversationLog).one().delivery_status, "sent")
+        self.assertEqual(self.db.get(Lead, self.lead.id).status, "MESSAGED")
+        sent = self.message(ack["message_id"])
+        self.assertEqual((sent.status, sent.graph_message_id), ("sent", "m-1"))
+        self.assertEqual(self.queue.stats(self.db)["sent"], 1)
+
+    def test_recipient_is_limited_to_one_message_per_interval(self):
+        first = self.queue.enqueue(self.db, "direct_message", "user-1", "one", page_id="page")
+        second = self.queue.enqueue(self.db, "direct_message", "user-1", "two", page_id="page")
+
+        self.queue.process_due()
+        self.assertEqual(self.message(first["message_id"]).status, "sent")
+        delayed = self.message(second["message_id"])
+        self.assertEqual(delayed.status, "queued")
+        self.assertEqual(delayed.next_attempt_at, self.now[0] + timedelta(seconds=60))
+
+        self.advance(59)
+        self.assertEqual(self.queue.process_due(), 0)
+        self.advance(1)
+        self.queue.process_due()
+        self.assertEqual(self.message(second["message_id"]).status, "sent")
+
+    def test_private_replies_to_one_commenter_share_the_interval(self):
+        first = self.queue.enqueue(self.db, "private_reply", "comment-1", "one", page_id="page",
+                                   recipient_user_id="user-1")
+        second = self.queue.enqueue(self.db, "private_reply", "comment-2", "two", page_id="page",
+                                    recipient_user_id="user-1")
+        dm = self.queue.enqueue(self.db, "direct_message", "user-1", "three", page_id="page")
+        other = self.queue.enqueue(self.db, "private_reply", "comment-3", "four", page_id="page",
+                                   recipient_user_id="user-2")
+
+        self.queue.process_due()
+
+        self.assertEqual(self.message(first["message_id"]).status, "sent")
+        self.assertEqual(self.message(second["message_id"]).status, "queued")
+        self.assertEqual(self.message(dm["message_id"]).status, "queued")
+        self.assertEqual(self.message(other["message_id"]).status, "sent")
+
+    def test_page_rate_limit_spaces_out_a_burst(self):
+        self.queue.page_rate_per_minute = 60
+        self.queue.page_burst = 2
+        acks = [self.queue.enqueue(self.db, "direct_message", f"user-{i}", "hi", page_id="busy") for i in range(4)]
+
+        self.queue.process_due()
+
+        statuses = [self.message(ack["message_id"]).status for ack in acks]
+        self.assertEqual(statuses, ["sent", "sent", "queued", "queued"])
+        self.assertEqual(self.facebook.send_direct_message.call_count, 2)
+
+    def test_graph_throttling_backs_off_adaptively_without_using_attempts(self):
+        self.facebook.send_direct_message.side_effect = graph_error(400, code=613)
+        ack = self.queue.enqueue(self.db, "direct_message", "user-1", "hi", page_id="page")
+
+        self.queue.process_due()
+        throttled = self.message(ack["message_id"])
+        self.assertEqual((throttled.status, throttled.attempts), ("queued", 0))
+        self.assertEqual(throttled.next_attempt_at, self.now[0] + timedelta(seconds=30))
+
+        self.advance(30)
+        self.queue.process_due()
+        self.assertEqual(self.message(ack["message_id"]).next_attempt_at, self.now[0] + timedelta(seconds=60))
+
+        self.facebook.send_direct_message.side_effect = None
+        self.advance(60)
+        self.queue.process_due()
+        self.assertEqual(self.message(ack["message_id"]).status, "sent")
+        self.assertNotIn("page", self.queue._page_backoff)
+
+    def test_permanent_errors_fail_after_max_attempts(self):
+        self.queue.max_attempts = 2
+        self.facebook.send_private_reply.side_effect = graph_error(400, code=100)
+        ack = self.queue.enqueue(self.db, "private_reply", "comment-1", "Hi!", lead_id=self.lead.id, page_id="page")
+
+        self.queue.process_due()
+        self.assertEqual(self.message(ack["message_id"]).status, "queued")
+        self.advance(30)
+        self.queue.process_due()
+
+        failed = self.message(ack["message_id"])
+        self.assertEqual((failed.status, failed.attempts), ("failed", 2))
+        self.assertEqual(failed.conversation_log.delivery_status, "failed")
+
+    def test_worker_pool_sends_each_message_once(self):
+        # Each worker needs a connection of its own, so use a database file.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        engine = create_engine(f"sqlite:///{os.path.join(directory.name, 'queue.db')}",
+                               connect_args={"check_same_thread": False, "timeout": 30})
+        self.addCleanup(engine.dispose)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        queue = OutboundMessageQueue(
+            session_factory=Session, facebook_service=self.facebook, page_rate_per_minute=6000,
+            page_burst=100, recipient_interval=0, poll_interval=0.01, clock=lambda: self.now[0],
+        )
+        with Session() as db:
+            for i in range(20):
+                queue.enqueue(db, "direct_message", f"user-{i}", f"Hi {i}", page_id="page")
+
+        queue.start(workers=4)
+        try:
+            for _ in range(500):
+                with Session() as db:
+                    if queue.stats(db)["sent"] == 20:
+                        break
+                time.sleep(0.01)
+        finally:
+            queue.stop()
+
+        recipients = [call.args[0] for call in self.facebook.send_direct_message.call_args_list]
+        self.assertEqual(sorted(recipients), sorted(f"user-{i}" for i in range(20)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+from types import SimpleNamespace
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.core.cache import MISSING, VariantCache
+from app.services import conversation_service
+from app.services.conversation_service import INITIAL_MESSAGE_FALLBACK, ConversationService, initial_message_key
+
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class TestVariantCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = VariantCache(maxsize=2, variants=2, ttl=100, clock=lambda: self.now)
+
+    def test_fills_pool_then_rotates(self):
+        self.assertIs(self.cache.get("k"), MISSING)
+        self.cache.add("k", "a")
+        self.assertIs(self.cache.get("k"), MISSING)
+        self.cache.add("k", "b")
+        self.cache.add("k", "c") # The pool is full.
+
+        self.assertEqual([self.cache.get("k") for _ in range(3)], ["a", "b", "a"])
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (3, 2))
+        self.assertEqual(stats["keys"], [{"key": "k", "label": None, "variants": 2, "hits": 3, "misses": 2}])
+
+    def test_evicts_least_recently_used_and_expired_keys(self):
+        for key in ("a", "b"):
+            self.cache.add(key, key)
+        self.cache.get("a")
+        self.cache.add("c", "c")
+
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertEqual({entry["key"] for entry in self.cache.stats()["keys"]}, {"a", "c"})
+
+        self.now = 100
+        self.assertIs(self.cache.get("a"), MISSING)
+        self.assertEqual(len(self.cache), 1)
+
+
+class TestInitialMessageCache(unittest.TestCase):
+
+    def setUp(self):
+        cache = VariantCache(maxsize=16, variants=2)
+        patcher = patch.object(conversation_service, "_initial_message_cache", cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test"}):
+            self.service = ConversationService()
+        self.service.client = MagicMock()
+        self.drafts = iter(["Draft one", "Draft two", "Draft three"])
+        self.service.client.chat.completions.create.side_effect = lambda **kwargs: completion(next(self.drafts))
+        self.lead = {"opportunity_title": "Janitorial Services", "agency_name": "GSA",
+                     "opportunity_description": "Cleaning  services for   federal buildings."}
+
+    def test_leads_for_the_same_opportunity_share_drafts(self):
+        reformatted = dict(self.lead, opportunity_title="JANITORIAL SERVICES ")
+
+        messages = [self.service.generate_initial_message(lead) for lead in (self.lead, reformatted, self.lead, self.lead)]
+
+        self.assertEqual(messages, ["Draft one", "Draft two", "Draft one", "Draft two"])
+        self.assertEqual(self.service.client.chat.completions.create.call_count, 2)
+        key_stats = conversation_service.initial_message_cache_stats()["keys"][0]
+        self.assertEqual(key_stats["label"], "Janitorial Services (GSA)")
+        self.assertEqual((key_stats["hits"], key_stats["misses"]), (2, 2))
+
+    def test_key_covers_inputs_and_model_parameters(self):
+        base = initial_message_key("Title", "GSA", "Desc", model="gpt-4o", temperature=0.7)
+
+        self.assertEqual(base, initial_message_key(" title ", "gsa", "desc", temperature=0.7, model="gpt-4o"))
+        self.assertNotEqual(base, initial_message_key("Title", "GSA", "Other", model="gpt-4o", temperature=0.7))
+        self.assertNotEqual(base, initial_message_key("Title", "GSA", "Desc", model="gpt-4o", temperature=0.2))
+
+    def test_fallback_is_not_cached(self):
+        self.service.client.chat.completions.create.side_effect = RuntimeError("OpenAI down")
+
+        self.assertEqual(self.service.generate_initial_message(self.lead), INITIAL_MESSAGE_FALLBACK)
+        self.assertEqual(conversation_service.initial_message_cache_stats()["size"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import Mock, patch
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.api.deps import get_sam_service
+from app.api.v1.endpoints import pipeline
+from app.db.client import get_db
+from app.db.models import Base, Lead, Opportunity
+from app.services.ingest_service import IngestService
+
+
+class TestOpportunityPipelineEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.threads = {}
+
+        async def fan_out(keywords):
+            self.threads["event_loop"] = threading.get_ident()
+            return [{"sam_gov_id": "SOL-1", "title": "Janitorial", "url": "https://sam.gov/opp/1",
+                     "agency": "GSA", "posted_date": datetime(2025, 7, 1, tzinfo=timezone.utc)}], []
+        sam_service = Mock()
+        sam_service.fan_out.side_effect = fan_out
+
+        # The pipeline router is not mounted on the main app.
+        app = FastAPI()
+        app.include_router(pipeline.router, prefix="/pipeline")
+        app.dependency_overrides[get_db] = lambda: self.Session()
+        app.dependency_overrides[get_sam_service] = lambda: sam_service
+        self.client = TestClient(app)
+
+    def test_ingest_runs_off_the_event_loop(self):
+        bulk_upsert = IngestService.bulk_upsert_opportunities
+        def recording_upsert(service, *args, **kwargs):
+            self.threads["ingest"] = threading.get_ident()
+            return bulk_upsert(service, *args, **kwargs)
+
+        with patch.object(IngestService, "bulk_upsert_opportunities", recording_upsert):
+            response = self.client.post("/pipeline/run-opportunity-pipeline")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["new_leads_created"], 1)
+        self.assertNotEqual(self.threads["ingest"], self.threads["event_loop"])
+        db = self.Session()
+        self.assertEqual(db.query(Opportunity).count(), 1)
+        self.assertEqual(db.query(Lead).one().status, "Identified")
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import Mock, patch
+import os
+import sys
+import tempfile
+
+import httpx
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.core.cache import TTLCache
+from app.core.quota import QuotaGovernor
+from app.services import psc_catalog
+from app.services.psc_catalog import PSCCatalog, default_catalog_path
+from app.services.psc_service import PSCService
+
+
+def api_response(records):
+    response = Mock()
+    response.raise_for_status.return_value = None
+    response.json.return_value = {"totalRecords": str(len(records)), "productServiceCodeList": records}
+    return response
+
+
+class TestPSCService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.catalog = PSCCatalog(os.path.join(self.tmp.name, "psc.sqlite3"))
+        patcher = patch.dict(os.environ, {"SAM_GOV_API_KEY": "test-key"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_service(self):
+        return PSCService(catalog=self.catalog, cache=TTLCache(), quota=QuotaGovernor("test", capacity=100),
+                          http_client=Mock())
+
+    def test_live_lookup_is_cached_and_persisted(self):
+        service = self.make_service()
+        service.http.get.return_value = api_response([{"pscCode": "R425", "pscName": "ENGINEERING AND TECHNICAL"}])
+
+        self.assertEqual(service.get_description_for_code("R425"), "ENGINEERING AND TECHNICAL")
+        self.assertEqual(service.get_description_for_code("R425"), "ENGINEERING AND TECHNICAL")
+        self.assertEqual(service.http.get.call_count, 1)
+        self.assertIsNotNone(service.http.get.call_args.kwargs.get("timeout"))
+
+        # A new process (fresh memory cache) reads the code from the disk catalog.
+        restarted = self.make_service()
+        self.assertEqual(restarted.get_description_for_code("R425"), "ENGINEERING AND TECHNICAL")
+        restarted.http.get.assert_not_called()
+
+    def test_missing_codes_are_negatively_cached(self):
+        service = self.make_service()
+        service.http.get.return_value = api_response([])
+
+        self.assertIsNone(service.get_description_for_code("ZZZZ"))
+        self.assertIsNone(service.get_description_for_code("ZZZZ"))
+        self.assertEqual(service.http.get.call_count, 1)
+
+    def test_transient_failures_are_not_cached(self):
+        service = self.make_service()
+        service.http.get.side_effect = [
+            httpx.ConnectError("connection reset"),
+            api_response([{"pscCode": "R425", "pscName": "ENGINEERING AND TECHNICAL"}]),
+        ]
+
+        self.assertIsNone(service.get_description_for_code("R425"))
+        self.assertEqual(service.get_description_for_code("R425"), "ENGINEERING AND TECHNICAL")
+        self.assertEqual(service.http.get.call_count, 2)
+
+    def test_refresh_catalog_bulk_loads_and_respects_max_age(self):
+        service = self.make_service()
+        service.http.get.return_value = api_response([
+            {"pscCode": "R425", "pscName": "ENGINEERING AND TECHNICAL"},
+            {"pscCode": "D302", "pscName": "IT SYSTEMS DEVELOPMENT"},
+        ])
+
+        self.assertEqual(service.refresh_catalog(), 2)
+        self.assertEqual(len(self.catalog), 2)
+        self.assertEqual(service.refresh_catalog(), 0)
+        self.assertEqual(service.http.get.call_count, 1)
+
+        self.assertEqual(service.get_description_for_code("D302"), "IT SYSTEMS DEVELOPMENT")
+        self.assertEqual(service.http.get.call_count, 1)
+
+
+class TestPSCCatalog(unittest.TestCase):
+
+    def test_connections_are_closed(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        connect = psc_catalog.sqlite3.connect
+        opened = []
+        class TrackingConnection(psc_catalog.sqlite3.Connection):
+            closed = False
+            def close(self):
+                self.closed = True
+                super().close()
+        def tracking_connect(*args, **kwargs):
+            opened.append(connect(*args, factory=TrackingConnection, **kwargs))
+            return opened[-1]
+
+        with patch.object(psc_catalog.sqlite3, "connect", side_effect=tracking_connect):
+            catalog = PSCCatalog(os.path.join(tmp.name, "psc.sqlite3"))
+            catalog.put("R425", "ENGINEERING AND TECHNICAL")
+            self.assertEqual(catalog.get("R425"), "ENGINEERING AND TECHNICAL")
+            self.assertEqual(len(catalog), 1)
+
+        self.assertEqual(len(opened), 4)
+        self.assertTrue(all(conn.closed for conn in opened))
+
+    def test_default_path_is_outside_the_temp_directory(self):
+        with patch.dict(os.environ, {"XDG_DATA_HOME": "/var/lib/app"}):
+            os.environ.pop("PSC_CATALOG_PATH", None)
+            self.assertEqual(default_catalog_path(), "/var/lib/app/govbidgenie/psc_catalog.sqlite3")
+        with patch.dict(os.environ, {"PSC_CATALOG_PATH": "/data/psc.sqlite3"}):
+            self.assertEqual(default_catalog_path(), "/data/psc.sqlite3")
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_entries_expire_and_lru_evicts(self):
+        now = [0.0]
+        cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=1)
+        self.assertEqual(cache.get("a"), 1)
+        now[0] = 5
+        self.assertIsNone(cache.get("b", None))
+        cache.set("c", 3)
+        cache.set("d", 4)
+        self.assertIsNone(cache.get("a", None))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.core.quota import BULK, INTERACTIVE, QuotaExhaustedError, QuotaGovernor
+from app.db.models import ApiQuota, Base
+
+
+class TestQuotaGovernor(unittest.TestCase):
+
+    def setUp(self):
+        self.now = [1_700_000_000.0]
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+
+    def make_governor(self, **kwargs):
+        kwargs.setdefault("session_factory", self.Session)
+        return QuotaGovernor("sam.gov", capacity=10, refill_period=100.0,
+                             clock=lambda: self.now[0], **kwargs)
+
+    def test_bucket_is_shared_through_the_database_and_refills(self):
+        first, second = self.make_governor(), self.make_governor()
+
+        for _ in range(6):
+            self.assertTrue(first.acquire(timeout=0))
+        for _ in range(4):
+            self.assertTrue(second.acquire(timeout=0))
+        self.assertFalse(first.acquire(timeout=0))
+        self.assertEqual(second.remaining(), 0)
+
+        db = self.Session()
+        self.assertEqual(db.query(ApiQuota).count(), 1)
+        db.close()
+
+        # 10 tokens per 100 seconds.
+        self.now[0] += 25
+        self.assertAlmostEqual(first.remaining(), 2.5)
+        self.assertTrue(second.acquire(timeout=0))
+
+    def test_database_failure_falls_back_locally_then_retries(self):
+        failures = [RuntimeError("connection refused")]
+        def session_factory():
+            if failures:
+                raise failures.pop()
+            return self.Session()
+        governor = self.make_governor(session_factory=session_factory, db_retry_interval=30)
+
+        self.assertTrue(governor.acquire(timeout=0))
+        self.assertIsNotNone(governor.session_factory)
+        self.assertAlmostEqual(governor._local_tokens, 9)
+
+        # Still within the retry interval: the shared row is not touched.
+        self.assertTrue(governor.acquire(timeout=0))
+        db = self.Session()
+        self.assertEqual(db.query(ApiQuota).count(), 0)
+
+        self.now[0] += 30
+        self.assertTrue(governor.acquire(timeout=0))
+        self.assertEqual(db.query(ApiQuota).one().tokens, 9)
+        db.close()
+
+    def test_interactive_reserve_is_not_spent_by_bulk_callers(self):
+        governor = self.make_governor(interactive_reserve=3)
+
+        granted = 0
+        while governor.acquire(BULK, timeout=0):
+            granted += 1
+        self.assertEqual(granted, 7)
+        for _ in range(3):
+            self.assertTrue(governor.acquire(INTERACTIVE, timeout=0))
+        self.assertFalse(governor.acquire(INTERACTIVE, timeout=0))
+
+    def test_interactive_waiter_preempts_queued_bulk_waiters(self):
+        # Real clock here so the waiters actually sleep; 10 tokens per second.
+        governor = QuotaGovernor("sam.gov", capacity=1, refill_period=0.1, max_wait=0.05)
+        self.assertTrue(governor.acquire(BULK, timeout=0))
+        order = []
+
+        def worker(name, priority):
+            governor.acquire(priority, timeout=5)
+            order.append(name)
+
+        bulk = [threading.Thread(target=worker, args=(f"bulk-{i}", BULK)) for i in range(3)]
+        for thread in bulk:
+            thread.start()
+        deadline = time.time() + 2
+        while governor.queue_depth() < 3 and time.time() < deadline:
+            time.sleep(0.001)
+        self.assertEqual(governor.status()["waiting"]["bulk"], 3)
+
+        interactive = threading.Thread(target=worker, args=("interactive", INTERACTIVE))
+        interactive.start()
+        for thread in bulk + [interactive]:
+            thread.join()
+
+        self.assertLessEqual(order.index("interactive"), 1)
+        self.assertEqual(governor.queue_depth(), 0)
+
+    def test_guard_raises_instead_of_calling_when_exhausted(self):
+        governor = self.make_governor(session_factory=None)
+        calls = []
+        fetch = governor.guard(lambda *args, **kwargs: calls.append(args), BULK, timeout=0)
+
+        for _ in range(10):
+            fetch("https://api.sam.gov")
+        with self.assertRaises(QuotaExhaustedError):
+            fetch("https://api.sam.gov")
+        self.assertEqual(len(calls), 10)
+        self.assertEqual(governor.stats["denied"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import httpx
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.core.quota import QuotaGovernor
+from app.db.models import Base, Opportunity, SamSyncState
+from app.services.sam_service import SAMService
+
+
+def raw_opportunity(n):
+    return {
+        "solicitationId": f"SOL-{n}",
+        "title": f"Opportunity {n}",
+        "postedDate": "2025-07-01",
+        "organizationHierarchy": {"departmentName": "GSA"},
+    }
+
+
+class FakeSAM:
+    """
+    Serves `total` opportunities, treating `offset` as a page index like SAM.gov does.
+    """
+    def __init__(self, total):
+        self.total = total
+        self.requests = []
+
+    def __call__(self, params):
+        self.requests.append(dict(params))
+        start = params['offset'] * params['limit']
+        end = min(start + params['limit'], self.total)
+        return {
+            "totalRecords": self.total,
+            "opportunitiesData": [raw_opportunity(n) for n in range(start, end)],
+        }
+
+
+class TestSAMPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.service = SAMService()
+
+    def test_iterates_all_pages(self):
+        fake = FakeSAM(total=25)
+        with patch.object(self.service, '_request_page', side_effect=fake):
+            ids = [opp['sam_gov_id'] for opp in self.service.iter_opportunities(page_size=10)]
+
+        self.assertEqual(ids, [f"SOL-{n}" for n in range(25)])
+        self.assertEqual([r['offset'] for r in fake.requests], [0, 1, 2])
+
+    def test_resumes_from_cursor(self):
+        fake = FakeSAM(total=25)
+        with patch.object(self.service, '_request_page', side_effect=fake):
+            pages = self.service.iter_opportunity_pages(page_size=10)
+            cursor, first_page = next(pages)
+            pages.close()
+            resumed = list(self.service.iter_opportunity_pages(page_size=10, start_offset=cursor))
+
+        self.assertEqual(cursor, 1)
+        self.assertEqual(len(first_page), 10)
+        self.assertEqual([c for c, _ in resumed], [2, 3])
+        self.assertEqual(resumed[0][1][0]['sam_gov_id'], "SOL-10")
+
+    def test_fetch_and_store_ingests_past_first_page(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        db.add(Opportunity(sam_gov_id="SOL-3", title="Already stored"))
+        db.commit()
+
+        fake = FakeSAM(total=250)
+        with patch.object(self.service, '_request_page', side_effect=fake):
+            self.service.fetch_and_store_opportunities(db, page_size=100)
+
+        self.assertEqual(db.query(Opportunity).count(), 250)
+        self.assertEqual(len(fake.requests), 3)
+        db.close()
+
+
+class TestSAMFanOut(unittest.TestCase):
+
+    def setUp(self):
+        self.service = SAMService(quota=QuotaGovernor("test", capacity=100))
+
+    def test_build_shards_splits_dates_and_crosses_filters(self):
+        shards = SAMService.build_shards(
+            keywords=["IT", "Software"],
+            naics_codes=["541511"],
+            posted_from=datetime(2025, 7, 1),
+            posted_to=datetime(2025, 7, 5),
+            shard_days=2,
+        )
+        self.assertEqual(len(shards), 6)
+        self.assertEqual(
+            [(s['postedFrom'], s['postedTo']) for s in shards[:3]],
+            [("07/01/2025", "07/02/2025"), ("07/03/2025", "07/04/2025"), ("07/05/2025", "07/05/2025")],
+        )
+        self.assertEqual(shards[0]['ncode'], "541511")
+        self.assertEqual(shards[3]['title'], "Software")
+
+    def test_fan_out_dedupes_limits_concurrency_and_reports_timings(self):
+        in_flight = {"now": 0, "max": 0}
+        results_by_title = {
+            "IT": [raw_opportunity(1), raw_opportunity(2)],
+            "Software": [raw_opportunity(2), raw_opportunity(3)],
+            "Consulting": [raw_opportunity(4)],
+        }
+
+        async def handler(request):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            title = request.url.params["title"]
+            if title == "Broken":
+                return httpx.Response(500)
+            data = results_by_title[title]
+            return httpx.Response(200, json={"totalRecords": len(data), "opportunitiesData": data})
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await self.service.fan_out(
+                    keywords=["IT", "Software", "Consulting", "Broken"], concurrency=2, client=client
+                )
+
+        opportunities, timings = asyncio.run(run())
+
+        self.assertEqual(sorted(o['sam_gov_id'] for o in opportunities), ["SOL-1", "SOL-2", "SOL-3", "SOL-4"])
+        self.assertLessEqual(in_flight["max"], 2)
+        self.assertEqual(len(timings), 4)
+        failed = [t for t in timings if t["error"]]
+        self.assertEqual([t["shard"]["title"] for t in failed], ["Broken"])
+        self.assertTrue(all(t["seconds"] > 0 for t in timings))
+
+
+class TestSAMWatermarkSync(unittest.TestCase):
+
+    def setUp(self):
+        self.service = SAMService()
+        # Probe on every run unless a test says otherwise.
+        self.service.PROBE_INTERVAL = 0
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+        self.addCleanup(self.db.close)
+        self.fan_out_calls = []
+        self.fan_out_result = ([], [])
+
+        async def fake_fan_out(**kwargs):
+            self.fan_out_calls.append(kwargs)
+            return self.fan_out_result
+
+        patcher = patch.object(self.service, 'fan_out', side_effect=fake_fan_out)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def probe_total(self, total):
+        return patch.object(self.service, '_request_page', return_value={"totalRecords": total})
+
+    def parsed(self, n, posted_date):
+        return {"sam_gov_id": f"SOL-{n}", "title": f"Opportunity {n}", "url": None, "agency": "GSA", "posted_date": posted_date}
+
+    def test_first_run_sets_watermark_and_repeat_is_noop(self):
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        self.fan_out_result = ([self.parsed(1, today - timedelta(days=1)), self.parsed(2, today)],
+                               [{"error": None}])
+
+        with self.probe_total(2):
+            first = self.service.sync_opportunities(self.db)
+        self.assertEqual(first["status"], "synced")
+        self.assertEqual(first["new_count"], 2)
+        state = self.db.query(SamSyncState).one()
+        self.assertEqual(state.watermark_posted_date, today)
+
+        # The window moved forward to the watermark day, so that day is read once more.
+        with self.probe_total(1):
+            second = self.service.sync_opportunities(self.db)
+        self.assertEqual(second["status"], "synced")
+        self.assertEqual(self.fan_out_calls[-1]["posted_from"], today)
+
+        with self.probe_total(1):
+            third = self.service.sync_opportunities(self.db)
+        self.assertEqual(third["status"], "unchanged")
+        self.assertEqual(len(self.fan_out_calls), 2)
+
+        with self.probe_total(2):
+            fourth = self.service.sync_opportunities(self.db)
+        self.assertEqual(fourth["status"], "synced")
+        self.assertEqual(len(self.fan_out_calls), 3)
+
+    def test_up_to_date_profile_is_not_probed_within_the_interval(self):
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        self.db.add(SamSyncState(profile="default", watermark_posted_date=today, window_start=today,
+                                 window_total=1, last_success_at=datetime.now() - timedelta(minutes=10)))
+        self.db.commit()
+        self.service.PROBE_INTERVAL = 30 * 60
+
+        with self.probe_total(1) as probe:
+            self.assertEqual(self.service.sync_opportunities(self.db)["status"], "skipped")
+        probe.assert_not_called()
+
+        self.db.query(SamSyncState).update({"last_success_at": datetime.now() - timedelta(minutes=31)})
+        with self.probe_total(1) as probe:
+            self.assertEqual(self.service.sync_opportunities(self.db)["status"], "unchanged")
+        probe.assert_called_once()
+        self.assertEqual(len(self.fan_out_calls), 0)
+
+    def test_catch_up_starts_at_watermark_and_partial_run_keeps_it(self):
+        watermark = datetime.combine((datetime.now() - timedelta(days=10)).date(), datetime.min.time())
+        self.db.add(SamSyncState(profile="default", watermark_posted_date=watermark))
+        self.db.commit()
+        self.fan_out_result = ([self.parsed(1, datetime.now())], [{"error": None}, {"error": "HTTP 500"}])
+
+        with self.probe_total(5):
+            summary = self.service.sync_opportunities(self.db, shard_days=3)
+
+        self.assertEqual(summary["status"], "partial")
+        self.assertEqual(self.fan_out_calls[0]["posted_from"], watermark)
+        self.assertEqual(self.fan_out_calls[0]["shard_days"], 3)
+        self.assertEqual(self.db.query(SamSyncState).one().watermark_posted_date, watermark)
+        self.assertEqual(self.db.query(Opportunity).count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
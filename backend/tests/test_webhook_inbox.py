@@ -0,0 +1,180 @@
+import unittest
+from unittest.mock import Mock, patch
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the backend directory to the Python path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from app.db.models import Base, WebhookEvent
+from app.services.event_ledger import EventLedger
+from app.services.webhook_inbox import WebhookInbox, iter_comment_events
+
+
+def comment_payload(*comments, verb="add"):
+    return {
+        "object": "page",
+        "entry": [{
+            "id": "page-1",
+            "changes": [{
+                "field": "feed",
+                "value": {
+                    "item": "comment", "verb": verb, "comment_id": comment_id,
+                    "from": {"id": user_id}, "message": message,
+                },
+            } for comment_id, user_id, message in comments],
+        }],
+    }
+
+
+class TestIterCommentEvents(unittest.TestCase):
+
+    def test_yields_new_comments_only(self):
+        payload = comment_payload(("c-1", "u-1", "Hello"), ("c-2", "u-2", ""))
+        edit = comment_payload(("c-3", "u-3", "Edited"), verb="edited")
+
+        self.assertEqual(list(iter_comment_events(payload)),
+                         [{"comment_text": "Hello", "user_id": "u-1", "comment_id": "c-1"}])
+        self.assertEqual(list(iter_comment_events(edit)), [])
+        self.assertEqual(list(iter_comment_events({"object": "user"})), [])
+
+
+class TestWebhookInbox(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.db = self.Session()
+        self.addCleanup(self.db.close)
+        self.now = [datetime(2025, 7, 1, 12, 0, 0)]
+        self.lead_service = Mock()
+        self.inbox = WebhookInbox(
+            session_factory=self.Session, lead_service_factory=lambda db: self.lead_service,
+            max_attempts=3, base_backoff=10, clock=lambda: self.now[0],
+            ledger=EventLedger(clock=lambda: self.now[0]),
+        )
+
+    def _event(self, event_id):
+        self.db.expire_all()
+        return self.db.get(WebhookEvent, event_id)
+
+    def test_record_only_stores_the_payload(self):
+        event_id = self.inbox.record(self.db, json.dumps(comment_payload(("c-1", "u-1", "Hi"))))
+
+        event = self._event(event_id)
+        self.assertEqual(event.status, "pending")
+        self.assertEqual(event.source, "facebook")
+        self.lead_service.process_comments.assert_not_called()
+
+    def test_redelivered_body_is_dropped(self):
+        body = json.dumps(comment_payload(("c-1", "u-1", "Hi")))
+
+        self.assertIsNotNone(self.inbox.record(self.db, body))
+        self.assertIsNone(self.inbox.record(self.db, body))
+
+        self.assertEqual(self.db.query(WebhookEvent).count(), 1)
+        self.assertEqual(self.inbox.ledger.stats["duplicates_dropped"], 1)
+
+    def test_failed_inbox_insert_accepts_the_redelivery(self):
+        body = json.dumps(comment_payload(("c-1", "u-1", "Hi")))
+        commit = self.db.commit
+        calls = []
+        def flaky_commit():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OperationalError("INSERT", {}, Exception("database is locked"))
+            commit()
+
+        with patch.object(self.db, "commit", side_effect=flaky_commit):
+            with self.assertRaises(OperationalError):
+                self.inbox.record(self.db, body)
+
+        self.assertIsNotNone(self.inbox.record(self.db, body))
+        self.assertEqual(self.db.query(WebhookEvent).count(), 1)
+        self.assertEqual(self.inbox.ledger.stats["duplicates_dropped"], 0)
+
+    def test_process_due_runs_comment_pipeline(self):
+        event_id = self.inbox.record(self.db, json.dumps(comment_payload(("c-1", "u-1", "Hi"), ("c-2", "u-2", "Yo"))))
+
+        self.assertEqual(self.inbox.process_due(), 1)
+
+        self.lead_service.process_comments.assert_called_once_with([
+            {"comment_text": "Hi", "user_id": "u-1", "comment_id": "c-1"},
+            {"comment_text": "Yo", "user_id": "u-2", "comment_id": "c-2"},
+        ])
+        event = self._event(event_id)
+        self.assertEqual(event.status, "done")
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(self.inbox.process_due(), 0)
+
+    def test_failure_is_retried_with_backoff_then_marked_failed(self):
+        self.lead_service.process_comments.side_effect = RuntimeError("Graph API down")
+        event_id = self.inbox.record(self.db, json.dumps(comment_payload(("c-1", "u-1", "Hi"))))
+
+        self.inbox.process_due()
+        event = self._event(event_id)
+        self.assertEqual(event.status, "pending")
+        self.assertEqual(event.next_attempt_at, self.now[0] + timedelta(seconds=10))
+        self.assertIn("Graph API down", event.last_error)
+
+        # Not due yet.
+        self.assertEqual(self.inbox.process_due(), 0)
+
+        self.now[0] += timedelta(seconds=10)
+        self.inbox.process_due()
+        self.assertEqual(self._event(event_id).next_attempt_at, self.now[0] + timedelta(seconds=20))
+
+        self.now[0] += timedelta(seconds=20)
+        self.inbox.process_due()
+        event = self._event(event_id)
+        self.assertEqual(event.status, "failed")
+        self.assertEqual(event.attempts, 3)
+
+    def test_invalid_json_fails_immediately(self):
+        event_id = self.inbox.record(self.db, "not json")
+
+        self.inbox.process_due()
+
+        self.assertEqual(self._event(event_id).status, "failed")
+        self.assertEqual(self.inbox.stats(self.db),
+                         {"pending": 0, "processing": 0, "done": 0, "failed": 1})
+
+    def test_stale_claims_are_picked_up_again(self):
+        event_id = self.inbox.record(self.db, json.dumps(comment_payload(("c-1", "u-1", "Hi"))))
+        event = self._event(event_id)
+        event.status = "processing"
+        event.claimed_at = self.now[0] - timedelta(hours=1)
+        self.db.commit()
+
+        self.assertEqual(self.inbox.process_due(), 1)
+        self.assertEqual(self._event(event_id).status, "done")
+
+    def test_worker_pool_drains_inbox(self):
+        self.inbox.poll_interval = 0.01
+        event_id = self.inbox.record(self.db, json.dumps(comment_payload(("c-1", "u-1", "Hi"))))
+
+        self.inbox.start(workers=2)
+        try:
+            for _ in range(200):
+                if self._event(event_id).status == "done":
+                    break
+                time.sleep(0.01)
+        finally:
+            self.inbox.stop()
+
+        self.assertEqual(self._event(event_id).status, "done")
+        self.lead_service.process_comments.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
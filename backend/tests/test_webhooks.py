@@ -1,27 +1,33 @@
+import json
+import threading
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 
 from app.main import app  # Assuming your FastAPI app instance is named 'app'
+from app.db.client import get_db
 
 client = TestClient(app)
 
 @pytest.fixture
 def mock_db_session():
     """Mocks the database session to prevent actual database calls."""
-    with patch("app.db.client.get_db") as mock_get_db:
-        mock_session = MagicMock()
-        mock_get_db.return_value = mock_session
-        yield mock_session
+    mock_session = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_session
+    yield mock_session
+    app.dependency_overrides.pop(get_db, None)
 
 def test_handle_facebook_webhook_valid_comment(mock_db_session):
     """
-    Tests the Facebook webhook endpoint with a valid new comment event.
+    Tests that a new comment event is queued in the inbox and acknowledged
+    without running the comment pipeline inline.
     """
-    # Arrange: Mock the LeadService and its process_comment method
-    with patch("app.api.v1.endpoints.webhooks.LeadService") as mock_lead_service:
-        mock_instance = mock_lead_service.return_value
-        
+    # Arrange: Mock the inbox and the LeadService it would eventually call
+    with patch("app.api.v1.endpoints.webhooks.get_webhook_inbox") as mock_get_inbox, \
+            patch("app.services.lead_service.LeadService") as mock_lead_service:
+        mock_inbox = mock_get_inbox.return_value
+        mock_inbox.record.return_value = 1
+
         # The payload simulates a new comment on a feed post
         payload = {
             "object": "page",
@@ -44,16 +50,51 @@ def test_handle_facebook_webhook_valid_comment(mock_db_session):
         # Act: Send a POST request to the webhook endpoint
         response = client.post("/api/v1/webhooks/facebook", json=payload)
 
-        # Assert: Check that the response is successful and the service was called
+        # Assert: Check that the response is successful and the event was queued
         assert response.status_code == 200
         assert response.json() == {"status": "success"}
-        
-        # Verify that LeadService was initialized with the db session
-        mock_lead_service.assert_called_once_with(mock_db_session)
-        
-        # Verify that process_comment was called with the correct data
-        mock_instance.process_comment.assert_called_once_with(
-            comment_text="This is a test comment",
-            user_id="user123",
-            comment_id="987654321"
-        )
+
+        mock_inbox.record.assert_called_once()
+        db, raw_body = mock_inbox.record.call_args[0]
+        assert db is mock_db_session
+        assert json.loads(raw_body) == payload
+
+        # The comment is processed by the inbox workers, not in the request
+        mock_lead_service.assert_not_called()
+
+def test_handle_facebook_webhook_rejects_invalid_utf8(mock_db_session):
+    """
+    Tests that a body that is not UTF-8 is rejected with a 400 instead of
+    failing with a 500 that would be retried.
+    """
+    with patch("app.api.v1.endpoints.webhooks.get_webhook_inbox") as mock_get_inbox:
+        response = client.post("/api/v1/webhooks/facebook", content=b'{"object": "page\xff"}',
+                               headers={"Content-Type": "application/json"})
+
+        assert response.status_code == 400
+        mock_get_inbox.return_value.record.assert_not_called()
+
+def test_handle_facebook_webhook_records_off_the_event_loop():
+    """
+    Tests that the blocking inbox insert runs in the threadpool rather than
+    on the event loop.
+    """
+    threads = {}
+    async def loop_db():
+        # Async dependencies run on the event loop itself.
+        threads["event_loop"] = threading.get_ident()
+        return MagicMock()
+    def record(db, payload):
+        threads["record"] = threading.get_ident()
+        return 1
+
+    app.dependency_overrides[get_db] = loop_db
+    try:
+        with patch("app.api.v1.endpoints.webhooks.get_webhook_inbox") as mock_get_inbox:
+            mock_get_inbox.return_value.record.side_effect = record
+            response = client.post("/api/v1/webhooks/facebook", json={"object": "page", "entry": []})
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+    assert response.status_code == 200
+    assert threads["record"] != threads["event_loop"]